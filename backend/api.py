@@ -1,16 +1,30 @@
 import sys
 import ctypes
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import health, tutorials, recording, settings
+from app.routes import health, tutorials, recording, settings, refinements
+from app.services import llm_engine
 
 # --- DPI Awareness ---
+# Per-monitor awareness (2) keeps coordinates physical on mixed-DPI setups;
+# fall back to system awareness (1) on older Windows versions.
 try:
-    ctypes.windll.shcore.SetProcessDpiAwareness(1)
-except Exception as e:
-    print(f"Warning: Could not set DPI awareness: {e}", file=sys.stderr)
+    ctypes.windll.shcore.SetProcessDpiAwareness(2)
+except Exception:
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(1)
+    except Exception as e:
+        print(f"Warning: Could not set DPI awareness: {e}", file=sys.stderr)
 
-app = FastAPI(title="Prism AI Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The model preloads on a background thread; the API and captures don't wait for it
+    llm_engine.engine.start()
+    yield
+    llm_engine.engine.stop()
+
+app = FastAPI(title="Prism AI Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +38,7 @@ app.add_middleware(
 app.include_router(health.router)
 app.include_router(tutorials.router)
 app.include_router(recording.router)
+app.include_router(refinements.router)
 app.include_router(settings.router, prefix="/settings", tags=["settings"])
 
 if __name__ == "__main__":
@@ -4,12 +4,24 @@ from typing import Optional, Dict, List
 class CaptureRequest(BaseModel):
     x: int
     y: int
+    image_format: Optional[str] = None
 
 class CaptureResponse(BaseModel):
     id: str
     element_name: str
     description: str
-    screenshot_base64: str
+    screenshot_base64: str = ""
+    # Set instead of screenshot_base64 when the image lives in the capture cache
+    screenshot_id: Optional[str] = None
+    screenshot_url: Optional[str] = None
+    # dHash of the clean screenshot (hex)
+    screenshot_phash: Optional[str] = None
+    # Full-resolution size of the screenshot, so clients can place the overlay on a thumbnail
+    screenshot_width: Optional[int] = None
+    screenshot_height: Optional[int] = None
+    # True when the screenshot is a clean base image (possibly shared with the previous
+    # steps) and the client draws bounding_box as the spotlight instead of it being burned in
+    spotlight_overlay: bool = False
     bounding_box: Dict[str, int]
     element_type: str
 
@@ -21,3 +33,23 @@ class ProcessStepRequest(BaseModel):
 class ProcessStepResponse(BaseModel):
     processed_image_base64: str
     final_description: str
+
+class RefinementRequest(BaseModel):
+    step_id: Optional[str] = None
+    # The image can be sent inline or referenced by capture id / stored blob hash
+    image_base64: Optional[str] = None
+    screenshot_id: Optional[str] = None
+    screenshot_hash: Optional[str] = None
+    bounding_box: Optional[Dict[str, int]] = None
+    context: Optional[str] = None
+    priority: int = 0
+
+class RefinementBatchRequest(BaseModel):
+    steps: List[RefinementRequest]
+    # Only queue steps whose description is a generic fallback
+    only_generic: bool = True
+    priority: int = 0
+
+class RefinementPriorityRequest(BaseModel):
+    step_id: str
+    priority: int = 10
@@ -1,8 +1,13 @@
 from fastapi import APIRouter
+from app.services import llm_engine
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "online", "message": "Prism AI Backend is running"}
+    """Health check endpoint. Captures work as soon as this answers; `model` tells when refinement is ready."""
+    return {
+        "status": "online",
+        "message": "Prism AI Backend is running",
+        "model": llm_engine.engine.get_status()
+    }
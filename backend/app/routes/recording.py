@@ -1,22 +1,30 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse, Response
 from app.models import CaptureRequest, CaptureResponse, ProcessStepRequest, ProcessStepResponse
-from app.services import recorder, ollama
-import asyncio
-import queue
-import threading
+from app.services import recorder, frame_buffer, capture_cache, codec, refinement
+from app.services.capture_worker import CaptureWorkerPool
+from app.services.event_bus import EventBroadcaster
+from typing import Optional
 from pynput import mouse, keyboard
+import asyncio
+import json
 import time
-import comtypes
 
 router = APIRouter()
 
 # --- Global State ---
 is_recording = False
-event_queue = queue.Queue()
+event_bus = EventBroadcaster(buffer_size=256, heartbeat_interval=15.0)
 typing_buffer = []
 last_typed_time = 0
 
+# Heavy capture work runs here; the hooks only snapshot the screen and enqueue
+capture_pool = CaptureWorkerPool(
+    deliver=lambda result: event_bus.publish(result.model_dump_json()),
+    workers=2,
+    max_pending=32
+)
+
 # --- Helper Functions ---
 
 def process_typing_flush_sync():
@@ -26,14 +34,11 @@ def process_typing_flush_sync():
         
     text = "".join(typing_buffer)
     typing_buffer = []
-    x, y = recorder.auto.GetCursorPos()
     
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(recorder.perform_capture(x, y, is_typing=True, typed_text=text))
-        loop.close()
-        event_queue.put(result)
+        x, y = recorder.auto.GetCursorPos()
+        img, region = recorder.snapshot_around(x, y)
+        capture_pool.submit(x, y, img, region, is_typing=True, typed_text=text)
     except Exception as e:
         print(f"Typing flush error: {e}")
 
@@ -44,30 +49,16 @@ def on_click(x, y, button, pressed):
         return
     
     if pressed and button == mouse.Button.left:
-        try:
-            comtypes.CoInitialize()
-        except:
-            pass
-
+        clicked_at = time.monotonic()
         try:
             # 1. Check if we need to flush typing
             process_typing_flush_sync()
 
-            # 2. Basic capture (sync parts)
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(recorder.perform_capture(int(x), int(y)))
-            loop.close()
-            
-            # Push to SSE queue
-            event_queue.put(result)
+            # 2. Snapshot the pre-click state and hand off to the worker pool
+            img, region = recorder.snapshot_around(int(x), int(y), timestamp=clicked_at)
+            capture_pool.submit(int(x), int(y), img, region)
         except Exception as e:
             print(f"Hook error: {e}")
-        finally:
-            try:
-                comtypes.CoUninitialize()
-            except:
-                pass
 
 def on_press(key):
     global is_recording, typing_buffer, last_typed_time
@@ -114,6 +105,9 @@ mouse_listener.start()
 @router.post("/start-recording")
 def start_recording():
     global is_recording
+    frame_buffer.grabber.start()
+    # A new recording never shares screenshots with the previous one
+    capture_pool.duplicates.reset()
     is_recording = True
     return {"status": "started"}
 
@@ -121,58 +115,145 @@ def start_recording():
 def stop_recording():
     global is_recording
     is_recording = False
+    frame_buffer.grabber.stop()
     return {"status": "stopped"}
 
 @router.get("/events")
-async def event_stream(request: Request):
-    async def event_generator():
-        while True:
-            if await request.is_disconnected():
-                break
-            
-            try:
-                # Non-blocking get
-                item = event_queue.get_nowait()
-                yield f"data: {item.model_dump_json()}\n\n"
-            except queue.Empty:
-                await asyncio.sleep(0.1)
-            except Exception as e:
-                print(f"Stream error: {e}")
-                break
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+async def event_stream(request: Request, last_event_id: Optional[str] = None):
+    """
+    Server-sent capture events. Reconnecting clients resume after the Last-Event-ID
+    header (or ?last_event_id=) from the replay buffer.
+    """
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+
+    return StreamingResponse(
+        event_bus.subscribe(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _parse_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=start-end' range. Returns (start, end) inclusive or None."""
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, _, end_str = range_header[len("bytes="):].partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end_str))
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, min(end, size - 1)
+
+@router.get("/captures/{capture_id}")
+async def get_capture(capture_id: str, request: Request, tier: Optional[str] = None):
+    """
+    Serve a freshly captured screenshot from the in-memory capture cache.
+    ?tier=thumbnail|display returns a downscaled copy (see codec.SIZE_TIERS).
+    """
+    if tier is not None and tier not in codec.SIZE_TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tier: {tier}")
+    if tier is None:
+        entry = capture_cache.cache.get(capture_id)
+    else:
+        # A tier not encoded yet is encoded on first request; keep that off the event loop
+        entry = await asyncio.to_thread(capture_cache.cache.get, capture_id, tier)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Capture expired or not found")
+
+    # Captures are content-addressed, so the id (plus tier) doubles as a strong ETag
+    etag = f'"{capture_id}-{tier}"' if tier else f'"{capture_id}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=600, immutable", "Accept-Ranges": "bytes"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    data = entry["data"]
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, len(data))
+        if byte_range is None:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(content=data[start:end + 1], status_code=206, media_type=entry["mime_type"], headers=headers)
+
+    return Response(content=data, media_type=entry["mime_type"], headers=headers)
+
+@router.get("/capture-stats")
+def get_capture_stats():
+    """Capture worker pool throughput, latency and backpressure counters."""
+    return {
+        **capture_pool.get_stats(),
+        "events": event_bus.get_stats(),
+        "cache": capture_cache.cache.get_stats()
+    }
 
 @router.post("/capture", response_model=CaptureResponse)
 async def manual_capture(req: CaptureRequest):
-    return await recorder.perform_capture(req.x, req.y)
+    try:
+        image_format = codec.normalize_format(req.image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await recorder.perform_capture(req.x, req.y, image_format=image_format)
 
 @router.post("/process-step", response_model=ProcessStepResponse)
 async def process_step(req: ProcessStepRequest):
     """
     Process a captured step, refining generic descriptions with vision AI.
+    Runs on the refinement worker ahead of background jobs; the spotlight is drawn meanwhile.
     """
+    job = refinement.worker.submit(req.image_base64, req.bounding_box, req.context,
+                                   priority=refinement.PRIORITY_INTERACTIVE)
     # Apply spotlight if not already applied
-    processed_img = recorder.apply_spotlight(req.image_base64, req.bounding_box)
-    
-    final_desc = req.context or "Ação registrada."
-    
-    # SEMANTIC REFINEMENT: Detect generic Chromium fallback descriptions
-    generic_patterns = ["Clicar no destaque", "Interface Visual", "Elemento Visual"]
-    is_generic = any(pattern in final_desc for pattern in generic_patterns)
-    
-    if is_generic:
-        print(f"[Semantic Refinement] Detected generic description: {final_desc}")
-        # Use vision AI to extract functional text
-        # Pass the bounding box directly for smart cropping
-        final_desc = await ollama.call_ollama_vision_ocr(req.image_base64, bbox=req.bounding_box)
-        print(f"[Semantic Refinement] Refined to: {final_desc}")
-    elif req.context:
-        # Normal text refinement for non-generic descriptions
-        final_desc = await ollama.call_ollama_text(
-            f"Melhore esta instrução (seja direto): {req.context}"
-        )
+    processed_img = await asyncio.to_thread(recorder.apply_spotlight, req.image_base64, req.bounding_box)
+    result = await asyncio.wrap_future(job.future)
 
+    final_desc = result["description"] if result["status"] == "done" else (req.context or "Ação registrada.")
     return ProcessStepResponse(
         processed_image_base64=processed_img,
         final_description=final_desc
     )
+
+@router.post("/process-step/stream")
+async def process_step_stream(req: ProcessStepRequest):
+    """
+    Streaming /process-step: server-sent events with the description as it is
+    generated ({"partial_description"}), then a last event with the same body
+    as /process-step.
+    """
+    loop = asyncio.get_running_loop()
+    updates: asyncio.Queue = asyncio.Queue()
+    listener = lambda state: loop.call_soon_threadsafe(updates.put_nowait, state)
+
+    job = refinement.worker.submit(req.image_base64, req.bounding_box, req.context,
+                                   priority=refinement.PRIORITY_INTERACTIVE)
+    state = refinement.worker.watch(job, listener)
+    spotlight = asyncio.create_task(asyncio.to_thread(recorder.apply_spotlight, req.image_base64, req.bounding_box))
+
+    async def stream():
+        nonlocal state
+        try:
+            partial = None
+            while state["status"] in ("queued", "running"):
+                if state["partial_description"] and state["partial_description"] != partial:
+                    partial = state["partial_description"]
+                    yield f"data: {json.dumps({'partial_description': partial})}\n\n"
+                state = await updates.get()
+
+            final_desc = state["description"] if state["status"] == "done" else (req.context or "Ação registrada.")
+            result = ProcessStepResponse(processed_image_base64=await spotlight, final_description=final_desc)
+            yield f"data: {result.model_dump_json()}\n\n"
+        finally:
+            refinement.worker.unwatch(job, listener)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
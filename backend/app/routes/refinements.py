@@ -0,0 +1,111 @@
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import base64
+import database
+from app.models import RefinementRequest, RefinementBatchRequest, RefinementPriorityRequest
+from app.services import refinement, capture_cache, inference_cache
+
+router = APIRouter()
+
+async def resolve_image_base64(req: RefinementRequest) -> str:
+    """Inline image, else the capture cache entry, else the stored blob."""
+    if req.image_base64:
+        return req.image_base64
+    if req.screenshot_id:
+        entry = capture_cache.cache.get(req.screenshot_id)
+        if entry:
+            return base64.b64encode(entry["data"]).decode("utf-8")
+    if req.screenshot_hash:
+        blob = await database.run_in_executor(database.get_blob, req.screenshot_hash)
+        if blob:
+            return base64.b64encode(blob["data"]).decode("utf-8")
+    raise HTTPException(status_code=400, detail="No image available for refinement")
+
+@router.post("/refinements")
+async def submit_refinement(req: RefinementRequest):
+    """Queue a step refinement and return its job (identical pending requests share one job)."""
+    image_base64 = await resolve_image_base64(req)
+    job = refinement.worker.submit(
+        image_base64, req.bounding_box, req.context, step_id=req.step_id, priority=req.priority
+    )
+    return job.to_dict()
+
+@router.post("/refinements/batch")
+async def submit_refinement_batch(req: RefinementBatchRequest):
+    """
+    Queue refinements for many steps at once (e.g. "refine all generic steps").
+    The worker runs them in batches; results arrive one by one on /refinements/events.
+    """
+    jobs, skipped = [], []
+    for step in req.steps:
+        if req.only_generic and not refinement.is_generic_description(step.context or ""):
+            continue
+        try:
+            image_base64 = await resolve_image_base64(step)
+        except HTTPException:
+            skipped.append(step.step_id)
+            continue
+        job = refinement.worker.submit(
+            image_base64, step.bounding_box, step.context, step_id=step.step_id, priority=req.priority
+        )
+        jobs.append(job.to_dict())
+    return {"jobs": jobs, "skipped": skipped}
+
+@router.get("/refinements")
+def list_refinements(step_id: Optional[str] = None, active: bool = False):
+    """Known jobs, optionally filtered by step and/or to queued and running ones."""
+    return refinement.worker.list_jobs(step_id, active_only=active)
+
+@router.get("/refinements/events")
+async def refinement_events(request: Request, last_event_id: Optional[str] = None):
+    """Server-sent job status changes (queued, running, done, failed, cancelled)."""
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+
+    return StreamingResponse(
+        refinement.events.subscribe(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/refinement-stats")
+def get_refinement_stats():
+    """Refinement queue depth, throughput and the job currently running."""
+    return {**refinement.worker.get_stats(), "events": refinement.events.get_stats()}
+
+@router.get("/inference-cache-stats")
+def get_inference_cache_stats():
+    """Hits, misses and size of the cache of model outputs."""
+    return inference_cache.cache.get_stats()
+
+@router.delete("/inference-cache")
+def clear_inference_cache():
+    """Forget all cached model outputs (e.g. after changing prompts)."""
+    return {"cleared": inference_cache.cache.clear()}
+
+@router.post("/refinements/prioritize")
+def prioritize_refinement(req: RefinementPriorityRequest):
+    """Run a step's pending refinement sooner (e.g. the step is visible in the editor)."""
+    job = refinement.worker.prioritize(req.step_id, req.priority)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No active refinement for this step")
+    return job
+
+@router.get("/refinements/{job_id}")
+def get_refinement(job_id: str):
+    job = refinement.worker.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.delete("/refinements/{job_id}")
+def cancel_refinement(job_id: str):
+    job = refinement.worker.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.delete("/steps/{step_id}/refinements")
+def cancel_step_refinements(step_id: str):
+    """Cancel all pending refinements of a step (the step was deleted)."""
+    return {"cancelled": refinement.worker.cancel_step(step_id)}
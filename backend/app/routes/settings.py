@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.services import model_manager, llm_engine
+from typing import Any, Dict, Optional
+from app.services import model_manager, llm_engine, codec
 
 router = APIRouter()
 
@@ -10,6 +11,21 @@ class DownloadRequest(BaseModel):
 class LoadModelRequest(BaseModel):
     model_id: str
 
+class ModelProfileRequest(BaseModel):
+    profile: Optional[str] = None                 # Profile name or "auto"
+    overrides: Optional[Dict[str, Any]] = None    # Replaces the previous overrides
+
+class EngineSettingsRequest(BaseModel):
+    preload_model_id: Optional[str] = None
+    preload_on_start: Optional[bool] = None
+    warm_up: Optional[bool] = None
+    idle_unload_minutes: Optional[float] = None
+
+class ImageSettingsRequest(BaseModel):
+    format: Optional[str] = None
+    quality: Optional[int] = None
+    png_compression: Optional[int] = None
+
 @router.get("/models")
 def list_models():
     """List available models and their status"""
@@ -30,9 +46,76 @@ def get_progress():
 
 @router.post("/models/load")
 def load_model(req: LoadModelRequest):
-    """Load a model into memory for inference"""
+    """Start loading a model into memory for inference; follow it on /health"""
+    model = next((m for m in model_manager.get_models_status() if m["id"] == req.model_id), None)
+    if model is None:
+        raise HTTPException(status_code=400, detail="Model not found")
+    if not model["downloaded"]:
+        raise HTTPException(status_code=400, detail="Model not downloaded")
+    return llm_engine.engine.load_model_async(req.model_id)
+
+@router.post("/models/unload")
+def unload_model():
+    """Free the loaded model's memory"""
+    return {"unloaded": llm_engine.engine.unload(), **llm_engine.engine.get_status()}
+
+@router.get("/models/{model_id}/profiles")
+def get_model_profiles(model_id: str):
+    """Resource profiles of a model with their measured speed, the selection and the effective parameters"""
+    if model_manager.get_model_config(model_id) is None:
+        raise HTTPException(status_code=404, detail="Model not found")
+    stats = model_manager.get_profile_stats(model_id)
+    selection = llm_engine.engine.get_model_profile(model_id)
+    return {
+        "system": model_manager.detect_system(),
+        "recommended": model_manager.recommend_profile(model_id),
+        **selection,
+        "effective": model_manager.resolve_profile(model_id, selection["profile"], selection["overrides"]),
+        "profiles": {
+            name: {**params, "tokens_per_second": stats.get(name, {}).get("tokens_per_second"),
+                   "samples": stats.get(name, {}).get("samples", 0)}
+            for name, params in model_manager.get_profiles(model_id).items()
+        }
+    }
+
+@router.put("/models/{model_id}/profile")
+def update_model_profile(model_id: str, req: ModelProfileRequest):
+    """Pick a profile and/or override its parameters; a loaded model is reloaded with them"""
+    try:
+        llm_engine.engine.set_model_profile(model_id, req.profile, req.overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return get_model_profiles(model_id)
+
+@router.get("/system")
+def get_system_info():
+    """Detected cores, RAM and GPU offload support"""
+    return model_manager.detect_system()
+
+@router.get("/engine")
+def get_engine_settings():
+    """Preload, warm-up and idle unload preferences, with the engine status"""
+    return {**llm_engine.engine.get_settings(), "engine": llm_engine.engine.get_status()}
+
+@router.put("/engine")
+def update_engine_settings(req: EngineSettingsRequest):
+    """Change the preload, warm-up or idle unload preferences"""
+    try:
+        return llm_engine.engine.update_settings(
+            req.preload_model_id, req.preload_on_start, req.warm_up, req.idle_unload_minutes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/image")
+def get_image_settings():
+    """Current screenshot encoding defaults and size tiers"""
+    return {**codec.get_settings(), "formats": list(codec.FORMATS), "tiers": codec.SIZE_TIERS}
+
+@router.put("/image")
+def update_image_settings(req: ImageSettingsRequest):
+    """Change the screenshot format, quality or PNG compression level"""
     try:
-        llm_engine.engine.load_model(req.model_id)
-        return {"status": "loaded", "model_id": req.model_id}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return codec.update_settings(req.format, req.quality, req.png_compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,8 +1,17 @@
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, Iterator, Optional
+import asyncio
+import json
+import tempfile
 import database
+from app.services import thumbnails, exporter
 
 router = APIRouter()
 
+# Import archives larger than this are spooled to disk instead of memory
+IMPORT_SPOOL_SIZE = 64 * 1024 * 1024
+
 @router.post("/tutorials")
 async def create_tutorial_endpoint(request: Request):
     """Create a new tutorial."""
@@ -10,23 +19,136 @@ async def create_tutorial_endpoint(request: Request):
     title = data.get('title', 'Untitled Tutorial')
     steps = data.get('steps', [])
     
-    tutorial_id = database.create_tutorial(title, steps)
+    tutorial_id = await database.run_in_executor(database.create_tutorial, title, steps)
     return {"id": tutorial_id, "message": "Tutorial created successfully"}
 
+def _read_archive(archive) -> Iterator[Dict]:
+    """Tutorials of a JSON-lines archive; ValueError names the first bad line."""
+    for number, line in enumerate(archive, 1):
+        if not line.strip():
+            continue
+        try:
+            tutorial = json.loads(line)
+            database.validate_tutorial_entry(tutorial)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from e
+        yield tutorial
+
+@router.post("/tutorials/import")
+async def import_tutorials_endpoint(request: Request):
+    """Import a JSON-lines archive (one tutorial per line) in a single transaction."""
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as archive:
+        async for chunk in request.stream():
+            archive.write(chunk)
+        archive.seek(0)
+        
+        try:
+            tutorial_ids = await database.run_in_executor(database.import_tutorials, _read_archive(archive))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {e}")
+    
+    return {"ids": tutorial_ids, "message": f"Imported {len(tutorial_ids)} tutorials"}
+
 @router.get("/tutorials")
-async def get_tutorials():
-    """Get recent tutorials."""
-    tutorials = database.get_recent_tutorials(limit=10)
-    return {"tutorials": tutorials}
+async def get_tutorials(limit: int = 10, cursor: Optional[str] = None,
+                        include_step_counts: bool = False, include_thumbnail: bool = False):
+    """Get tutorials by most recent modification, one keyset-paginated page at a time."""
+    limit = max(1, min(limit, 100))
+    try:
+        return await database.run_in_executor(
+            database.list_tutorials, limit=limit, cursor_token=cursor,
+            include_step_counts=include_step_counts, include_thumbnail=include_thumbnail
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/tutorials/search")
+async def search_tutorials_endpoint(q: str, limit: int = 20, offset: int = 0):
+    """Full-text search over tutorials and their steps, ranked and paginated."""
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    result = await database.run_in_executor(database.search_tutorials, q, limit=limit, offset=offset)
+    return {**result, "limit": limit, "offset": offset}
 
 @router.get("/tutorials/{tutorial_id}")
-async def get_tutorial_endpoint(tutorial_id: str):
-    """Get a specific tutorial."""
-    tutorial = database.get_tutorial(tutorial_id)
+async def get_tutorial_endpoint(tutorial_id: str, include_screenshots: bool = True):
+    """Get a specific tutorial. Pass include_screenshots=false for metadata only."""
+    tutorial = await database.run_in_executor(
+        database.get_tutorial, tutorial_id, include_screenshots=include_screenshots
+    )
     if not tutorial:
         raise HTTPException(status_code=404, detail="Tutorial not found")
     return tutorial
 
+@router.get("/tutorials/{tutorial_id}/steps/{step_id}/screenshot")
+async def get_step_screenshot_endpoint(tutorial_id: str, step_id: str, request: Request):
+    """Serve the raw screenshot bytes of a step, revalidated by its content hash."""
+    screenshot = await database.run_in_executor(database.get_step_screenshot, tutorial_id, step_id)
+    if not screenshot:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    
+    etag = f'"{screenshot["hash"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=screenshot['data'], media_type=screenshot['mime_type'], headers=headers)
+
+@router.get("/tutorials/{tutorial_id}/export")
+async def export_tutorial_endpoint(tutorial_id: str, format: str = "zip"):
+    """
+    Download a tutorial as a self-contained HTML page, a Markdown document or a zip
+    bundle (manual.md + index.html + assets/). The document is streamed step by step.
+    """
+    if format not in exporter.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    
+    tutorial = await database.run_in_executor(database.get_tutorial, tutorial_id, False)
+    if not tutorial:
+        raise HTTPException(status_code=404, detail="Tutorial not found")
+    
+    media_type = exporter.EXPORT_FORMATS[format][0]
+    filename = exporter.export_filename(tutorial['title'], format)
+    return StreamingResponse(
+        exporter.export_tutorial(tutorial, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Blobs are content-addressed, so their URLs never change meaning
+BLOB_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+@router.get("/blobs/{blob_hash}")
+async def get_blob_endpoint(blob_hash: str, request: Request):
+    """Serve a stored screenshot by its hash (full resolution, used when zooming)."""
+    etag = f'"{blob_hash}"'
+    headers = {"ETag": etag, "Cache-Control": BLOB_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    blob = await database.run_in_executor(database.get_blob, blob_hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(content=blob['data'], media_type=blob['mime_type'], headers=headers)
+
+@router.get("/blobs/{blob_hash}/thumbnail")
+async def get_blob_thumbnail_endpoint(blob_hash: str, request: Request):
+    """Serve a small preview of a stored screenshot, generated once and cached on disk."""
+    etag = f'"{blob_hash}-thumbnail"'
+    headers = {"ETag": etag, "Cache-Control": BLOB_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    # Image decoding stays off the DB pool so thumbnails never hold up queries
+    data = await asyncio.to_thread(thumbnails.cache.get, blob_hash)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(content=data, media_type=f"image/{thumbnails.THUMBNAIL_FORMAT}", headers=headers)
+
+@router.get("/thumbnail-stats")
+def get_thumbnail_stats():
+    """Thumbnail disk cache hits, misses and size."""
+    return thumbnails.cache.get_stats()
+
 @router.put("/tutorials/{tutorial_id}")
 async def update_tutorial_endpoint(tutorial_id: str, request: Request):
     """Update an existing tutorial."""
@@ -34,15 +156,30 @@ async def update_tutorial_endpoint(tutorial_id: str, request: Request):
     title = data.get('title', 'Untitled Tutorial')
     steps = data.get('steps', [])
     
-    success = database.update_tutorial(tutorial_id, title, steps)
+    success = await database.run_in_executor(database.update_tutorial, tutorial_id, title, steps)
     if success:
         return {"message": "Tutorial updated successfully"}
     raise HTTPException(status_code=500, detail="Failed to update tutorial")
 
+@router.patch("/tutorials/{tutorial_id}")
+async def patch_tutorial_endpoint(tutorial_id: str, request: Request):
+    """Apply per-step operations (insert/update/delete/move) to a tutorial."""
+    data = await request.json()
+    title = data.get('title')
+    operations = data.get('operations', [])
+    
+    try:
+        success = await database.run_in_executor(database.patch_tutorial, tutorial_id, title, operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if success:
+        return {"message": "Tutorial patched successfully"}
+    raise HTTPException(status_code=404, detail="Tutorial not found")
+
 @router.delete("/tutorials/{tutorial_id}")
 async def delete_tutorial_endpoint(tutorial_id: str):
     """Delete a tutorial."""
-    success = database.delete_tutorial(tutorial_id)
+    success = await database.run_in_executor(database.delete_tutorial, tutorial_id)
     if success:
         return {"message": "Tutorial deleted successfully"}
     raise HTTPException(status_code=500, detail="Failed to delete tutorial")
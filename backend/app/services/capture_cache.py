@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.services import codec
+
+class CaptureCache:
+    """
+    Short-lived in-memory store for freshly captured screenshots, keyed by the
+    SHA-256 of their bytes. SSE events carry only the key; the UI fetches the
+    image separately. Smaller size tiers (see codec.SIZE_TIERS) are stored with an
+    entry under the same key, encoded from it the first time they are requested.
+    Entries expire after `ttl` seconds and the least recently used ones are evicted
+    beyond `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, mime_type: str, tiers: Optional[Dict[str, Dict]] = None) -> str:
+        """Store an image (and optional {tier: {"data", "mime_type"}} variants); returns its key."""
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._entries[key]["expires"] = time.monotonic() + self.ttl
+                return key
+
+            tiers = {
+                name: {"data": tier["data"], "mime_type": tier["mime_type"]}
+                for name, tier in (tiers or {}).items() if tier["data"] is not data
+            }
+            self._entries[key] = {"data": data, "mime_type": mime_type, "tiers": tiers, "expires": time.monotonic() + self.ttl}
+            self._size += self._entry_size(self._entries[key])
+            self._evict()
+        return key
+
+    def get(self, key: str, tier: Optional[str] = None) -> Optional[Dict]:
+        """
+        Get an entry's bytes and mime type. A missing size tier is encoded from the
+        full image and kept; an unknown `tier` falls back to the full image.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            variant = entry["tiers"].get(tier) if tier else None
+            if variant is None and codec.SIZE_TIERS.get(tier) is None:
+                variant = entry
+            if variant is not None:
+                return {"data": variant["data"], "mime_type": variant["mime_type"]}
+
+        # Encoded outside the lock; concurrent requests may both do it once
+        image_format = codec.normalize_format(entry["mime_type"].split("/")[-1])
+        # Images already within the tier share the full bytes
+        variant = codec.encode_tier(entry["data"], tier, image_format) or {"data": entry["data"], "mime_type": entry["mime_type"]}
+        with self._lock:
+            if self._entries.get(key) is entry and tier not in entry["tiers"]:
+                entry["tiers"][tier] = variant
+                if variant["data"] is not entry["data"]:
+                    self._size += len(variant["data"])
+                    self._evict()
+        return {"data": variant["data"], "mime_type": variant["mime_type"]}
+
+    @staticmethod
+    def _entry_size(entry: Dict) -> int:
+        return len(entry["data"]) + sum(
+            len(tier["data"]) for tier in entry["tiers"].values() if tier["data"] is not entry["data"]
+        )
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._size -= self._entry_size(entry)
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if entry["expires"] < now]:
+            self._remove(key)
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size}
+
+# Global instance shared by the recorder and the /captures endpoint
+cache = CaptureCache()
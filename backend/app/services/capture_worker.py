@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional
+import numpy as np
+import comtypes
+from app.models import CaptureResponse
+from app.services import recorder, capture_cache
+from app.services.perceptual_hash import DuplicateDetector
+
+class CaptureWorkerPool:
+    """
+    Runs capture analysis (UIA lookup, OpenCV, encoding) on worker threads so the
+    input hooks only take a snapshot and enqueue it. Results are delivered in
+    submission order even when workers finish out of order. At delivery each
+    screenshot is compared with the previous one; near-duplicates reuse its
+    cached base image instead of publishing a new one.
+    """
+
+    def __init__(self, deliver: Callable[[CaptureResponse], None], workers: int = 2, max_pending: int = 32):
+        self._deliver = deliver
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()            # Short sections only; submit() takes it on the hook thread
+        self._delivery_lock = threading.Lock()   # Serializes publish + deliver, keeping submission order
+        self._next_seq = 0           # Sequence number of the next submitted job
+        self._next_delivery = 0      # Sequence number that must be delivered next
+        self._completed: Dict[int, Optional[tuple]] = {}
+        self.duplicates = DuplicateDetector()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "deduplicated": 0,
+            "in_flight": 0,
+            "total_latency_ms": 0.0,
+            "max_latency_ms": 0.0
+        }
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"capture-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, x: int, y: int, pre_captured_img: Optional[np.ndarray], capture_region: Optional[dict],
+               is_typing: bool = False, typed_text: str = "") -> bool:
+        """
+        Queues a snapshot for analysis without blocking. Returns False (and counts
+        a drop) when the queue is full so the calling hook never stalls.
+        """
+        with self._lock:
+            seq = self._next_seq
+            job = (seq, time.perf_counter(), x, y, pre_captured_img, capture_region, is_typing, typed_text)
+            try:
+                self._jobs.put_nowait(job)
+            except queue.Full:
+                self._stats["dropped"] += 1
+                print(f"[Capture Pool] Queue full, dropped capture at ({x}, {y})")
+                return False
+            self._next_seq += 1
+            self._stats["submitted"] += 1
+        return True
+
+    def _worker(self):
+        try:
+            comtypes.CoInitialize()
+        except Exception:
+            pass
+
+        while True:
+            seq, submitted_at, x, y, img, region, is_typing, typed_text = self._jobs.get()
+            with self._lock:
+                self._stats["in_flight"] += 1
+
+            result = None
+            try:
+                # Images go to the capture cache on delivery; events only carry a handle to them
+                result = recorder.analyze_capture_frame(
+                    x, y, img, region, is_typing=is_typing, typed_text=typed_text, inline_screenshot=False
+                )
+            except Exception as e:
+                print(f"[Capture Pool] Capture error: {e}")
+
+            # Typing steps exist to show the typed text, which a near-duplicate base never has
+            if result is not None:
+                result = (*result, not is_typing)
+            self._complete(seq, result, (time.perf_counter() - submitted_at) * 1000)
+
+    def _publish_screenshot(self, response: CaptureResponse, frame: Optional[dict], dedupe: bool = True):
+        """Point the response at a cached image: the previous base if it's a near-duplicate, else its own."""
+        if frame is None:
+            return
+
+        bbox = response.bounding_box
+        absolute_bbox = {
+            "left": bbox["left"] + frame["left"], "top": bbox["top"] + frame["top"],
+            "right": bbox["right"] + frame["left"], "bottom": bbox["bottom"] + frame["top"]
+        }
+        base = None
+        if dedupe:
+            try:
+                base = self.duplicates.match(frame["image"], frame["left"], frame["top"], absolute_bbox)
+            except Exception as e:
+                print(f"[Capture Pool] Duplicate check error: {e}")
+        if base is not None and capture_cache.cache.get(base["id"]) is not None:
+            # Only the bbox differs: re-express it relative to the shared base image
+            screenshot_id = base["id"]
+            response.bounding_box = {
+                "left": absolute_bbox["left"] - base["left"], "top": absolute_bbox["top"] - base["top"],
+                "right": absolute_bbox["right"] - base["left"], "bottom": absolute_bbox["bottom"] - base["top"]
+            }
+            response.screenshot_width, response.screenshot_height = base["width"], base["height"]
+            with self._lock:
+                self._stats["deduplicated"] += 1
+        else:
+            full = frame["tiers"]["full"]
+            screenshot_id = capture_cache.cache.put(full["data"], full["mime_type"], tiers=frame["tiers"])
+            self.duplicates.remember(screenshot_id, frame["image"], frame["left"], frame["top"])
+            response.screenshot_width, response.screenshot_height = full["width"], full["height"]
+
+        response.screenshot_id = screenshot_id
+        response.screenshot_url = f"/captures/{screenshot_id}"
+
+    def _complete(self, seq: int, result: Optional[tuple], latency_ms: float):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            if result is None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+                self._stats["total_latency_ms"] += latency_ms
+                self._stats["max_latency_ms"] = max(self._stats["max_latency_ms"], latency_ms)
+
+            self._completed[seq] = result
+
+        # Release every result that is now next in line (failed captures just advance the sequence).
+        # Hashing, caching and publishing happen outside self._lock so the input hooks never wait on
+        # them; whoever holds the delivery lock also drains results that complete meanwhile.
+        with self._delivery_lock:
+            while True:
+                with self._lock:
+                    if self._next_delivery not in self._completed:
+                        return
+                    ready = self._completed.pop(self._next_delivery)
+                    self._next_delivery += 1
+                if ready is not None:
+                    response, frame, dedupe = ready
+                    self._publish_screenshot(response, frame, dedupe)
+                    self._deliver(response)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._jobs.qsize()
+            stats["awaiting_order"] = len(self._completed)
+            stats["workers"] = len(self._threads)
+        total_latency_ms = stats.pop("total_latency_ms")
+        stats["avg_latency_ms"] = round(total_latency_ms / stats["completed"], 2) if stats["completed"] else 0.0
+        stats["max_latency_ms"] = round(stats["max_latency_ms"], 2)
+        return stats
@@ -0,0 +1,154 @@
+import base64
+import threading
+from typing import Dict, Iterable, Optional
+import cv2
+import numpy as np
+
+# Supported output formats: file extension for cv2.imencode and mime type
+FORMATS = {
+    "png": {"ext": ".png", "mime_type": "image/png"},
+    "webp": {"ext": ".webp", "mime_type": "image/webp"},
+    "jpeg": {"ext": ".jpg", "mime_type": "image/jpeg"}
+}
+
+FORMAT_ALIASES = {"jpg": "jpeg", ".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp"}
+
+# Size tiers, as the max length of the longest edge (None keeps the original resolution).
+# Captures encode only "full"; smaller tiers are encoded when first requested (encode_tier)
+SIZE_TIERS = {
+    "thumbnail": 320,
+    "display": 1280,
+    "full": None
+}
+
+# Encoding used for crops sent to the vision model (llama.cpp decodes JPEG fastest)
+VISION_FORMAT = "jpeg"
+VISION_QUALITY = 90
+
+# Runtime-editable defaults (see /settings/image)
+# (benchmarks/codec_bench.py: PNG level 1 is the fastest lossless encode, ~22 ms vs ~31 ms
+# for lossless WebP and ~80 ms for PNG level 9; WebP is ~4x smaller when size matters more)
+_settings = {
+    "format": "png",
+    "quality": 100,         # JPEG/WebP quality (0-100); WebP 100 is lossless
+    "png_compression": 1    # zlib level (0-9); 1 is several times faster than 9 on screenshots
+}
+_settings_lock = threading.Lock()
+
+def normalize_format(image_format: Optional[str]) -> str:
+    """Map 'png', '.png', 'jpg', 'JPEG'... to a FORMATS key (defaults to the configured format)."""
+    if not image_format:
+        return get_settings()["format"]
+    name = image_format.lower()
+    name = FORMAT_ALIASES.get(name, name.lstrip("."))
+    if name not in FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    return name
+
+def mime_type(image_format: Optional[str] = None) -> str:
+    return FORMATS[normalize_format(image_format)]["mime_type"]
+
+def get_settings() -> Dict:
+    with _settings_lock:
+        return dict(_settings)
+
+def update_settings(image_format: Optional[str] = None, quality: Optional[int] = None,
+                    png_compression: Optional[int] = None) -> Dict:
+    """Validate and apply new encoding defaults. Raises ValueError on bad values."""
+    if image_format is not None:
+        image_format = normalize_format(image_format)
+    if quality is not None and not 0 <= quality <= 100:
+        raise ValueError("quality must be between 0 and 100")
+    if png_compression is not None and not 0 <= png_compression <= 9:
+        raise ValueError("png_compression must be between 0 and 9")
+
+    with _settings_lock:
+        if image_format is not None:
+            _settings["format"] = image_format
+        if quality is not None:
+            _settings["quality"] = quality
+        if png_compression is not None:
+            _settings["png_compression"] = png_compression
+        return dict(_settings)
+
+def _encode_params(image_format: str, quality: Optional[int], png_compression: Optional[int]) -> list:
+    settings = get_settings()
+    if image_format == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, settings["png_compression"] if png_compression is None else png_compression]
+    level = settings["quality"] if quality is None else quality
+    if image_format == "webp":
+        # OpenCV treats quality > 100 as lossless
+        return [cv2.IMWRITE_WEBP_QUALITY, 101 if level >= 100 else max(1, level)]
+    return [cv2.IMWRITE_JPEG_QUALITY, level]
+
+def encode(img: np.ndarray, image_format: Optional[str] = None, quality: Optional[int] = None,
+           png_compression: Optional[int] = None) -> bytes:
+    """Encode a BGR/BGRA numpy image. Unset options use the configured defaults."""
+    image_format = normalize_format(image_format)
+    if image_format == "jpeg" and img.ndim == 3 and img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    ok, buffer = cv2.imencode(FORMATS[image_format]["ext"], img, _encode_params(image_format, quality, png_compression))
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return buffer.tobytes()
+
+def encode_base64(img: np.ndarray, image_format: Optional[str] = None, quality: Optional[int] = None) -> str:
+    return base64.b64encode(encode(img, image_format, quality)).decode("utf-8")
+
+def decode(data: bytes) -> Optional[np.ndarray]:
+    """Decode PNG/JPEG/WebP bytes into a BGR numpy image (None if undecodable)."""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def decode_base64(image_base64: str) -> Optional[np.ndarray]:
+    return decode(base64.b64decode(image_base64))
+
+def resize_to_tier(img: np.ndarray, tier: str) -> np.ndarray:
+    """Downscale so the longest edge fits the tier (never upscales)."""
+    max_edge = SIZE_TIERS[tier]
+    h, w = img.shape[:2]
+    if max_edge is None or max(h, w) <= max_edge:
+        return img
+    ratio = max_edge / float(max(h, w))
+    return cv2.resize(img, (max(1, round(w * ratio)), max(1, round(h * ratio))), interpolation=cv2.INTER_AREA)
+
+def encode_tiers(img: np.ndarray, tiers: Iterable[str] = tuple(SIZE_TIERS), image_format: Optional[str] = None,
+                 quality: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Encode an image once per size tier. Tiers whose size equals a larger one (small
+    captures) reuse its bytes instead of being encoded again.
+    Returns {tier: {"data", "mime_type", "width", "height"}}.
+    """
+    image_format = normalize_format(image_format)
+    encoded: Dict[str, Dict] = {}
+    by_size: Dict[tuple, Dict] = {}
+    # Largest tiers first so smaller ones can reuse identical results
+    for tier in sorted(tiers, key=lambda t: SIZE_TIERS[t] or float("inf"), reverse=True):
+        resized = resize_to_tier(img, tier)
+        size = resized.shape[:2]
+        if size not in by_size:
+            by_size[size] = {
+                "data": encode(resized, image_format, quality),
+                "mime_type": FORMATS[image_format]["mime_type"],
+                "width": size[1],
+                "height": size[0]
+            }
+        encoded[tier] = by_size[size]
+    return encoded
+
+def encode_tier(data: bytes, tier: str, image_format: Optional[str] = None,
+                quality: Optional[int] = None) -> Optional[Dict]:
+    """
+    Downscaled variant of already encoded image bytes, as {"data", "mime_type",
+    "width", "height"}. None when the image already fits the tier (or can't be decoded).
+    """
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None
+    resized = resize_to_tier(img, tier)
+    if resized is img:
+        return None
+    return encode_tiers(resized, ("full",), image_format, quality)["full"]
+
+def encode_for_vision(img: np.ndarray) -> str:
+    """Encode a crop for the vision model (base64)."""
+    return encode_base64(img, VISION_FORMAT, VISION_QUALITY)
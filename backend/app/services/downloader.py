@@ -0,0 +1,314 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import requests
+
+# Parallel ranged connections per file, and the smallest segment worth its own connection
+MAX_CONNECTIONS = 4
+MIN_SEGMENT_SIZE = 32 * 1024 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 30        # Seconds without data before a connection is retried
+STATE_SAVE_INTERVAL = 2.0   # Seconds between progress snapshots in the .part.json file
+SPEED_WINDOW = 5.0          # Seconds of history used for the transfer rate
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class DownloadCancelled(Exception):
+    pass
+
+class DownloadError(Exception):
+    pass
+
+def _remote_info(url: str) -> Dict:
+    """
+    Size, range support and checksum of a remote file. Hugging Face puts the LFS
+    sha256 in X-Linked-Etag on the response that redirects to the CDN.
+    """
+    response = requests.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    sha256, size = None, None
+    for hop in (*response.history, response):
+        etag = (hop.headers.get("X-Linked-Etag") or hop.headers.get("ETag") or "").strip('"').lower()
+        if _SHA256_PATTERN.match(etag):
+            sha256 = etag
+        if hop.headers.get("X-Linked-Size"):
+            size = int(hop.headers["X-Linked-Size"])
+    if size is None and response.headers.get("Content-Length"):
+        size = int(response.headers["Content-Length"])
+    return {
+        "size": size,
+        "accepts_ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+        "sha256": sha256,
+        "etag": response.headers.get("ETag")
+    }
+
+def sha256_file(path: str, progress: Optional[Callable[[int], None]] = None) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(CHUNK_SIZE * 8)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+            if progress:
+                progress(len(block))
+
+class FileDownload:
+    """
+    Downloads one URL to `dest` through `dest`.part, using up to MAX_CONNECTIONS
+    HTTP range requests in parallel. Progress of every segment is saved next to
+    the partial file, so an interrupted download (error, cancel, restart) resumes
+    where it stopped. The finished file is checked against `sha256` (or the checksum
+    the server advertises) before it replaces `dest`.
+    """
+
+    def __init__(self, url: str, dest: str, sha256: Optional[str] = None,
+                 max_connections: int = MAX_CONNECTIONS, cancel: Optional[threading.Event] = None):
+        self.url = url
+        self.dest = dest
+        self.part_path = dest + ".part"
+        self.state_path = dest + ".part.json"
+        self.expected_sha256 = sha256.lower() if sha256 else None
+        self.max_connections = max_connections
+        self.cancel = cancel or threading.Event()
+        self._failed = threading.Event()   # A connection gave up; stops this file only
+        self.total: Optional[int] = None
+        self.status = "pending"     # pending, downloading, verifying, completed, error, cancelled
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._segments: List[Dict] = []   # {"start", "end" (inclusive), "done"}
+        self._etag: Optional[str] = None
+        self._downloaded = 0
+        self._verified = 0
+        self._samples: Deque[Tuple[float, int]] = deque()
+        self._last_save = 0.0
+
+    # --- Progress ---
+
+    def progress(self) -> Dict:
+        with self._lock:
+            return {
+                "filename": os.path.basename(self.dest),
+                "status": self.status,
+                "downloaded_bytes": self._downloaded,
+                "total_bytes": self.total,
+                "verified_bytes": self._verified,
+                "speed_bps": self._speed_locked(),
+                "error": self.error
+            }
+
+    def _speed_locked(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+        return round((b1 - b0) / (t1 - t0), 1) if t1 > t0 else 0.0
+
+    def _add_bytes(self, segment: Dict, count: int):
+        with self._lock:
+            segment["done"] += count
+            self._downloaded += count
+            now = time.monotonic()
+            self._samples.append((now, self._downloaded))
+            while self._samples and now - self._samples[0][0] > SPEED_WINDOW:
+                self._samples.popleft()
+            save = now - self._last_save >= STATE_SAVE_INTERVAL
+            if save:
+                self._last_save = now
+        if save:
+            self._save_state()
+
+    # --- Resume state ---
+
+    def _save_state(self):
+        with self._lock:
+            state = {"url": self.url, "size": self.total, "etag": self._etag,
+                     "segments": [dict(segment) for segment in self._segments]}
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"[Download] Could not save {self.state_path}: {e}")
+
+    def _load_state(self) -> Optional[List[Dict]]:
+        """Segments of a previous attempt at the same remote file, if its partial file is intact."""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != self.url or state.get("size") != self.total or state.get("etag") != self._etag:
+            return None
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != self.total:
+            return None
+        return state.get("segments")
+
+    def _plan_segments(self, accepts_ranges: bool) -> List[Dict]:
+        if not accepts_ranges or not self.total:
+            return [{"start": 0, "end": (self.total or 0) - 1, "done": 0}]
+        count = max(1, min(self.max_connections, math.ceil(self.total / MIN_SEGMENT_SIZE)))
+        size = math.ceil(self.total / count)
+        return [{"start": start, "end": min(start + size, self.total) - 1, "done": 0}
+                for start in range(0, self.total, size)]
+
+    def _cleanup(self):
+        with self._lock:
+            self._segments = []
+        for path in (self.part_path, self.state_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # --- Transfer ---
+
+    def _stopped(self) -> bool:
+        return self.cancel.is_set() or self._failed.is_set()
+
+    def run(self):
+        """Download, verify and move into place. Raises DownloadCancelled or DownloadError."""
+        try:
+            self._run()
+        except DownloadCancelled:
+            with self._lock:
+                self.status = "cancelled"
+            self._save_state()
+            raise
+        except Exception as e:
+            with self._lock:
+                self.status = "error"
+                self.error = str(e)
+            if self._segments:
+                self._save_state()
+            raise DownloadError(f"{os.path.basename(self.dest)}: {e}") from e
+
+    def _run(self):
+        info = _remote_info(self.url)
+        self.total = info["size"]
+        self._etag = info["etag"]
+        self.expected_sha256 = self.expected_sha256 or info["sha256"]
+
+        if os.path.exists(self.dest) and self.total is not None and os.path.getsize(self.dest) == self.total:
+            with self._lock:
+                self.status = "completed"
+                self._downloaded = self.total
+            return
+
+        resumable = info["accepts_ranges"] and self.total is not None
+        segments = self._load_state() if resumable else None
+        if segments:
+            print(f"[Download] Resuming {os.path.basename(self.dest)}")
+        else:
+            segments = self._plan_segments(resumable)
+            # Preallocate so every connection writes at its own offset
+            with open(self.part_path, "wb") as f:
+                if self.total:
+                    f.truncate(self.total)
+        with self._lock:
+            self._segments = segments
+            self._downloaded = sum(segment["done"] for segment in segments)
+            self.status = "downloading"
+        self._save_state()
+
+        pending = [segment for segment in segments if segment["start"] + segment["done"] <= segment["end"]
+                   or segment["end"] < segment["start"]]
+        errors: List[BaseException] = []
+        threads = [threading.Thread(target=self._segment_worker, args=(segment, resumable, errors), daemon=True,
+                                    name=f"download-{os.path.basename(self.dest)}-{index}")
+                   for index, segment in enumerate(pending)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        if self.cancel.is_set():
+            raise DownloadCancelled()
+        self._verify()
+        os.replace(self.part_path, self.dest)
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+        with self._lock:
+            self.status = "completed"
+
+    def _segment_worker(self, segment: Dict, resumable: bool, errors: List[BaseException]):
+        attempt = 0
+        while not self._stopped():
+            try:
+                self._fetch_segment(segment, resumable)
+                return
+            except DownloadCancelled:
+                return
+            except Exception as e:
+                attempt += 1
+                if attempt > MAX_RETRIES or not resumable:
+                    errors.append(e)
+                    # Stop the other connections; their progress is kept for a later resume
+                    self._failed.set()
+                    return
+                delay = min(30, 2 ** attempt)
+                print(f"[Download] {os.path.basename(self.dest)} segment {segment['start']}: {e}; retrying in {delay}s")
+                self.cancel.wait(delay)
+
+    def _fetch_segment(self, segment: Dict, resumable: bool):
+        headers = {}
+        offset = segment["start"] + segment["done"]
+        if resumable:
+            if offset > segment["end"]:
+                return
+            headers["Range"] = f"bytes={offset}-{segment['end']}"
+        elif segment["done"]:
+            # No ranges: start over
+            with self._lock:
+                self._downloaded -= segment["done"]
+                segment["done"] = 0
+            offset = 0
+
+        with requests.get(self.url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            if resumable and response.status_code != 206:
+                raise DownloadError("Server ignored the range request")
+            # Unbuffered, so bytes counted as done are already handed to the OS
+            with open(self.part_path, "r+b", buffering=0) as f:
+                f.seek(offset)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if self._stopped():
+                        raise DownloadCancelled()
+                    if not chunk:
+                        continue
+                    if resumable:
+                        chunk = chunk[:segment["end"] + 1 - (segment["start"] + segment["done"])]
+                    f.write(chunk)
+                    self._add_bytes(segment, len(chunk))
+
+        if resumable and segment["start"] + segment["done"] <= segment["end"]:
+            raise DownloadError("Connection closed before the end of the segment")
+
+    def _verify(self):
+        if self.total is not None and os.path.getsize(self.part_path) != self.total:
+            raise DownloadError(f"Size mismatch: expected {self.total} bytes")
+        if not self.expected_sha256:
+            return
+        with self._lock:
+            self.status = "verifying"
+
+        def verified(count: int):
+            with self._lock:
+                self._verified += count
+        actual = sha256_file(self.part_path, verified)
+        if actual != self.expected_sha256:
+            # Corrupt: the next attempt starts from scratch
+            self._cleanup()
+            raise DownloadError(f"Checksum mismatch (expected {self.expected_sha256}, got {actual})")
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+class EventBroadcaster:
+    """
+    Fans events out to any number of SSE subscribers. publish() may be called from
+    any thread; delivery is pushed onto the subscribers' event loop with
+    call_soon_threadsafe, so nothing polls. Recent events are kept in a bounded
+    buffer so reconnecting clients can resume from their Last-Event-ID.
+    Ids on the wire are "<boot>-<n>": counters restart with the process, so an id
+    from an earlier run is recognised as stale instead of hiding the new events.
+    """
+
+    def __init__(self, buffer_size: int = 256, heartbeat_interval: float = 15.0):
+        self.heartbeat_interval = heartbeat_interval
+        self._buffer: Deque[Tuple[int, str]] = deque(maxlen=buffer_size)
+        self._subscribers: List[asyncio.Queue] = []
+        self._next_id = 1
+        self._boot = uuid.uuid4().hex[:8]
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def publish(self, data: str) -> int:
+        """Publishes a pre-serialized event from any thread. Returns its event id."""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            self._buffer.append((event_id, data))
+            loop = self._loop
+
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._notify, event_id, data)
+        return event_id
+
+    def _notify(self, event_id: int, data: str):
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.put_nowait((event_id, data))
+            except asyncio.QueueFull:
+                # Slow consumer: disconnect it; the client reconnects and replays via Last-Event-ID
+                self._subscribers.remove(subscriber)
+                print("[Events] Dropping lagging subscriber")
+
+    def _parse_event_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """
+        Counter of a Last-Event-ID issued by this process. Ids from another run (or
+        malformed ones) give 0, so the client gets the whole buffer; None stays None.
+        """
+        if not last_event_id:
+            return None
+        boot, _, counter = last_event_id.partition("-")
+        if boot != self._boot or not counter.isdigit() or int(counter) >= self._next_id:
+            return 0
+        return int(counter)
+
+    def _frame(self, event_id: int, data: str) -> str:
+        return f"id: {self._boot}-{event_id}\ndata: {data}\n\n"
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yields SSE frames: events newer than last_event_id from the replay buffer,
+        then live events, with comment heartbeats while idle.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._buffer.maxlen)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.append(queue)
+            after = self._parse_event_id(last_event_id)
+            replay = [event for event in self._buffer if after is not None and event[0] > after]
+
+        last_sent = after or 0
+        try:
+            for event_id, data in replay:
+                last_sent = event_id
+                yield self._frame(event_id, data)
+
+            while queue in self._subscribers or not queue.empty():
+                try:
+                    event_id, data = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                # Events published while subscribing may also be in the replay
+                if event_id <= last_sent:
+                    continue
+                last_sent = event_id
+                yield self._frame(event_id, data)
+        finally:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered": len(self._buffer),
+                "last_event_id": f"{self._boot}-{self._next_id - 1}"
+            }
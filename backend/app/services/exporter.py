@@ -0,0 +1,161 @@
+import base64
+import html
+import re
+import time
+import zipfile
+from typing import Dict, Iterator, List, Optional
+import database
+from app.services import codec, recorder
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "html": ("text/html; charset=utf-8", "html"),
+    "md": ("text/markdown; charset=utf-8", "md"),
+    "zip": ("application/zip", "zip")
+}
+
+# File extension of each stored image type
+IMAGE_EXTENSIONS = {"image/png": "png", "image/webp": "webp", "image/jpeg": "jpg"}
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; max-width: 960px; margin: 2rem auto; padding: 0 1rem; color: #18181b; }}
+section {{ margin-bottom: 2.5rem; }}
+img {{ max-width: 100%; border: 1px solid #e4e4e7; border-radius: 8px; }}
+pre {{ background: #18181b; color: #e4e4e7; padding: 1rem; border-radius: 8px; overflow-x: auto; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+
+HTML_TAIL = "</body>\n</html>\n"
+
+class _ChunkBuffer:
+    """Write-only file object that hands out whatever has been written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def export_filename(title: str, export_format: str) -> str:
+    """Same naming as the desktop Markdown export (lowercase, non-alphanumerics replaced by '_')."""
+    return f"{re.sub(r'[^a-z0-9]', '_', title, flags=re.IGNORECASE).lower() or 'tutorial'}.{EXPORT_FORMATS[export_format][1]}"
+
+def _step_title(step: Dict, number: int) -> str:
+    return step.get('element_name') or f"Passo {number}"
+
+def _step_image(step: Dict) -> Optional[Dict]:
+    """
+    Load one step's screenshot from the blob store. Steps drawn with a spotlight
+    overlay get it burned in, since exported images have no client to draw it.
+    """
+    if step.get('is_manual') or not step.get('screenshot_hash'):
+        return None
+    blob = database.get_blob(step['screenshot_hash'])
+    if not blob:
+        return None
+
+    if step.get('spotlight_overlay') and step.get('bounding_box'):
+        img = codec.decode(blob['data'])
+        if img is not None:
+            data = codec.encode(recorder.draw_spotlight(img, step['bounding_box']))
+            return {'data': data, 'mime_type': codec.mime_type()}
+    return {'data': blob['data'], 'mime_type': blob['mime_type']}
+
+def _markdown_step(step: Dict, number: int, image_ref: Optional[str]) -> str:
+    text = f"## {_step_title(step, number)}\n\n"
+    if step.get('content_type') == 'code':
+        text += f"```{step.get('code_language') or ''}\n{step.get('code_content') or ''}\n```\n\n"
+    else:
+        text += f"{step.get('description') or ''}\n\n"
+    if image_ref:
+        text += f"![Passo {number}]({image_ref})\n\n"
+    return text
+
+def _html_step(step: Dict, number: int, image_ref: Optional[str]) -> str:
+    text = f"<section>\n<h2>{html.escape(_step_title(step, number))}</h2>\n"
+    if step.get('content_type') == 'code':
+        language = html.escape(step.get('code_language') or '')
+        text += f'<pre><code class="language-{language}">{html.escape(step.get("code_content") or "")}</code></pre>\n'
+    else:
+        text += f"<p>{html.escape(step.get('description') or '')}</p>\n"
+    if image_ref:
+        text += f'<img src="{image_ref}" alt="Passo {number}" loading="lazy">\n'
+    return text + "</section>\n"
+
+def _data_uri(image: Dict) -> str:
+    return f"data:{image['mime_type']};base64,{base64.b64encode(image['data']).decode('ascii')}"
+
+def export_markdown(tutorial: Dict) -> Iterator[bytes]:
+    """Single Markdown document with images inlined as data URIs, one step at a time."""
+    yield f"# {tutorial['title']}\n\n".encode("utf-8")
+    for number, step in enumerate(tutorial['steps'], 1):
+        image = _step_image(step)
+        yield _markdown_step(step, number, _data_uri(image) if image else None).encode("utf-8")
+
+def export_html(tutorial: Dict) -> Iterator[bytes]:
+    """Single self-contained HTML page with images inlined as data URIs, one step at a time."""
+    yield HTML_HEAD.format(title=html.escape(tutorial['title'])).encode("utf-8")
+    for number, step in enumerate(tutorial['steps'], 1):
+        image = _step_image(step)
+        yield _html_step(step, number, _data_uri(image) if image else None).encode("utf-8")
+    yield HTML_TAIL.encode("utf-8")
+
+def export_zip(tutorial: Dict) -> Iterator[bytes]:
+    """
+    Zip bundle with manual.md, index.html and one file per screenshot in assets/.
+    The archive is written to a non-seekable buffer and yielded entry by entry, so
+    at most one image is in memory; only the (small) documents are accumulated.
+    """
+    buffer = _ChunkBuffer()
+    markdown = [f"# {tutorial['title']}\n\n"]
+    page = [HTML_HEAD.format(title=html.escape(tutorial['title']))]
+    timestamp = time.localtime()[:6]
+
+    with zipfile.ZipFile(buffer, mode="w") as archive:
+        for number, step in enumerate(tutorial['steps'], 1):
+            image = _step_image(step)
+            image_ref = None
+            if image:
+                image_ref = f"assets/step_{number}.{IMAGE_EXTENSIONS.get(image['mime_type'], 'bin')}"
+                # Images are already compressed; store them as-is
+                info = zipfile.ZipInfo(image_ref, date_time=timestamp)
+                info.compress_type = zipfile.ZIP_STORED
+                archive.writestr(info, image['data'])
+                yield buffer.drain()
+            markdown.append(_markdown_step(step, number, f"./{image_ref}" if image_ref else None))
+            page.append(_html_step(step, number, image_ref))
+
+        page.append(HTML_TAIL)
+        for name, content in (("manual.md", "".join(markdown)), ("index.html", "".join(page))):
+            info = zipfile.ZipInfo(name, date_time=timestamp)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content.encode("utf-8"))
+    yield buffer.drain()
+
+EXPORTERS = {"html": export_html, "md": export_markdown, "zip": export_zip}
+
+def export_tutorial(tutorial: Dict, export_format: str) -> Iterator[bytes]:
+    """Stream `tutorial` (from database.get_tutorial(..., include_screenshots=False)) in the given format."""
+    return EXPORTERS[export_format](tutorial)
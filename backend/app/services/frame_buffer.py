@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+import numpy as np
+
+# Grabber defaults: ~3 seconds of full-resolution 1080p history at 10 fps
+DEFAULT_FPS = 10
+DEFAULT_MAX_MEMORY_MB = 256
+
+class MssFrameSource:
+    """
+    Grabs the whole virtual screen (all monitors) with a single long-lived mss
+    handle. Must be created on the thread that uses it.
+    """
+
+    def __init__(self):
+        import mss
+        self._sct = mss.mss()
+
+    def grab(self) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Returns a BGRA frame and the screen coordinates of its top-left corner."""
+        monitor = self._sct.monitors[0]
+        return np.array(self._sct.grab(monitor)), (monitor["left"], monitor["top"])
+
+    def close(self):
+        self._sct.close()
+
+class FrameRingBuffer:
+    """
+    Keeps the most recent screen frames in memory, captured on a background
+    thread, so a click can be served from the frame taken just before it
+    instead of grabbing the screen on the hook's hot path.
+
+    `source_factory` builds the frame source on the grabber thread; pass a fake
+    source (anything with grab() -> (frame, (left, top))) to run without a display.
+    """
+
+    def __init__(self, source_factory: Callable[[], object] = MssFrameSource, fps: float = DEFAULT_FPS,
+                 max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, scale: float = 1.0):
+        self.source_factory = source_factory
+        self.fps = fps
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.scale = scale
+        self._frames: Deque[Tuple[float, np.ndarray, Tuple[int, int]]] = deque()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._lock:
+            self._frames.clear()
+            self._memory_bytes = 0
+
+    def _run(self):
+        try:
+            source = self.source_factory()
+        except Exception as e:
+            print(f"[Frame Buffer] Could not open frame source: {e}")
+            return
+
+        interval = 1.0 / self.fps
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    frame, origin = source.grab()
+                    self.push(frame, origin, started)
+                except Exception as e:
+                    print(f"[Frame Buffer] Grab error: {e}")
+                self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+
+    def push(self, frame: np.ndarray, origin: Tuple[int, int], timestamp: float):
+        """Adds a frame, evicting the oldest ones once the memory cap is exceeded."""
+        if self.scale != 1.0:
+            import cv2
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+        with self._lock:
+            self._frames.append((timestamp, frame, origin))
+            self._memory_bytes += frame.nbytes
+            # Always keep at least the newest frame
+            while self._memory_bytes > self.max_memory_bytes and len(self._frames) > 1:
+                _, old_frame, _ = self._frames.popleft()
+                self._memory_bytes -= old_frame.nbytes
+
+    def get_frame(self, timestamp: float) -> Optional[Tuple[float, np.ndarray, Tuple[int, int]]]:
+        """
+        Returns (timestamp, frame, origin) for the newest frame taken at or before
+        `timestamp` (the state the user saw when clicking), else the oldest frame.
+        """
+        with self._lock:
+            if not self._frames:
+                return None
+            best = self._frames[0]
+            for entry in reversed(self._frames):
+                if entry[0] <= timestamp:
+                    best = entry
+                    break
+            return best
+
+    def crop_region(self, region: dict, timestamp: float) -> Tuple[Optional[np.ndarray], Optional[dict]]:
+        """
+        Crops a screen region (mss-style dict) from the frame closest to the click,
+        clamped to the frame. Returns (BGRA image, region) like capture_screen_region.
+        """
+        entry = self.get_frame(timestamp)
+        if entry is None:
+            return None, None
+        _, frame, (origin_x, origin_y) = entry
+
+        frame_h, frame_w = frame.shape[:2]
+        screen_w = int(round(frame_w / self.scale))
+        screen_h = int(round(frame_h / self.scale))
+
+        left = max(origin_x, region["left"])
+        top = max(origin_y, region["top"])
+        width = min(region["left"] + region["width"], origin_x + screen_w) - left
+        height = min(region["top"] + region["height"], origin_y + screen_h) - top
+        if width <= 0 or height <= 0:
+            return None, None
+
+        # Map screen coordinates into (possibly downscaled) frame coordinates
+        fx0 = int((left - origin_x) * self.scale)
+        fy0 = int((top - origin_y) * self.scale)
+        fx1 = max(fx0 + 1, int((left - origin_x + width) * self.scale))
+        fy1 = max(fy0 + 1, int((top - origin_y + height) * self.scale))
+        crop = frame[fy0:fy1, fx0:fx1].copy()
+
+        if self.scale != 1.0:
+            import cv2
+            crop = cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+
+        return crop, {**region, "top": top, "left": left, "width": width, "height": height}
+
+# Global instance, started while recording
+grabber = FrameRingBuffer()
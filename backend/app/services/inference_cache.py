@@ -0,0 +1,141 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+# Separate from tutorials.db: the cache is disposable and can be deleted at any time
+CACHE_DB_PATH = Path(__file__).resolve().parents[2] / "inference_cache.db"
+
+# Recency updates from hits are written in batches of this size (or with the next insert)
+TOUCH_FLUSH_SIZE = 64
+
+def cache_key(image_data: bytes, prompt: str, model_id: str) -> str:
+    """SHA-256 over the model id, the prompt and the encoded image exactly as sent to the model."""
+    digest = hashlib.sha256()
+    for part in (model_id.encode("utf-8"), prompt.encode("utf-8"), image_data):
+        # Length-prefixed so parts can't run into each other
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+class InferenceCache:
+    """
+    Persistent LRU of model outputs. Entries are kept in memory (they're short
+    strings) so a hit never touches the disk; inserts, evictions and recency
+    are written through to SQLite so the cache survives restarts.
+    Only successful generations should be stored.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 5000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._conn = self._open()
+        self._load()
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        try:
+            # Shared by the refinement worker and the API threads, guarded by self._lock
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS inference_cache (
+                    key TEXT PRIMARY KEY,
+                    model_id TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_inference_cache_last_used ON inference_cache(last_used)")
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            # Still works as an in-memory cache
+            print(f"[Inference Cache] Could not open {self.path}: {e}")
+            return None
+
+    def _load(self):
+        """Load the most recently used entries, oldest first."""
+        if self._conn is None:
+            return
+        rows = self._conn.execute(
+            "SELECT key, result FROM inference_cache ORDER BY last_used DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, result in reversed(rows):
+            self._entries[key] = result
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_FLUSH_SIZE:
+                self._write(lambda conn: None)
+            return result
+
+    def put(self, key: str, result: str, model_id: str):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._stats["stored"] += 1
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self._stats["evicted"] += 1
+
+            now = time.time()
+            def write(conn: sqlite3.Connection):
+                conn.execute(
+                    "INSERT OR REPLACE INTO inference_cache (key, model_id, result, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, model_id, result, now, now)
+                )
+                conn.executemany("DELETE FROM inference_cache WHERE key = ?", [(k,) for k in evicted])
+            self._write(write)
+
+    def _write(self, operation):
+        """Run `operation` plus pending recency updates in one transaction (lock held)."""
+        touched, self._touched = self._touched, {}
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE inference_cache SET last_used = ? WHERE key = ?",
+                    [(used, key) for key, used in touched.items()]
+                )
+                operation(self._conn)
+        except sqlite3.Error as e:
+            print(f"[Inference Cache] Write failed: {e}")
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._touched = {}
+            self._write(lambda conn: conn.execute("DELETE FROM inference_cache"))
+            return count
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+# Global instance used by LLMEngine.generate_description
+cache = InferenceCache(CACHE_DB_PATH)
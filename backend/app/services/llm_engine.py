@@ -1,70 +1,414 @@
+import gc
+import json
 import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import llama_cpp
 from llama_cpp import Llama
 from llama_cpp.llama_chat_format import Llava15ChatHandler
-from app.services import model_manager
+from app.services import model_manager, inference_cache, codec
+
+# Failed inferences are returned as text starting with this
+INFERENCE_ERROR_PREFIX = "Error generating description: "
+
+# Engine preferences, kept next to the models (see /settings/engine)
+ENGINE_SETTINGS_PATH = os.path.join(model_manager.MODELS_DIR, "engine_settings.json")
+DEFAULT_ENGINE_SETTINGS = {
+    "preload_model_id": None,   # Loaded in the background at startup; the last model loaded
+    "preload_on_start": True,
+    "warm_up": True,            # Run one tiny inference after loading to page the weights in
+    "idle_unload_minutes": 15,  # Free the model after this long without inference (0 = never)
+    # model_id -> {"profile": name or "auto", "overrides": {param: value}} (see model_manager.PROFILE_PARAMS)
+    "model_profiles": {}
+}
+
+# How often the idle monitor looks at the last inference time (seconds)
+IDLE_CHECK_INTERVAL = 30
 
 class LLMEngine:
+    """
+    Owns the llama.cpp model. Loading runs on a background thread (startup preload
+    or /settings/models/load) and reports its progress through get_status():
+    unloaded -> loading -> warming_up -> ready (or error). The model is freed after
+    `idle_unload_minutes` without inference and reloaded on the next request.
+    """
     _instance = None
-    _model = None
-    _model_id = None
     
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
             cls._instance = LLMEngine()
         return cls._instance
-    
+
+    def __init__(self):
+        self._model = None
+        self._model_id = None
+        # The model isn't thread-safe: loading, unloading and inference hold this lock
+        self._model_lock = threading.RLock()
+        self._state_lock = threading.Lock()
+        self._status = "unloaded"
+        self._error: Optional[str] = None
+        self._pending_id: Optional[str] = None   # Being loaded, or unloaded while idle and reloaded on demand
+        self._loaded_at: Optional[float] = None
+        self._params: Optional[Dict] = None  # Effective profile of the loaded model
+        self._last_used: Optional[float] = None
+        self._settings = self._read_settings()
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- Settings ---
+
+    def _read_settings(self) -> Dict:
+        settings = dict(DEFAULT_ENGINE_SETTINGS)
+        try:
+            with open(ENGINE_SETTINGS_PATH, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            settings.update({key: value for key, value in stored.items() if key in settings})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[Engine] Could not read {ENGINE_SETTINGS_PATH}: {e}")
+        return settings
+
+    def get_settings(self) -> Dict:
+        with self._state_lock:
+            return dict(self._settings)
+
+    def update_settings(self, preload_model_id: Optional[str] = None, preload_on_start: Optional[bool] = None,
+                        warm_up: Optional[bool] = None, idle_unload_minutes: Optional[float] = None) -> Dict:
+        """Validate, apply and persist engine preferences. Raises ValueError on bad values."""
+        if preload_model_id is not None and not any(m["id"] == preload_model_id for m in model_manager.SUPPORTED_MODELS):
+            raise ValueError(f"Unknown model: {preload_model_id}")
+        if idle_unload_minutes is not None and idle_unload_minutes < 0:
+            raise ValueError("idle_unload_minutes must be >= 0")
+
+        with self._state_lock:
+            for key, value in (("preload_model_id", preload_model_id), ("preload_on_start", preload_on_start),
+                               ("warm_up", warm_up), ("idle_unload_minutes", idle_unload_minutes)):
+                if value is not None:
+                    self._settings[key] = value
+            settings = dict(self._settings)
+        return self._save_settings(settings)
+
+    def get_model_profile(self, model_id: str) -> Dict:
+        """Selected profile ("auto" follows model_manager.recommend_profile) and overrides of a model."""
+        selection = self.get_settings()["model_profiles"].get(model_id, {})
+        return {"profile": selection.get("profile", "auto"), "overrides": dict(selection.get("overrides", {}))}
+
+    def set_model_profile(self, model_id: str, profile: Optional[str] = None, overrides: Optional[Dict] = None) -> Dict:
+        """
+        Choose a model's profile and/or replace its overrides. Raises ValueError on bad
+        values. A loaded model whose effective parameters change is reloaded in the background.
+        """
+        if model_manager.get_model_config(model_id) is None:
+            raise ValueError(f"Unknown model: {model_id}")
+        if profile is not None and profile != "auto" and profile not in model_manager.get_profiles(model_id):
+            raise ValueError(f"Unknown profile: {profile}")
+        if overrides is not None:
+            model_manager.validate_profile_overrides(overrides)
+
+        with self._state_lock:
+            profiles = dict(self._settings["model_profiles"])
+            selection = dict(profiles.get(model_id, {"profile": "auto", "overrides": {}}))
+            if profile is not None:
+                selection["profile"] = profile
+            if overrides is not None:
+                selection["overrides"] = overrides
+            profiles[model_id] = selection
+            self._settings["model_profiles"] = profiles
+            settings = dict(self._settings)
+            reload = self._model_id == model_id and self._params != self._resolve_params(model_id, settings)
+        self._save_settings(settings)
+
+        if reload:
+            print(f"[Engine] Profile of {model_id} changed, reloading")
+            self.load_model_async(model_id)
+        return self.get_model_profile(model_id)
+
+    @staticmethod
+    def _resolve_params(model_id: str, settings: Dict) -> Dict:
+        selection = settings["model_profiles"].get(model_id, {})
+        return model_manager.resolve_profile(model_id, selection.get("profile"), selection.get("overrides"))
+
+    def _save_settings(self, settings: Dict) -> Dict:
+        tmp_path = ENGINE_SETTINGS_PATH + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(settings, f, indent=2)
+            os.replace(tmp_path, ENGINE_SETTINGS_PATH)
+        except OSError as e:
+            print(f"[Engine] Could not save {ENGINE_SETTINGS_PATH}: {e}")
+        return settings
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the idle monitor and preload the configured model in the background. Never blocks."""
+        if self._monitor is None:
+            self._stop.clear()
+            self._monitor = threading.Thread(target=self._idle_monitor, name="model-idle-monitor", daemon=True)
+            self._monitor.start()
+
+        settings = self.get_settings()
+        model_id = settings["preload_model_id"]
+        if not settings["preload_on_start"] or not model_id:
+            return
+        if not any(m["id"] == model_id and m["downloaded"] for m in model_manager.get_models_status()):
+            print(f"[Engine] Preload skipped: {model_id} is not downloaded")
+            return
+        print(f"[Engine] Preloading {model_id} in the background")
+        self.load_model_async(model_id)
+
+    def stop(self):
+        self._stop.set()
+        self._monitor = None
+
+    def get_status(self) -> Dict:
+        with self._state_lock:
+            settings = self._settings
+            last_used = self._last_used
+            return {
+                "status": self._status,
+                "model_id": self._model_id,
+                "pending_model_id": self._pending_id,
+                "error": self._error,
+                "loaded_at": self._loaded_at,
+                "profile": self._params,
+                "idle_seconds": round(time.time() - last_used, 1) if last_used and self._model_id else None,
+                "idle_unload_minutes": settings["idle_unload_minutes"]
+            }
+
+    def _set_status(self, status: str, error: Optional[str] = None):
+        with self._state_lock:
+            self._status = status
+            self._error = error
+
+    def load_model_async(self, model_id: str) -> Dict:
+        """Load (and warm up) a model on a background thread. Returns the status right away."""
+        with self._state_lock:
+            busy = self._status in ("loading", "warming_up") and self._pending_id == model_id
+            loaded = (self._status == "ready" and self._model_id == model_id and
+                      self._params == self._resolve_params(model_id, self._settings))
+            if not busy and not loaded:
+                # Visible on /health before the loader thread gets the lock
+                self._status = "loading"
+                self._error = None
+                self._pending_id = model_id
+                threading.Thread(target=self._load_in_background, args=(model_id,), name="model-loader",
+                                 daemon=True).start()
+        return self.get_status()
+
+    def _load_in_background(self, model_id: str):
+        try:
+            self.load_model(model_id)
+        except Exception:
+            pass  # Reported through get_status()
+
     def load_model(self, model_id: str):
         """
         Loads the specified model into memory. Unloads previous model if exists.
         """
-        if self._model_id == model_id and self._model is not None:
-            return # Already loaded
-            
-        print(f"Loading model: {model_id}...")
-        
-        # Find model config
-        config = next((m for m in model_manager.SUPPORTED_MODELS if m["id"] == model_id), None)
-        if not config:
-            raise ValueError(f"Model {model_id} not found configuration")
+        with self._model_lock:
+            params = self._resolve_params(model_id, self.get_settings())
+            if self._model_id == model_id and self._model is not None and self._params == params:
+                return # Already loaded
+                
+            print(f"Loading model: {model_id}...")
+            with self._state_lock:
+                self._status = "loading"
+                self._error = None
+                self._pending_id = model_id
             
-        model_path = os.path.join(model_manager.MODELS_DIR, config["filename"])
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
-            
-        # Setup Chat Handler (needed for Vision)
-        chat_handler = None
-        if "llava" in model_id:
-            mmproj_path = os.path.join(model_manager.MODELS_DIR, config["mmproj"])
-            if not os.path.exists(mmproj_path):
-                 raise FileNotFoundError(f"Projector file not found: {mmproj_path}")
-                 
-            chat_handler = Llava15ChatHandler(clip_model_path=mmproj_path)
-        
-        # Initialize Llama
-        # n_ctx=2048 is usually enough for single image + short description
-        # n_gpu_layers=-1 tries to offload all to GPU if available
+            try:
+                # Find model config
+                config = next((m for m in model_manager.SUPPORTED_MODELS if m["id"] == model_id), None)
+                if not config:
+                    raise ValueError(f"Model {model_id} not found configuration")
+                    
+                model_path = os.path.join(model_manager.MODELS_DIR, config["filename"])
+                if not os.path.exists(model_path):
+                    raise FileNotFoundError(f"Model file not found: {model_path}")
+                    
+                # Setup Chat Handler (needed for Vision)
+                chat_handler = None
+                if "llava" in model_id:
+                    mmproj_path = os.path.join(model_manager.MODELS_DIR, config["mmproj"])
+                    if not os.path.exists(mmproj_path):
+                         raise FileNotFoundError(f"Projector file not found: {mmproj_path}")
+                         
+                    chat_handler = Llava15ChatHandler(clip_model_path=mmproj_path)
+
+                # Two 4+ GB models rarely fit side by side
+                self._release_model()
+                
+                # Initialize Llama with the model's resource profile (see model_manager.DEFAULT_PROFILES)
+                print(f"[Engine] Profile: {params}")
+                kv_type = getattr(llama_cpp, f"GGML_TYPE_{params['kv_cache_type'].upper()}")
+                started = time.perf_counter()
+                self._model = Llama(
+                    model_path=model_path,
+                    chat_handler=chat_handler,
+                    n_ctx=params["n_ctx"],
+                    n_gpu_layers=params["n_gpu_layers"],
+                    n_threads=params["n_threads"],
+                    n_threads_batch=params["n_threads"],
+                    n_batch=params["n_batch"],
+                    use_mmap=params["use_mmap"],
+                    use_mlock=params["use_mlock"],
+                    type_k=kv_type,
+                    type_v=kv_type,
+                    # llama.cpp needs flash attention for a quantized V cache
+                    flash_attn=params["kv_cache_type"] != "f16",
+                    verbose=True
+                )
+                self._model_id = model_id
+                self._params = params
+                print(f"Model {model_id} loaded successfully in {time.perf_counter() - started:.1f}s.")
+
+                if self.get_settings()["warm_up"]:
+                    self._set_status("warming_up")
+                    self._warm_up()
+            except Exception as e:
+                print(f"Failed to load model: {e}")
+                with self._state_lock:
+                    self._status = "error"
+                    self._error = str(e)
+                    self._pending_id = None
+                raise e
+
+            with self._state_lock:
+                self._status = "ready"
+                self._pending_id = None
+                self._loaded_at = self._last_used = time.time()
+        # Preloaded on the next start
+        self.update_settings(preload_model_id=model_id)
+
+    def _warm_up(self):
+        """One tiny inference so the weights and the projector are paged in before the first real request."""
+        started = time.perf_counter()
+        blank = codec.encode_for_vision(np.full((32, 32, 3), 255, np.uint8))
         try:
-            self._model = Llama(
-                model_path=model_path,
-                chat_handler=chat_handler,
-                n_ctx=2048,
-                n_gpu_layers=-1, 
-                verbose=True
-            )
-            self._model_id = model_id
-            print(f"Model {model_id} loaded successfully.")
+            self._model.create_chat_completion(messages=self._messages(blank, "OK"), max_tokens=1)
+            print(f"[Engine] Warm-up finished in {time.perf_counter() - started:.1f}s")
         except Exception as e:
-            print(f"Failed to load model: {e}")
-            raise e
+            # Not fatal: the first real inference just pays the cost
+            print(f"[Engine] Warm-up failed: {e}")
 
-    def generate_description(self, image_base64: str, prompt: str = "Describe this UI element.") -> str:
-        if not self._model:
+    def unload(self, reload_on_demand: bool = False) -> bool:
+        """Free the model. With reload_on_demand, the next inference loads it again."""
+        with self._model_lock:
+            if self._model is None:
+                return False
+            model_id = self._model_id
+            self._release_model()
+            with self._state_lock:
+                self._status = "unloaded"
+                self._pending_id = model_id if reload_on_demand else None
+            print(f"[Engine] Unloaded {model_id}")
+            return True
+
+    def _release_model(self):
+        if self._model is None:
+            return
+        close = getattr(self._model, "close", None)
+        if close is not None:
+            close()
+        self._model = None
+        self._model_id = None
+        self._params = None
+        self._loaded_at = None
+        gc.collect()
+
+    def _ensure_model(self):
+        """Called with the model lock held: load the pending model (idle unload, preload in progress)."""
+        if self._model is not None:
+            return
+        with self._state_lock:
+            model_id = self._pending_id
+        if model_id is None:
             raise RuntimeError("No model loaded. Please load a model first.")
-            
+        self.load_model(model_id)
+
+    def _idle_monitor(self):
+        while not self._stop.wait(IDLE_CHECK_INTERVAL):
+            limit = self.get_settings()["idle_unload_minutes"] * 60
+            with self._state_lock:
+                idle = time.time() - self._last_used if self._last_used else 0
+            if not limit or self._model is None or idle < limit:
+                continue
+            # Don't wait behind a running inference; look again on the next check
+            if not self._model_lock.acquire(blocking=False):
+                continue
+            try:
+                print(f"[Engine] Idle for {idle / 60:.1f} min, unloading")
+                self.unload(reload_on_demand=True)
+            finally:
+                self._model_lock.release()
+
+    # --- Inference ---
+
+    def generate_description(self, image_base64: str, prompt: str = "Describe this UI element.") -> str:
+        for _, description in self.generate_descriptions_sequential([(image_base64, prompt)]):
+            return description
+
+    def generate_descriptions_sequential(self, items: List[Tuple[str, str]],
+                                         on_token: Optional[Callable[[int, str], None]] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Convenience wrapper that describes several (image_base64, prompt) pairs one
+        after the other, yielding (index, description) as each one is ready: cached
+        answers first, then one full inference per distinct pair, so duplicates (the
+        same button clicked twice) run once. Nothing is shared between inferences:
+        each image is encoded and decoded on its own, with no prompt/KV prefix reuse.
+        With `on_token`, inferences are streamed and it receives (index, text so far)
+        after every token.
+        """
+        with self._model_lock:
+            self._ensure_model()
+            model_id = self._model_id
+
+        # The same element (e.g. a "Salvar" button) is described again on every click
+        pending: Dict[str, List[int]] = {}
+        for index, (image_base64, prompt) in enumerate(items):
+            key = inference_cache.cache_key(image_base64.encode("ascii"), prompt, model_id)
+            cached = inference_cache.cache.get(key)
+            if cached is not None:
+                yield index, cached
+            else:
+                pending.setdefault(key, []).append(index)
+
+        def fan_out(indexes: List[int]) -> Callable[[str], None]:
+            # Duplicates of a pair all see its partial output
+            def stream(text: str):
+                for index in indexes:
+                    on_token(index, text)
+            return stream
+
+        for key, indexes in pending.items():
+            image_base64, prompt = items[indexes[0]]
+            stream = fan_out(indexes) if on_token is not None else None
+            with self._model_lock:
+                # May have been unloaded while idle between two batches
+                self._ensure_model()
+                description = self._infer(image_base64, prompt, stream)
+                with self._state_lock:
+                    self._last_used = time.time()
+            # Errors and empty answers are not cached, so they are retried next time
+            if description and not description.startswith(INFERENCE_ERROR_PREFIX):
+                inference_cache.cache.put(key, description, model_id)
+            for index in indexes:
+                yield index, description
+
+    def _record_throughput(self, tokens: int, started: float):
+        if self._params is not None:
+            model_manager.record_throughput(self._model_id, self._params["profile"], tokens, time.perf_counter() - started)
+
+    @staticmethod
+    def _messages(image_base64: str, prompt: str) -> List[Dict]:
         # Prepare message for LLaVA
         # LLaVA expects a specific format with image URI
-        messages = [
+        return [
             {
                 "role": "user",
                 "content": [
@@ -73,18 +417,40 @@ class LLMEngine:
                 ]
             }
         ]
+
+    def _infer(self, image_base64: str, prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        messages = self._messages(image_base64, prompt)
         
+        started = time.perf_counter()
         try:
-            response = self._model.create_chat_completion(
+            if on_token is None:
+                response = self._model.create_chat_completion(
+                    messages=messages,
+                    max_tokens=100,
+                    temperature=0.2
+                )
+                self._record_throughput(response.get("usage", {}).get("completion_tokens", 0), started)
+                return response["choices"][0]["message"]["content"].strip()
+
+            # Streamed: the first words reach the UI long before the whole answer
+            text = ""
+            tokens = 0
+            for chunk in self._model.create_chat_completion(
                 messages=messages,
                 max_tokens=100,
-                temperature=0.2
-            )
-            
-            return response["choices"][0]["message"]["content"].strip()
+                temperature=0.2,
+                stream=True
+            ):
+                token = chunk["choices"][0]["delta"].get("content")
+                if token:
+                    tokens += 1
+                    text += token
+                    on_token(text.strip())
+            self._record_throughput(tokens, started)
+            return text.strip()
         except Exception as e:
             print(f"Inference error: {e}")
-            return f"Error generating description: {e}"
+            return f"{INFERENCE_ERROR_PREFIX}{e}"
 
 # Global instance
 engine = LLMEngine.get_instance()
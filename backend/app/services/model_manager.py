@@ -1,14 +1,50 @@
 import os
-import requests
-from huggingface_hub import hf_hub_download
+import sys
+import json
+import ctypes
 from typing import List, Dict, Optional
 import threading
-import time
+from app.services.downloader import FileDownload, DownloadCancelled, DownloadError
 
 # Directory to store models
 MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# Where model files are fetched from (/{repo_id}/resolve/{revision}/{filename}).
+# HF_ENDPOINT points it at a mirror or a local server, as in huggingface_hub
+HF_ENDPOINT = os.environ.get("HF_ENDPOINT", "https://huggingface.co").rstrip("/")
+
+# Tunable llama.cpp parameters of a profile. n_threads None = auto (see detect_system);
+# kv_cache_type quantizes the KV cache ("f16", "q8_0", "q4_0"; quantized needs flash attention)
+PROFILE_PARAMS = {
+    "n_threads": (int, type(None)),
+    "n_batch": int,
+    "n_ctx": int,
+    "n_gpu_layers": int,
+    "use_mmap": bool,
+    "use_mlock": bool,
+    "kv_cache_type": str
+}
+KV_CACHE_TYPES = ("f16", "q8_0", "q4_0")
+
+# Profiles every model starts from; entries in a model's "profiles" override these
+DEFAULT_PROFILES = {
+    # Whole model on the GPU; the CPU only feeds it
+    "gpu": {"n_threads": None, "n_batch": 512, "n_ctx": 2048, "n_gpu_layers": -1,
+            "use_mmap": True, "use_mlock": False, "kv_cache_type": "f16"},
+    # CPU-only laptops: smaller batches, 8-bit KV cache, threads left for the capture workers
+    "cpu": {"n_threads": None, "n_batch": 256, "n_ctx": 2048, "n_gpu_layers": 0,
+            "use_mmap": True, "use_mlock": False, "kv_cache_type": "q8_0"},
+    # Below the model's RAM requirement: shorter context and 4-bit KV cache, pages stay evictable
+    "low_memory": {"n_threads": None, "n_batch": 128, "n_ctx": 1024, "n_gpu_layers": 0,
+                   "use_mmap": True, "use_mlock": False, "kv_cache_type": "q4_0"}
+}
+
+# Measured generation speed per model and profile (see record_throughput)
+PROFILE_STATS_PATH = os.path.join(MODELS_DIR, "profile_stats.json")
+_stats_lock = threading.Lock()
+_system_info: Optional[Dict] = None
+
 # Supported Models Configuration
 SUPPORTED_MODELS = [
     {
@@ -18,7 +54,10 @@ SUPPORTED_MODELS = [
         "filename": "ggml-model-q4_k.gguf",
         "mmproj": "mmproj-model-f16.gguf", # Projector file needed for LLaVA
         "description": "Good balance of speed and quality. Requires ~8GB RAM.",
-        "size": "4.08 GB"
+        "size": "4.08 GB",
+        "ram_gb": 8,
+        # One image (576 tokens) plus the prompt and answer fit in 1024 tokens
+        "profiles": {"low_memory": {"n_ctx": 1024}}
     },
     # NOTE: Llama 3.2 Vision uses 'mllama' architecture which requires llama.cpp with mllama support
     # Current llama-cpp-python version may not support this yet
@@ -41,6 +80,8 @@ download_status = {
     "status": "idle", # idle, downloading, error, completed
     "error": None
 }
+_download_lock = threading.Lock()
+_downloads: List[FileDownload] = []
 
 def get_models_status() -> List[Dict]:
     """
@@ -64,84 +105,207 @@ def get_models_status() -> List[Dict]:
         })
     return results
 
-def download_file_thread(repo_id, filename, local_dir, is_last_file=True):
-    global download_status
-    try:
-        download_status["status"] = "downloading"
-        download_status["progress"] = 0
-        
-        print(f"Starting download: {repo_id}/{filename}")
-        
-        # Simulate progress in a separate thread since hf_hub_download is blocking
-        stop_progress = False
-        
-        def simulate_progress():
-            current = 0
-            while not stop_progress and current < 95:
-                # Slow down as we get closer to 95%
-                step = 5 if current < 50 else (2 if current < 80 else 0.5)
-                current += step
-                download_status["progress"] = current
-                time.sleep(0.5)
-                
-        progress_thread = threading.Thread(target=simulate_progress)
-        progress_thread.start()
-        
+def file_url(repo_id: str, filename: str, revision: str = "main") -> str:
+    return f"{HF_ENDPOINT}/{repo_id}/resolve/{revision}/{filename}"
+
+def _download_files(model: Dict, files: List[FileDownload]):
+    """Run the model's files concurrently and publish the outcome in download_status."""
+    errors = []
+
+    def run(file: FileDownload):
         try:
-            hf_hub_download(
-                repo_id=repo_id,
-                filename=filename,
-                local_dir=local_dir,
-                local_dir_use_symlinks=False
-            )
-        finally:
-            stop_progress = True
-            progress_thread.join()
-        
-        if is_last_file:
+            file.run()
+        except (DownloadError, DownloadCancelled) as e:
+            errors.append(str(e))
+        except Exception as e:
+            errors.append(f"{os.path.basename(file.dest)}: {e}")
+
+    threads = [threading.Thread(target=run, args=(file,), daemon=True) for file in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with _download_lock:
+        if errors:
+            print(f"Download error: {'; '.join(errors)}")
+            download_status["status"] = "error"
+            download_status["error"] = "; ".join(errors)
+        else:
+            print(f"Download completed: {model['id']} (All files finished)")
             download_status["progress"] = 100
             download_status["status"] = "completed"
-            print(f"Download completed: {filename} (All files finished)")
-        else:
-            print(f"Download completed: {filename} (Proceeding to next file...)")
-            # Keep status as 'downloading' for the next file
-        
-    except Exception as e:
-        print(f"Download error: {e}")
-        download_status["status"] = "error"
-        download_status["error"] = str(e)
 
 def start_download(model_id: str):
-    global download_status
-    
-    if download_status["status"] == "downloading":
-        return {"error": "Download already in progress"}
-    
-    model = next((m for m in SUPPORTED_MODELS if m["id"] == model_id), None)
+    """
+    Download the model and its projector in parallel. Partial files from an earlier
+    attempt are resumed; checksums come from the model's optional "sha256" map
+    ({filename: hex}) or, failing that, from the Hugging Face LFS headers.
+    """
+    global _downloads
+
+    model = get_model_config(model_id)
     if not model:
         return {"error": "Model not found"}
-        
-    download_status["model_id"] = model_id
-    download_status["error"] = None
-    
-    # Start thread
-    def run_download():
-        # Download projector first if needed
-        if model.get("mmproj"):
-            # Pass is_last_file=False so it doesn't mark as completed yet
-            download_file_thread(model["repo_id"], model["mmproj"], MODELS_DIR, is_last_file=False)
-            if download_status["status"] == "error": return
-            
-            # Reset for next file
-            time.sleep(1)
-            
-        # Download main model (is_last_file=True by default)
-        download_file_thread(model["repo_id"], model["filename"], MODELS_DIR, is_last_file=True)
-        
-    thread = threading.Thread(target=run_download)
-    thread.start()
-    
+
+    with _download_lock:
+        if download_status["status"] == "downloading":
+            return {"error": "Download already in progress"}
+
+        checksums = model.get("sha256", {})
+        filenames = [name for name in (model.get("mmproj"), model["filename"]) if name]
+        _downloads = [FileDownload(file_url(model["repo_id"], name), os.path.join(MODELS_DIR, name), checksums.get(name))
+                      for name in filenames]
+        download_status.clear()
+        download_status.update({"model_id": model_id, "progress": 0, "status": "downloading", "error": None})
+
+    print(f"Starting download: {model['repo_id']} ({', '.join(filenames)})")
+    threading.Thread(target=_download_files, args=(model, _downloads), daemon=True).start()
     return {"status": "started"}
 
-def get_current_download_progress():
-    return download_status
+def get_current_download_progress() -> Dict:
+    """
+    download_status plus byte-level progress of the current download: totals,
+    combined speed (bytes/s over the last few seconds), ETA and per-file state.
+    """
+    with _download_lock:
+        status = dict(download_status)
+        files = [file.progress() for file in _downloads]
+    if not files:
+        return status
+
+    downloaded = sum(file["downloaded_bytes"] for file in files)
+    total = sum(file["total_bytes"] or 0 for file in files)
+    known = all(file["total_bytes"] is not None for file in files)
+    speed = sum(file["speed_bps"] for file in files)
+    if status["status"] == "downloading" and known and total:
+        # Completion is only announced after verification; stay just below 100
+        status["progress"] = round(min(99.9, downloaded / total * 100), 1)
+    status.update({
+        "downloaded_bytes": downloaded,
+        "total_bytes": total if known else None,
+        "speed_bps": round(speed, 1),
+        "eta_seconds": round((total - downloaded) / speed) if known and speed > 0 else None,
+        "verifying": any(file["status"] == "verifying" for file in files),
+        "files": files
+    })
+    return status
+
+# --- Resource profiles ---
+
+def _total_ram_bytes() -> Optional[int]:
+    if sys.platform == "win32":
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return None
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def detect_system() -> Dict:
+    """Cores, RAM and GPU offload support, detected once."""
+    global _system_info
+    if _system_info is None:
+        logical = os.cpu_count() or 1
+        # Without psutil, assume SMT on machines with more than 4 logical cores
+        physical = logical // 2 if logical > 4 else logical
+        ram = _total_ram_bytes()
+        try:
+            import llama_cpp
+            gpu_offload = bool(llama_cpp.llama_supports_gpu_offload())
+        except Exception:
+            gpu_offload = False
+        _system_info = {
+            "logical_cores": logical,
+            "physical_cores": physical,
+            "ram_gb": round(ram / 1024 ** 3, 1) if ram else None,
+            "gpu_offload": gpu_offload,
+            # Two cores stay free for the capture workers and input hooks
+            "auto_threads": max(1, min(physical, logical - 2))
+        }
+    return _system_info
+
+def get_model_config(model_id: str) -> Optional[Dict]:
+    return next((m for m in SUPPORTED_MODELS if m["id"] == model_id), None)
+
+def get_profiles(model_id: str) -> Dict[str, Dict]:
+    """The model's profiles: DEFAULT_PROFILES with its own overrides applied."""
+    model = get_model_config(model_id) or {}
+    own = model.get("profiles", {})
+    return {name: {**params, **own.get(name, {})} for name, params in DEFAULT_PROFILES.items()}
+
+def recommend_profile(model_id: str) -> str:
+    system = detect_system()
+    model = get_model_config(model_id) or {}
+    if system["gpu_offload"]:
+        return "gpu"
+    if system["ram_gb"] is not None and system["ram_gb"] < model.get("ram_gb", 0):
+        return "low_memory"
+    return "cpu"
+
+def validate_profile_overrides(overrides: Dict) -> Dict:
+    """Check names and types of profile parameter overrides. Raises ValueError."""
+    for key, value in overrides.items():
+        if key not in PROFILE_PARAMS:
+            raise ValueError(f"Unknown profile parameter: {key}")
+        expected = PROFILE_PARAMS[key]
+        # bool is an int subclass; don't accept True as a thread count
+        if (isinstance(value, bool) and expected is not bool) or not isinstance(value, expected):
+            raise ValueError(f"Invalid value for {key}: {value!r}")
+    if "kv_cache_type" in overrides and overrides["kv_cache_type"] not in KV_CACHE_TYPES:
+        raise ValueError(f"kv_cache_type must be one of {', '.join(KV_CACHE_TYPES)}")
+    for key in ("n_batch", "n_ctx", "n_threads"):
+        if isinstance(overrides.get(key), int) and overrides[key] < 1:
+            raise ValueError(f"{key} must be positive")
+    return overrides
+
+def resolve_profile(model_id: str, profile: Optional[str] = None, overrides: Optional[Dict] = None) -> Dict:
+    """
+    Effective load parameters: the named profile (or the recommended one when None/"auto")
+    plus user overrides, with automatic values filled in.
+    """
+    profiles = get_profiles(model_id)
+    name = profile if profile in profiles else recommend_profile(model_id)
+    params = {**profiles[name], **(overrides or {})}
+    if params["n_threads"] is None:
+        params["n_threads"] = detect_system()["auto_threads"]
+    return {"profile": name, **params}
+
+def _read_profile_stats() -> Dict:
+    try:
+        with open(PROFILE_STATS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_profile_stats(model_id: str) -> Dict[str, Dict]:
+    with _stats_lock:
+        return _read_profile_stats().get(model_id, {})
+
+def record_throughput(model_id: str, profile: str, tokens: int, seconds: float):
+    """Add one inference to the model/profile's running tokens per second (prompt processing included)."""
+    if tokens <= 0 or seconds <= 0:
+        return
+    with _stats_lock:
+        stats = _read_profile_stats()
+        entry = stats.setdefault(model_id, {}).setdefault(profile, {"tokens": 0, "seconds": 0.0, "samples": 0})
+        entry["tokens"] += tokens
+        entry["seconds"] = round(entry["seconds"] + seconds, 3)
+        entry["samples"] += 1
+        entry["tokens_per_second"] = round(entry["tokens"] / entry["seconds"], 2)
+        tmp_path = PROFILE_STATS_PATH + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp_path, PROFILE_STATS_PATH)
+        except OSError as e:
+            print(f"[Profiles] Could not save {PROFILE_STATS_PATH}: {e}")
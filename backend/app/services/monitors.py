@@ -0,0 +1,124 @@
+import ctypes
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Windows constants
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN = 76, 77
+SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 78, 79
+SM_CMONITORS = 80
+MONITOR_DEFAULTTONEAREST = 2
+MDT_EFFECTIVE_DPI = 0
+BASE_DPI = 96
+
+def _monitor_scale(left: int, top: int, width: int, height: int) -> float:
+    """Effective DPI scale of the monitor (1.0 = 96 DPI). Always 1.0 off Windows."""
+    if sys.platform != "win32":
+        return 1.0
+    try:
+        from ctypes import wintypes
+        point = wintypes.POINT(left + width // 2, top + height // 2)
+        hmonitor = ctypes.windll.user32.MonitorFromPoint(point, MONITOR_DEFAULTTONEAREST)
+        dpi_x, dpi_y = ctypes.c_uint(), ctypes.c_uint()
+        ctypes.windll.shcore.GetDpiForMonitor(hmonitor, MDT_EFFECTIVE_DPI, ctypes.byref(dpi_x), ctypes.byref(dpi_y))
+        return dpi_x.value / BASE_DPI
+    except Exception:
+        return 1.0
+
+def query_monitors() -> List[Dict]:
+    """Reads the physical monitors from mss, with their DPI scale."""
+    import mss
+    with mss.mss() as sct:
+        monitors = [dict(m) for m in sct.monitors[1:]]
+    for monitor in monitors:
+        monitor["scale"] = _monitor_scale(monitor["left"], monitor["top"], monitor["width"], monitor["height"])
+    return monitors
+
+def display_signature() -> Tuple:
+    """Cheap fingerprint of the display layout; changes when monitors are added, moved or resized."""
+    if sys.platform != "win32":
+        return ()
+    metrics = ctypes.windll.user32.GetSystemMetrics
+    return tuple(metrics(i) for i in (SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN, SM_CMONITORS))
+
+class MonitorTopology:
+    """
+    Cached monitor layout, so captures don't query mss (and the DPI of every
+    monitor) on each click. Point-to-monitor lookup is a linear scan of the cached
+    list: with a handful of monitors that beats any index (see
+    benchmarks/monitor_bench.py). The cache is refreshed when the display
+    signature changes (checked at most every `check_interval` seconds). Pass fake
+    `query`/`signature` callables to test layouts without real displays.
+    """
+
+    def __init__(self, query: Callable[[], List[Dict]] = query_monitors,
+                 signature: Callable[[], Tuple] = display_signature, check_interval: float = 2.0):
+        self._query = query
+        self._signature = signature
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._monitors: List[Dict] = []
+        self._current_signature = None
+        self._last_check = 0.0
+
+    def refresh(self):
+        """Re-reads the monitor layout."""
+        monitors = self._query()
+        with self._lock:
+            self._monitors = monitors
+            self._current_signature = self._signature()
+            self._last_check = time.monotonic()
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._monitors and now - self._last_check < self.check_interval:
+            return
+        signature = self._signature()
+        self._last_check = now
+        if not self._monitors or signature != self._current_signature:
+            self.refresh()
+
+    @property
+    def monitors(self) -> List[Dict]:
+        self._ensure_fresh()
+        return list(self._monitors)
+
+    def monitor_at(self, x: int, y: int) -> Optional[Dict]:
+        """Returns the monitor containing (x, y), or the primary one if none does."""
+        self._ensure_fresh()
+        # refresh() swaps in a new list, so reading the current one needs no lock
+        monitors = self._monitors
+        for monitor in monitors:
+            if monitor["left"] <= x < monitor["left"] + monitor["width"] and \
+                    monitor["top"] <= y < monitor["top"] + monitor["height"]:
+                return monitor
+        return monitors[0] if monitors else None
+
+    def clamp_region(self, left: int, top: int, width: int, height: int,
+                     anchor: Optional[Tuple[int, int]] = None) -> Optional[Dict]:
+        """
+        Clamps a region to the monitor containing `anchor` (defaults to the region
+        centre). Returns an mss-style region dict plus the monitor's "scale".
+        """
+        ax, ay = anchor if anchor else (left + width // 2, top + height // 2)
+        monitor = self.monitor_at(ax, ay)
+        if monitor is None:
+            return None
+
+        new_left = max(monitor["left"], left)
+        new_top = max(monitor["top"], top)
+        right = min(monitor["left"] + monitor["width"], left + width)
+        bottom = min(monitor["top"] + monitor["height"], top + height)
+        if right <= new_left or bottom <= new_top:
+            return None
+        return {
+            "left": new_left,
+            "top": new_top,
+            "width": right - new_left,
+            "height": bottom - new_top,
+            "scale": monitor.get("scale", 1.0)
+        }
+
+# Global instance used by every capture function
+topology = MonitorTopology()
@@ -1,55 +1,83 @@
-from app.services import llm_engine
-import base64
-import io
-from PIL import Image
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app.services import llm_engine, codec
 
-async def call_ollama_vision_ocr(image_base64: str, bbox: dict = None) -> str:
+# Answer used when the model can't describe the element
+VISION_FALLBACK = "Clicar no elemento destacado"
+
+def _prepare_vision_input(image_base64: str, bbox: Optional[Dict] = None) -> Tuple[str, str]:
+    """Crop the screenshot around the bounding box and build the prompt for the vision model."""
+    original_image = codec.decode_base64(image_base64)
+    if original_image is None:
+        raise ValueError("Could not decode image")
+        
+    final_image = original_image
+    context_prompt = ""
+    
+    if bbox and 'left' in bbox and 'top' in bbox:
+        try:
+            height, width = original_image.shape[:2]
+            padding = 20
+            left = max(0, int(bbox['left']) - padding)
+            top = max(0, int(bbox['top']) - padding)
+            right = min(width, int(bbox['right']) + padding)
+            bottom = min(height, int(bbox['bottom']) + padding)
+            
+            if (right - left) > 10 and (bottom - top) > 10:
+                final_image = original_image[top:bottom, left:right]
+                context_prompt = "CONTEXTO: Elemento focado. "
+        except Exception as e:
+            print(f"Crop error: {e}")
+
+    prompt = (
+        f"{context_prompt}"
+        "Identifique o elemento de interface no centro. "
+        "Responda com uma instrução IMPERATIVA CURTA (ex: 'Clique no botão Salvar')."
+    )
+    # Encode for the engine (same codec as the capture pipeline)
+    return codec.encode_for_vision(final_image), prompt
+
+def call_ollama_vision_ocr(image_base64: str, bbox: dict = None) -> str:
     """
     Analisa uma imagem base64 usando o motor local llama.cpp via LLMEngine.
+    Blocks for the whole inference; call it from the refinement worker, not the event loop.
     """
-    try:
-        img_data = base64.b64decode(image_base64)
-        original_image = Image.open(io.BytesIO(img_data))
-        if original_image.mode in ("RGBA", "P"):
-            original_image = original_image.convert("RGB")
-            
-        final_image = original_image
-        context_prompt = ""
-        
-        if bbox and 'left' in bbox and 'top' in bbox:
-            try:
-                width, height = original_image.size
-                padding = 20
-                left = max(0, int(bbox['left']) - padding)
-                top = max(0, int(bbox['top']) - padding)
-                right = min(width, int(bbox['right']) + padding)
-                bottom = min(height, int(bbox['bottom']) + padding)
-                
-                if (right - left) > 10 and (bottom - top) > 10:
-                    final_image = original_image.crop((left, top, right, bottom))
-                    context_prompt = "CONTEXTO: Elemento focado. "
-            except Exception as e:
-                print(f"Crop error: {e}")
+    for _, description in call_ollama_vision_ocr_batch([(image_base64, bbox)]):
+        return description
 
-        # Convert back to base64 for the engine
-        buffered = io.BytesIO()
-        final_image.save(buffered, format="JPEG", quality=90)
-        final_b64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-        
-        prompt = (
-            f"{context_prompt}"
-            "Identifique o elemento de interface no centro. "
-            "Responda com uma instrução IMPERATIVA CURTA (ex: 'Clique no botão Salvar')."
-        )
-        
-        return llm_engine.engine.generate_description(final_b64, prompt)
+def call_ollama_vision_ocr_batch(items: List[Tuple[str, Optional[Dict]]],
+                                 on_token: Optional[Callable[[int, str], None]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Analisa várias imagens em sequência, yielding (index, description) as each is ready.
+    All crops are prepared before the first inference, so the model runs back to back
+    (one inference per image, see LLMEngine.generate_descriptions_sequential).
+    `on_token` receives (index, partial description) while a description is generated.
+    """
+    inputs: List[Tuple[str, str]] = []
+    positions: List[int] = []
+    for index, (image_base64, bbox) in enumerate(items):
+        try:
+            inputs.append(_prepare_vision_input(image_base64, bbox))
+            positions.append(index)
+        except Exception as e:
+            print(f"Local LLM Error: {e}")
+            yield index, VISION_FALLBACK
 
+    if not inputs:
+        return
+    done = set()
+    try:
+        stream = (lambda position, text: on_token(positions[position], text)) if on_token else None
+        for position, description in llm_engine.engine.generate_descriptions_sequential(inputs, stream):
+            done.add(position)
+            yield positions[position], description
     except Exception as e:
         print(f"Local LLM Error: {e}")
-        return "Clicar no elemento destacado"
+        for position, index in enumerate(positions):
+            if position not in done:
+                yield index, VISION_FALLBACK
 
-async def call_ollama_text(prompt: str) -> str:
+def call_ollama_text(prompt: str) -> str:
     # Text-only not fully implemented in LLMEngine yet for LLaVA (it expects image),
     # but we can pass a blank image or update LLMEngine.
     # For now, let's return the prompt or implement text-only later.
-    return prompt
\ No newline at end of file
+    return prompt
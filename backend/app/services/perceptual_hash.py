@@ -0,0 +1,115 @@
+import threading
+from typing import Dict, Optional
+import cv2
+import numpy as np
+
+# dHash grid size (hash has DHASH_SIZE * DHASH_SIZE bits)
+DHASH_SIZE = 16
+
+def dhash(img: np.ndarray, hash_size: int = DHASH_SIZE) -> int:
+    """
+    Difference hash of a BGR/BGRA/gray image: the sign of horizontal gradients on a
+    (hash_size + 1) x hash_size grayscale thumbnail, packed into an int.
+    """
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(img, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def to_hex(value: int, hash_size: int = DHASH_SIZE) -> str:
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+class DuplicateDetector:
+    """
+    Remembers the last base screenshot of a recording and decides whether a new
+    capture is a near-duplicate of it (e.g. another click in the same dialog).
+    Duplicates reuse the base image and only carry their own bbox, so the base has
+    to show everything the new capture shows. A capture is a duplicate when:
+      - its bbox (plus margin) lies inside the base image,
+      - the two images share most of the new capture's area,
+      - no pixel around the bbox changed, and no tile of the shared area has more
+        than a few changed pixels (a ticked checkbox or typed text fails this, while
+        a whole-area dHash barely moves for them).
+    The comparison is always against the base itself, so changes can't pile up
+    across a run of duplicates. A cheap dHash distance check rejects clearly
+    different screens first.
+    """
+
+    def __init__(self, max_distance: int = 4, min_overlap: float = 0.6, margin: int = 10,
+                 pixel_tolerance: int = 8, tile_size: int = 16, max_tile_changes: int = 4):
+        self.max_distance = max_distance
+        self.min_overlap = min_overlap
+        self.margin = margin
+        self.pixel_tolerance = pixel_tolerance      # Gray-level difference still counted as unchanged
+        self.tile_size = tile_size
+        self.max_tile_changes = max_tile_changes    # Changed pixels allowed per tile away from the bbox
+        self._base: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._base = None
+
+    def remember(self, screenshot_id: str, img: np.ndarray, left: int, top: int):
+        """Make `img` (clean, without spotlight) the base for the following captures."""
+        with self._lock:
+            self._base = {"id": screenshot_id, "image": img, "left": left, "top": top}
+
+    def _changed_pixels(self, new_area: np.ndarray, base_area: np.ndarray) -> np.ndarray:
+        if new_area.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if new_area.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            new_area, base_area = cv2.cvtColor(new_area, code), cv2.cvtColor(base_area, code)
+        return cv2.absdiff(new_area, base_area) > self.pixel_tolerance
+
+    def _tiles_unchanged(self, changed: np.ndarray) -> bool:
+        h, w = changed.shape
+        tile = self.tile_size
+        # Pad to whole tiles, then count changed pixels per tile
+        padded = np.zeros((-(-h // tile) * tile, -(-w // tile) * tile), dtype=np.uint16)
+        padded[:h, :w] = changed
+        counts = padded.reshape(padded.shape[0] // tile, tile, padded.shape[1] // tile, tile).sum(axis=(1, 3))
+        return int(counts.max()) <= self.max_tile_changes
+
+    def match(self, img: np.ndarray, left: int, top: int, bbox: Dict[str, int]) -> Optional[Dict]:
+        """
+        Compare a new clean capture (placed at screen `left`/`top`, `bbox` in absolute
+        coordinates) with the current base. Returns {"id", "left", "top", "width", "height"}
+        of the base when it can stand in for the new image, otherwise None.
+        """
+        with self._lock:
+            base = self._base
+        if base is None:
+            return None
+
+        base_h, base_w = base["image"].shape[:2]
+        base_right, base_bottom = base["left"] + base_w, base["top"] + base_h
+
+        # The highlighted element itself must be fully visible on the base image
+        if (bbox["left"] - self.margin < base["left"] or bbox["top"] - self.margin < base["top"] or
+                bbox["right"] + self.margin > base_right or bbox["bottom"] + self.margin > base_bottom):
+            return None
+
+        # Screen area shared by both images
+        h, w = img.shape[:2]
+        ix1, iy1 = max(left, base["left"]), max(top, base["top"])
+        ix2, iy2 = min(left + w, base_right), min(top + h, base_bottom)
+        if ix2 <= ix1 or iy2 <= iy1 or (ix2 - ix1) * (iy2 - iy1) < self.min_overlap * w * h:
+            return None
+
+        new_area = img[iy1 - top:iy2 - top, ix1 - left:ix2 - left]
+        base_area = base["image"][iy1 - base["top"]:iy2 - base["top"], ix1 - base["left"]:ix2 - base["left"]]
+        if hamming_distance(dhash(new_area), dhash(base_area)) > self.max_distance:
+            return None
+
+        changed = self._changed_pixels(new_area, base_area)
+        # Around the element the user acted on nothing may differ
+        bx1, by1 = max(0, bbox["left"] - self.margin - ix1), max(0, bbox["top"] - self.margin - iy1)
+        bx2, by2 = bbox["right"] + self.margin - ix1, bbox["bottom"] + self.margin - iy1
+        if changed[by1:by2, bx1:bx2].any() or not self._tiles_unchanged(changed):
+            return None
+
+        return {"id": base["id"], "left": base["left"], "top": base["top"], "width": base_w, "height": base_h}
@@ -2,10 +2,11 @@ import uiautomation as auto
 import mss
 import cv2
 import numpy as np
-import base64
+import time
 import uuid
 from typing import Dict, Optional
 from app.models import CaptureResponse
+from app.services import frame_buffer, smart_bbox, monitors, perceptual_hash, codec
 
 # --- Constants for Chromium Detection ---
 CHROMIUM_BLIND_CLASSES = [
@@ -42,129 +43,46 @@ def is_chromium_blind_window(control) -> bool:
     except Exception as e:
         return False
 
-def capture_screen_region(x: int, y: int, width: int, height: int) -> tuple[np.ndarray, dict]:
+def _grab(region: dict) -> np.ndarray:
+    with mss.mss() as sct:
+        return np.array(sct.grab({k: region[k] for k in ("top", "left", "width", "height")}))
+
+def capture_screen_region(x: int, y: int, width: int, height: int, anchor: Optional[tuple] = None) -> tuple[np.ndarray, dict]:
     """
-    Captures a specific region of the screen immediately.
+    Captures a specific region of the screen immediately, clamped to the monitor
+    containing `anchor` (defaults to the region centre).
     Returns the image as a numpy array and the region dictionary.
     """
     try:
-        with mss.mss() as sct:
-            # Get monitor info to clamp coordinates
-            monitor = sct.monitors[1] # Primary monitor
-            
-            left = max(monitor["left"], x)
-            top = max(monitor["top"], y)
-            w = min(width, monitor["width"] - (left - monitor["left"]))
-            h = min(height, monitor["height"] - (top - monitor["top"]))
-            
-            region = {"top": top, "left": left, "width": w, "height": h}
-            sct_img = sct.grab(region)
-            img_np = np.array(sct_img)
-            return img_np, region
+        region = monitors.topology.clamp_region(x, y, width, height, anchor=anchor)
+        if region is None:
+            return None, None
+        return _grab(region), region
     except Exception as e:
         print(f"Capture error: {e}")
         return None, None
 
-def get_smart_bbox(x: int, y: int, pre_captured_img: np.ndarray = None, origin_x: int = 0, origin_y: int = 0) -> dict:
+def get_smart_bbox(x: int, y: int, pre_captured_img: np.ndarray = None, origin_x: int = 0, origin_y: int = 0, scale: float = 1.0) -> dict:
     """
-    Uses OpenCV to find the smallest enclosing contour around the click point (x, y).
+    Uses OpenCV to find the smallest enclosing region around the click point (x, y).
     Uses pre-captured image if available to ensure timing accuracy.
+    `scale` is the DPI scale of the clicked monitor (sizes are tuned for 96 DPI).
     """
     try:
-        img_np = None
-        left, top = 0, 0
-        
         if pre_captured_img is not None:
-            # Use the pre-captured image
-            # We need to crop a search region from the large pre-captured image
-            # The pre-captured image is likely centered around the click or full screen
-            # For now, let's assume pre-captured image IS the search region or we crop from it
-            
-            # Let's assume pre_captured_img is a large region centered on click
-            h, w = pre_captured_img.shape[:2]
-            img_np = pre_captured_img
-            left = origin_x
-            top = origin_y
+            bbox = smart_bbox.detect_smart_bbox(pre_captured_img, x, y, origin_x, origin_y, scale=scale)
         else:
             # Fallback to capturing now (should be avoided for timing issues)
-            search_size = 400
-            half_size = search_size // 2
-            
-            with mss.mss() as sct:
-                monitor = sct.monitors[1]
-                left = max(monitor["left"], x - half_size)
-                top = max(monitor["top"], y - half_size)
-                width = min(search_size, monitor["width"] - (left - monitor["left"]))
-                height = min(search_size, monitor["height"] - (top - monitor["top"]))
-                
-                region = {"top": top, "left": left, "width": width, "height": height}
-                sct_img = sct.grab(region)
-                img_np = np.array(sct_img)
-
-        # Convert to Grayscale
-        gray = cv2.cvtColor(img_np, cv2.COLOR_BGRA2GRAY)
-        
-        # Adaptive Threshold
-        thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY_INV, 11, 2
-        )
-        
-        # Find contours
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            search_size = int(smart_bbox.SMART_BBOX_SEARCH_SIZE * scale)
+            img_np, region = capture_screen_region(
+                x - search_size // 2, y - search_size // 2, search_size, search_size, anchor=(x, y)
+            )
+            bbox = None
+            if img_np is not None:
+                bbox = smart_bbox.detect_smart_bbox(img_np, x, y, region["left"], region["top"], scale=scale)
         
-        # Coordinates of click relative to the captured region
-        rel_x = x - left
-        rel_y = y - top
-        
-        best_rect = None
-        min_area = float('inf')
-        
-        for cnt in contours:
-            # Check if point is inside contour
-            if cv2.pointPolygonTest(cnt, (rel_x, rel_y), False) >= 0:
-                rect = cv2.boundingRect(cnt)
-                area = rect[2] * rect[3]
-                
-                # Filter noise (too small) and huge containers (too big)
-                if 100 < area < min_area:
-                    min_area = area
-                    best_rect = rect
-        
-        if best_rect:
-            rx, ry, rw, rh = best_rect
-            
-            # Heuristic for Menus/Lists:
-            # If the detected element is very tall (> 150px), it's likely a container (menu, list).
-            # In this case, the user likely clicked a specific ROW, but we only found the container border.
-            # We should create a "row" bbox: full width of container, but small height centered on click.
-            
-            final_left = left + rx
-            final_right = left + rx + rw
-            final_top = top + ry
-            final_bottom = top + ry + rh
-            
-            if rh > 150:
-                print(f"[Smart Shrink-Wrap] Detected tall container (h={rh}). Forcing row selection.")
-                # Center row on the click Y
-                # Use a standard row height, e.g., 30px (15px up, 15px down)
-                row_height_half = 15
-                
-                # Clamp to container bounds
-                new_top = max(final_top, y - row_height_half)
-                new_bottom = min(final_bottom, y + row_height_half)
-                
-                final_top = new_top
-                final_bottom = new_bottom
-            
-            # Convert back to absolute screen coordinates
-            return {
-                "left": final_left,
-                "top": final_top,
-                "right": final_right,
-                "bottom": final_bottom
-            }
-                
+        if bbox:
+            return bbox
     except Exception as e:
         print(f"[Smart Shrink-Wrap] Error: {e}")
     
@@ -174,7 +92,11 @@ def get_smart_bbox(x: int, y: int, pre_captured_img: np.ndarray = None, origin_x
         "right": x + 20, "bottom": y + 10
     }
 
-def get_screenshot_with_offset(bbox: Dict[str, int], padding: int = 150, pre_captured_img: np.ndarray = None, origin_x: int = 0, origin_y: int = 0):
+def get_screenshot_with_offset(bbox: Dict[str, int], padding: int = 150, pre_captured_img: np.ndarray = None, origin_x: int = 0, origin_y: int = 0) -> tuple[Optional[np.ndarray], dict]:
+    """
+    Crops the bbox plus padding as a BGR numpy array (no encoding happens here).
+    Returns the image and the absolute screen offset of its top-left corner.
+    """
     # Determine the region to capture (bbox + padding)
     
     # Calculate padded coordinates
@@ -237,54 +159,28 @@ def get_screenshot_with_offset(bbox: Dict[str, int], padding: int = 150, pre_cap
                 h_crop, w_crop = crop.shape[:2]
                 result_img[dest_y:dest_y+h_crop, dest_x:dest_x+w_crop] = crop
             
-            _, buffer = cv2.imencode(".png", result_img)
-            b64 = base64.b64encode(buffer).decode("utf-8")
-            return b64, {"left": target_left, "top": target_top}
+            return cv2.cvtColor(result_img, cv2.COLOR_BGRA2BGR), {"left": target_left, "top": target_top}
             
         except Exception as e:
             print(f"Screenshot from buffer error: {e}")
             # Fallback to fresh capture if buffer fails (though it might be late)
             pass
 
-    # Fallback to fresh capture
-    with mss.mss() as sct:
-        cx = (bbox["left"] + bbox["right"]) // 2
-        cy = (bbox["top"] + bbox["bottom"]) // 2
-        
-        monitor_idx = 1
-        for i, m in enumerate(sct.monitors[1:], 1):
-             if (cx >= m["left"] and cx < m["left"] + m["width"] and
-                 cy >= m["top"] and cy < m["top"] + m["height"]):
-                 monitor_idx = i
-                 break
-        
-        monitor = sct.monitors[monitor_idx]
-        
-        left = max(monitor["left"], bbox["left"] - padding)
-        top = max(monitor["top"], bbox["top"] - padding)
-        right = min(monitor["left"] + monitor["width"], bbox["right"] + padding)
-        bottom = min(monitor["top"] + monitor["height"], bbox["bottom"] + padding)
-        
-        width = right - left
-        height = bottom - top
-        
-        region = {
-            "top": top,
-            "left": left,
-            "width": width,
-            "height": height
-        }
-
-        try:
-            sct_img = sct.grab(region)
-            img_np = np.array(sct_img)
-            
-            _, buffer = cv2.imencode(".png", img_np)
-            b64 = base64.b64encode(buffer).decode("utf-8")
-            return b64, {"left": left, "top": top}
-        except Exception as e:
-            print(f"Screenshot error: {e}")
-            return "", {"left": 0, "top": 0}
+    # Fallback to fresh capture, clamped to the monitor containing the bbox centre
+    cx = (bbox["left"] + bbox["right"]) // 2
+    cy = (bbox["top"] + bbox["bottom"]) // 2
+    img_np, region = capture_screen_region(
+        bbox["left"] - padding,
+        bbox["top"] - padding,
+        bbox["right"] - bbox["left"] + 2 * padding,
+        bbox["bottom"] - bbox["top"] + 2 * padding,
+        anchor=(cx, cy)
+    )
+    if img_np is None:
+        print("Screenshot error: could not capture fallback region")
+        return None, {"left": 0, "top": 0}
+    
+    return cv2.cvtColor(img_np, cv2.COLOR_BGRA2BGR), {"left": region["left"], "top": region["top"]}
 
 def validate_geometry(control, x: int, y: int) -> bool:
     try:
@@ -297,43 +193,80 @@ def validate_geometry(control, x: int, y: int) -> bool:
     except Exception:
         return False
 
+def draw_spotlight(img: np.ndarray, bbox: Dict[str, int]) -> np.ndarray:
+    """Draws the highlight border in place on a BGR image. Bbox is relative to the image."""
+    border_color = (0, 0, 255) # Red for visibility
+    thickness = 3
+    cv2.rectangle(img, (bbox["left"], bbox["top"]), (bbox["right"], bbox["bottom"]), border_color, thickness)
+    return img
+
 def apply_spotlight(image_b64: str, bbox: Dict[str, int]) -> str:
+    """Decodes an already-encoded screenshot, draws the spotlight and re-encodes it."""
     try:
-        img_data = base64.b64decode(image_b64)
-        nparr = np.frombuffer(img_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = codec.decode_base64(image_b64)
         if img is None: return image_b64
         
-        # Draw border
-        border_color = (0, 0, 255) # Red for visibility
-        thickness = 3
-        
-        # Draw rectangle. Bbox is assumed to be relative to the image now.
-        cv2.rectangle(img, (bbox["left"], bbox["top"]), (bbox["right"], bbox["bottom"]), border_color, thickness)
-        
-        _, buffer = cv2.imencode(".png", img)
-        return base64.b64encode(buffer).decode("utf-8")
+        return codec.encode_base64(draw_spotlight(img, bbox))
     except Exception as e:
         print(f"Spotlight error: {e}")
         return image_b64
 
-async def perform_capture(x: int, y: int, is_typing: bool = False, typed_text: str = "") -> CaptureResponse:
-    # Capture a large region around the click point immediately to preserve state
-    # We capture a 800x800 region centered on the click to ensure we have enough context
-    capture_size = 800
+def snapshot_around(x: int, y: int, capture_size: int = 800, timestamp: Optional[float] = None) -> tuple[np.ndarray, dict]:
+    """
+    Captures a large region centered on the click to preserve the pre-click state.
+    The size is scaled by the DPI of the clicked monitor and the region is clamped
+    to that monitor. This is the only part of a capture that must run at click time. While the
+    frame grabber is running the region is cropped from the buffered frame
+    closest to `timestamp` (time.monotonic()) without grabbing the screen.
+    """
+    monitor = monitors.topology.monitor_at(x, y)
+    scale = monitor.get("scale", 1.0) if monitor else 1.0
+    capture_size = int(capture_size * scale)
     half_size = capture_size // 2
     
-    pre_captured_img, capture_region = capture_screen_region(
-        x - half_size, 
-        y - half_size, 
-        capture_size, 
-        capture_size
-    )
+    if frame_buffer.grabber.is_running:
+        region = monitors.topology.clamp_region(x - half_size, y - half_size, capture_size, capture_size, anchor=(x, y))
+        if region is not None:
+            img, region = frame_buffer.grabber.crop_region(
+                region, timestamp if timestamp is not None else time.monotonic()
+            )
+            if img is not None:
+                return img, region
+    
+    return capture_screen_region(x - half_size, y - half_size, capture_size, capture_size, anchor=(x, y))
+
+async def perform_capture(x: int, y: int, is_typing: bool = False, typed_text: str = "", image_format: Optional[str] = None) -> CaptureResponse:
+    pre_captured_img, capture_region = snapshot_around(x, y)
+    return analyze_capture(x, y, pre_captured_img, capture_region, is_typing, typed_text, image_format)
+
+def analyze_capture(x: int, y: int, pre_captured_img: Optional[np.ndarray], capture_region: Optional[dict],
+                    is_typing: bool = False, typed_text: str = "", image_format: Optional[str] = None) -> CaptureResponse:
+    """
+    Builds a step from an already-taken snapshot: control lookup, bbox detection,
+    cropping, spotlight and encoding. The screenshot is returned inline as base64
+    with the spotlight burned in.
+    """
+    response, _ = analyze_capture_frame(x, y, pre_captured_img, capture_region, is_typing, typed_text, image_format)
+    return response
 
+def analyze_capture_frame(x: int, y: int, pre_captured_img: Optional[np.ndarray], capture_region: Optional[dict],
+                          is_typing: bool = False, typed_text: str = "", image_format: Optional[str] = None,
+                          inline_screenshot: bool = True) -> tuple[CaptureResponse, Optional[dict]]:
+    """
+    Same as analyze_capture and safe to run on a worker thread. With
+    inline_screenshot=False the image is not burned with the spotlight nor stored:
+    the response has spotlight_overlay set and screenshot_phash filled, and the
+    returned frame dict holds the clean image, its screen offset and its encoded
+    full-size tier so the caller can deduplicate it before publishing it to the capture cache.
+    """
+    capture_origin_x, capture_origin_y = 0, 0
     if capture_region:
         capture_origin_x = capture_region['left']
         capture_origin_y = capture_region['top']
     
+    # DPI scale of the clicked monitor; pixel sizes below are tuned for 96 DPI
+    scale = capture_region.get('scale', 1.0) if capture_region else 1.0
+    
     control = None
     is_chromium_fallback = False
     
@@ -373,7 +306,7 @@ async def perform_capture(x: int, y: int, is_typing: bool = False, typed_text: s
         # CHROMIUM FALLBACK: Use Smart Shrink-Wrap (OpenCV)
         print(f"[Chromium Fallback] Applying Smart Shrink-Wrap at ({x}, {y})...")
         # Pass the pre-captured image!
-        bbox = get_smart_bbox(x, y, pre_captured_img=pre_captured_img, origin_x=capture_origin_x, origin_y=capture_origin_y)
+        bbox = get_smart_bbox(x, y, pre_captured_img=pre_captured_img, origin_x=capture_origin_x, origin_y=capture_origin_y, scale=scale)
         
         element_name = "Interface Visual (Chromium)"
         element_type = "VisualElement"
@@ -389,10 +322,10 @@ async def perform_capture(x: int, y: int, is_typing: bool = False, typed_text: s
             "right": x + 25, "bottom": y + 25
         }
     
-    # Capture screenshot with padding using the PRE-CAPTURED image
-    screenshot_b64, offset = get_screenshot_with_offset(
+    # Crop screenshot with padding from the PRE-CAPTURED image (kept as a numpy array)
+    screenshot_img, offset = get_screenshot_with_offset(
         bbox, 
-        padding=150, 
+        padding=int(150 * scale), 
         pre_captured_img=pre_captured_img, 
         origin_x=capture_origin_x, 
         origin_y=capture_origin_y
@@ -406,8 +339,26 @@ async def perform_capture(x: int, y: int, is_typing: bool = False, typed_text: s
         "bottom": bbox["bottom"] - offset["top"]
     }
     
-    # Apply spotlight immediately so it is visible in the UI
-    screenshot_b64 = apply_spotlight(screenshot_b64, relative_bbox)
+    # Encode exactly once: inline screenshots get the spotlight burned in, cached ones
+    # stay clean so near-duplicate steps can share them
+    screenshot_b64 = ""
+    screenshot_phash = None
+    frame = None
+    if screenshot_img is not None:
+        try:
+            if inline_screenshot:
+                screenshot_b64 = codec.encode_base64(draw_spotlight(screenshot_img, relative_bbox), image_format)
+            else:
+                screenshot_phash = perceptual_hash.to_hex(perceptual_hash.dhash(screenshot_img))
+                frame = {
+                    "image": screenshot_img,
+                    "left": offset["left"],
+                    "top": offset["top"],
+                    # Smaller tiers are encoded on first request by the capture cache
+                    "tiers": codec.encode_tiers(screenshot_img, ("full",), image_format=image_format)
+                }
+        except Exception as e:
+            print(f"Spotlight error: {e}")
     
     # Generate description
     if is_typing:
@@ -426,6 +377,8 @@ async def perform_capture(x: int, y: int, is_typing: bool = False, typed_text: s
         element_name=element_name,
         description=description,
         screenshot_base64=screenshot_b64,
+        screenshot_phash=screenshot_phash,
+        spotlight_overlay=not inline_screenshot,
         bounding_box=relative_bbox,
         element_type=element_type
-    )
+    ), frame
@@ -0,0 +1,420 @@
+import hashlib
+import heapq
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app.services import ollama
+from app.services.event_bus import EventBroadcaster
+
+# Job priorities (higher runs first)
+PRIORITY_BACKGROUND = 0
+PRIORITY_VISIBLE = 10      # Step currently on screen in the editor
+PRIORITY_INTERACTIVE = 20  # A request is waiting on the result (/process-step)
+
+# Minimum seconds between two partial-output events of a job (tokens arrive faster)
+PARTIAL_INTERVAL = 0.1
+
+# Descriptions produced by the Chromium fallback that need the vision model
+GENERIC_PATTERNS = ["Clicar no destaque", "Interface Visual", "Elemento Visual"]
+
+def is_generic_description(description: str) -> bool:
+    return any(pattern in description for pattern in GENERIC_PATTERNS)
+
+# (image_base64, bounding_box, context) of one step
+RefinementInput = Tuple[str, Optional[Dict[str, int]], Optional[str]]
+
+def refine_steps(requests: List[RefinementInput],
+                 on_token: Optional[Callable[[int, str], None]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Refine step descriptions, yielding (index, description) as each is ready: text
+    refinements right away, then generic fallbacks through the vision model, one
+    inference after the other, whose partial output is reported to `on_token` as
+    (index, text so far).
+    """
+    vision: List[int] = []
+    for index, (_, _, context) in enumerate(requests):
+        final_desc = context or "Ação registrada."
+        if is_generic_description(final_desc):
+            print(f"[Semantic Refinement] Detected generic description: {final_desc}")
+            vision.append(index)
+        elif context:
+            yield index, ollama.call_ollama_text(f"Melhore esta instrução (seja direto): {context}")
+        else:
+            yield index, final_desc
+
+    if not vision:
+        return
+    # Pass the bounding boxes directly for smart cropping
+    batch = [(requests[index][0], requests[index][1]) for index in vision]
+    stream = (lambda position, text: on_token(vision[position], text)) if on_token else None
+    for position, description in ollama.call_ollama_vision_ocr_batch(batch, stream):
+        print(f"[Semantic Refinement] Refined to: {description}")
+        yield vision[position], description
+
+class RefinementJob:
+    def __init__(self, step_id: Optional[str], key: str, image_base64: str, bounding_box: Optional[Dict[str, int]],
+                 context: Optional[str], priority: int):
+        self.id = str(uuid.uuid4())
+        # Coalesced requests from several steps share the job
+        self.step_ids: List[str] = [step_id] if step_id else []
+        self.key = key
+        self.image_base64 = image_base64
+        self.bounding_box = bounding_box
+        self.context = context
+        self.priority = priority
+        self.seq = 0  # Queue position among jobs of equal priority, kept across requeues
+        self.status = "queued"
+        self.description: Optional[str] = None
+        self.partial: Optional[str] = None  # Text generated so far while running
+        self.partial_published_at = 0.0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        # Resolved with to_dict() when the job finishes, fails or is cancelled
+        self.future: Future = Future()
+        # Called with to_dict() on every event of this job (see RefinementQueue.watch)
+        self.listeners: List[Callable[[Dict], None]] = []
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "step_ids": list(self.step_ids),
+            "status": self.status,
+            "priority": self.priority,
+            "description": self.description,
+            "partial_description": self.partial,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+class RefinementQueue:
+    """
+    Runs step refinements on one dedicated worker thread (the model is not
+    thread-safe), so inference never blocks the event loop. Jobs are picked by
+    priority, then submission order, up to `max_batch` at a time; each job
+    finishes as soon as its own result is ready. A batch yields to a newly queued
+    job of higher priority: its unfinished jobs go back to the queue. Identical
+    requests (same image, bbox and context) coalesce onto one job; a newer request
+    for a step supersedes its queued one. Every status change is published as an
+    event, and so is the partial output of running jobs as the model generates it.
+    """
+
+    def __init__(self, process: Callable[[List[RefinementInput], Callable[[int, str], None]], Iterator[Tuple[int, str]]],
+                 publish: Callable[[Dict], None], max_batch: int = 8, max_finished: int = 500):
+        self._process = process
+        self._publish = publish
+        self._max_batch = max_batch
+        self._max_finished = max_finished
+        self._condition = threading.Condition()
+        self._heap: List[tuple] = []   # (-priority, job seq, job_id); stale entries are skipped
+        self._seq = 0
+        self._jobs: "OrderedDict[str, RefinementJob]" = OrderedDict()
+        self._active_by_key: Dict[str, RefinementJob] = {}
+        self._active_by_step: Dict[str, RefinementJob] = {}
+        self._running: List[RefinementJob] = []
+        self._stats = {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0, "cancelled": 0, "total_run_ms": 0.0}
+        self._thread = threading.Thread(target=self._worker, name="refinement-worker", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _job_key(image_base64: str, bounding_box: Optional[Dict[str, int]], context: Optional[str]) -> str:
+        digest = hashlib.sha256(image_base64.encode("ascii", "ignore"))
+        digest.update(json.dumps([bounding_box, context], sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _push(self, job: RefinementJob):
+        if not job.seq:
+            self._seq += 1
+            job.seq = self._seq
+        heapq.heappush(self._heap, (-job.priority, job.seq, job.id))
+
+    def submit(self, image_base64: str, bounding_box: Optional[Dict[str, int]] = None, context: Optional[str] = None,
+               step_id: Optional[str] = None, priority: int = PRIORITY_BACKGROUND) -> RefinementJob:
+        """Queue a refinement, or return the active job already doing the same work."""
+        key = self._job_key(image_base64, bounding_box, context)
+        superseded = None
+        with self._condition:
+            existing = self._active_by_key.get(key)
+            if existing is not None:
+                self._stats["coalesced"] += 1
+                if step_id and step_id not in existing.step_ids:
+                    existing.step_ids.append(step_id)
+                    self._active_by_step[step_id] = existing
+                if priority > existing.priority:
+                    self._raise_priority(existing, priority)
+                return existing
+
+            if step_id:
+                previous = self._active_by_step.get(step_id)
+                if previous is not None and previous.status == "queued":
+                    superseded = self._detach_step(previous, step_id)
+
+            job = RefinementJob(step_id, key, image_base64, bounding_box, context, priority)
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job
+            if step_id:
+                self._active_by_step[step_id] = job
+            self._stats["submitted"] += 1
+            self._push(job)
+            self._trim_finished()
+            self._condition.notify()
+
+        if superseded is not None:
+            self._finish(superseded)
+        self._emit(job)
+        return job
+
+    def _raise_priority(self, job: RefinementJob, priority: int):
+        job.priority = priority
+        if job.status == "queued":
+            self._push(job)
+
+    def prioritize(self, step_id: str, priority: int = PRIORITY_VISIBLE) -> Optional[Dict]:
+        """Move a step's queued refinement ahead (e.g. it scrolled into view)."""
+        with self._condition:
+            job = self._active_by_step.get(step_id)
+            if job is None:
+                return None
+            if priority > job.priority:
+                self._raise_priority(job, priority)
+            return job.to_dict()
+
+    def watch(self, job: RefinementJob, listener: Callable[[Dict], None]) -> Dict:
+        """
+        Call `listener` (from the worker thread) with every later event of `job`.
+        Returns the job's current state, so nothing is missed in between.
+        """
+        with self._condition:
+            job.listeners.append(listener)
+            return job.to_dict()
+
+    def unwatch(self, job: RefinementJob, listener: Callable[[Dict], None]):
+        with self._condition:
+            if listener in job.listeners:
+                job.listeners.remove(listener)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def get_job(self, job_id: str) -> Optional[RefinementJob]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, step_id: Optional[str] = None, active_only: bool = False) -> List[Dict]:
+        with self._condition:
+            return [
+                job.to_dict() for job in self._jobs.values()
+                if (step_id is None or step_id in job.step_ids) and (not active_only or job.is_active)
+            ]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancel a job. Queued jobs never run; a running inference can't be interrupted,
+        so its result is discarded instead.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            cancelled = self._cancel_locked(job) if job.is_active else None
+        if cancelled is not None:
+            self._finish(cancelled)
+        return job.to_dict()
+
+    def cancel_step(self, step_id: str) -> List[Dict]:
+        """
+        Detach a step from its active jobs (called when the step is deleted). Jobs no
+        other step is waiting on are cancelled and returned.
+        """
+        with self._condition:
+            jobs = [job for job in self._jobs.values() if step_id in job.step_ids and job.is_active]
+            cancelled = [job for job in (self._detach_step(job, step_id) for job in jobs) if job is not None]
+        for job in cancelled:
+            self._finish(job)
+        return [job.to_dict() for job in cancelled]
+
+    def _detach_step(self, job: RefinementJob, step_id: str) -> Optional[RefinementJob]:
+        """Remove a step from a job; cancel the job if that was its last step."""
+        job.step_ids.remove(step_id)
+        if self._active_by_step.get(step_id) is job:
+            del self._active_by_step[step_id]
+        return self._cancel_locked(job) if not job.step_ids else None
+
+    def _cancel_locked(self, job: RefinementJob) -> RefinementJob:
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        self._release(job)
+        self._stats["cancelled"] += 1
+        return job
+
+    def _release(self, job: RefinementJob):
+        if self._active_by_key.get(job.key) is job:
+            del self._active_by_key[job.key]
+        for step_id in job.step_ids:
+            if self._active_by_step.get(step_id) is job:
+                del self._active_by_step[step_id]
+        # The image is only needed while the job can still run
+        job.image_base64 = ""
+
+    def _emit(self, job: RefinementJob):
+        """Publish the job's state to the event stream and its watchers (outside the lock)."""
+        with self._condition:
+            result = job.to_dict()
+            listeners = list(job.listeners)
+        self._publish(result)
+        for listener in listeners:
+            listener(result)
+        return result
+
+    def _finish(self, job: RefinementJob):
+        """Notify listeners of a final state (outside the lock)."""
+        result = self._emit(job)
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _trim_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(finished) - self._max_finished)]:
+            del self._jobs[job_id]
+
+    def _pop_queued(self) -> Optional[RefinementJob]:
+        while self._heap:
+            neg_priority, _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            # Skip cancelled jobs and entries left behind by a priority change
+            if job is None or job.status != "queued" or -neg_priority != job.priority:
+                continue
+            return job
+        return None
+
+    def _next_batch(self) -> List[RefinementJob]:
+        with self._condition:
+            job = self._pop_queued()
+            while job is None:
+                self._condition.wait()
+                job = self._pop_queued()
+            batch = [job]
+            while len(batch) < self._max_batch:
+                job = self._pop_queued()
+                if job is None:
+                    break
+                batch.append(job)
+            for job in batch:
+                job.status = "running"
+            self._running = list(batch)
+            return batch
+
+    def _preempted(self, jobs: List[RefinementJob]) -> bool:
+        """True when a queued job outranks every unfinished job of the batch."""
+        with self._condition:
+            while self._heap:
+                neg_priority, _, job_id = self._heap[0]
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == "queued" and -neg_priority == job.priority:
+                    return job.priority > max(running.priority for running in jobs)
+                heapq.heappop(self._heap)
+            return False
+
+    def _complete(self, job: RefinementJob, description: Optional[str], error: Optional[str], elapsed_ms: float):
+        with self._condition:
+            self._running.remove(job)
+            if job.status == "cancelled":
+                # Cancelled while running: drop the result
+                return
+            self._stats["total_run_ms"] += elapsed_ms
+            job.finished_at = time.time()
+            job.partial = None
+            if error is None:
+                job.status = "done"
+                job.description = description
+                self._stats["completed"] += 1
+            else:
+                job.status = "failed"
+                job.error = error
+                self._stats["failed"] += 1
+            self._release(job)
+        self._finish(job)
+
+    def _progress(self, job: RefinementJob, text: str):
+        """Record a running job's partial output, publishing it at most every PARTIAL_INTERVAL."""
+        with self._condition:
+            if job.status != "running":
+                return
+            job.partial = text
+            now = time.monotonic()
+            if now - job.partial_published_at < PARTIAL_INTERVAL:
+                return
+            job.partial_published_at = now
+        self._emit(job)
+
+    def _requeue(self, jobs: List[RefinementJob]):
+        with self._condition:
+            requeued = []
+            for job in jobs:
+                self._running.remove(job)
+                if job.status == "running":
+                    job.status = "queued"
+                    job.partial = None
+                    self._push(job)
+                    requeued.append(job)
+            self._condition.notify()
+        for job in requeued:
+            self._emit(job)
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            for job in batch:
+                self._emit(job)
+
+            unfinished = dict(enumerate(batch))
+            results = self._process(
+                [(job.image_base64, job.bounding_box, job.context) for job in batch],
+                lambda index, text: self._progress(batch[index], text)
+            )
+            started = time.perf_counter()
+            try:
+                for index, description in results:
+                    now = time.perf_counter()
+                    self._complete(unfinished.pop(index), description, None, (now - started) * 1000)
+                    started = now
+                    if unfinished and self._preempted(list(unfinished.values())):
+                        break
+            except Exception as e:
+                print(f"[Refinement] Batch of {len(batch)} failed: {e}")
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                for job in list(unfinished.values()):
+                    self._complete(job, None, str(e), elapsed_ms)
+                unfinished = {}
+            finally:
+                results.close()
+            # Left over after a preemption (or never yielded): run them later
+            if unfinished:
+                self._requeue(list(unfinished.values()))
+
+    def get_stats(self) -> Dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["queued"] = sum(1 for job in self._jobs.values() if job.status == "queued")
+            stats["running"] = [job.to_dict() for job in self._running]
+        total_run_ms = stats.pop("total_run_ms")
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_run_ms"] = round(total_run_ms / finished, 2) if finished else 0.0
+        return stats
+
+# Refinement status events, streamed on /refinements/events
+events = EventBroadcaster(buffer_size=256, heartbeat_interval=15.0)
+
+# Global worker shared by /process-step and the /refinements API
+worker = RefinementQueue(process=refine_steps, publish=lambda job: events.publish(json.dumps(job)))
@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+from typing import Optional
+
+# Side of the click-centred square analysed for the enclosing element
+SMART_BBOX_SEARCH_SIZE = 400
+
+# Elements taller than this are treated as containers (menus, lists)
+TALL_CONTAINER_HEIGHT = 150
+ROW_HEIGHT_HALF = 15
+
+def find_enclosing_rect(gray: np.ndarray, rel_x: int, rel_y: int, min_area: int = 100) -> Optional[tuple]:
+    """
+    Finds the smallest edge region that encloses (rel_x, rel_y) in a grayscale image
+    and returns its bounding rect (x, y, w, h) relative to the image, or None.
+
+    Edges and the regions between them are labelled once with connected components,
+    then every edge component is tested at once with numpy instead of one
+    pointPolygonTest call per contour. An edge component encloses the click when
+    it is crossed by all four rays cast from the click and its box contains the
+    whole region the click landed in. Nested shapes (a button inside a panel) are
+    separate components, so the innermost wins, while a text label inside a button
+    doesn't contain the button's interior and is skipped.
+    """
+    thresh = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+        cv2.THRESH_BINARY_INV, 11, 2
+    )
+    
+    h, w = thresh.shape
+    if not (0 <= rel_x < w and 0 <= rel_y < h):
+        return None
+    
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+    if count <= 1:
+        return None
+    
+    # Region the click landed in (4-connected so it can't leak through diagonal edge gaps).
+    # Label 0 is edge pixels; if the click hit an edge, use the dominant region around it.
+    region_count, region_labels, region_stats, _ = cv2.connectedComponentsWithStats(
+        cv2.bitwise_not(thresh), connectivity=4
+    )
+    region = region_labels[rel_y, rel_x]
+    if region == 0:
+        window = region_labels[max(0, rel_y - 3):rel_y + 4, max(0, rel_x - 3):rel_x + 4]
+        window = window[window > 0]
+        if window.size == 0:
+            return None
+        region = int(np.bincount(window).argmax())
+    rx, ry, rw, rh = region_stats[region, :4]
+    
+    # Which components each ray from the click crosses
+    candidates = np.ones(count, dtype=bool)
+    for ray in (labels[rel_y, :rel_x], labels[rel_y, rel_x + 1:], labels[:rel_y, rel_x], labels[rel_y + 1:, rel_x]):
+        hit = np.zeros(count, dtype=bool)
+        hit[ray] = True
+        candidates &= hit
+    candidates[0] = False # Label 0 is the background
+    
+    xs = stats[:, cv2.CC_STAT_LEFT]
+    ys = stats[:, cv2.CC_STAT_TOP]
+    ws = stats[:, cv2.CC_STAT_WIDTH]
+    hs = stats[:, cv2.CC_STAT_HEIGHT]
+    areas = ws.astype(np.int64) * hs
+    
+    # Must contain the clicked region; filter noise (too small)
+    candidates &= (xs <= rx) & (ys <= ry) & (xs + ws >= rx + rw) & (ys + hs >= ry + rh)
+    candidates &= areas > min_area
+    if not candidates.any():
+        return None
+    
+    best = int(np.argmin(np.where(candidates, areas, np.iinfo(np.int64).max)))
+    
+    # A tiny clicked region is a hole inside a glyph: skip the text around it
+    if region_stats[region, cv2.CC_STAT_AREA] < min_area:
+        candidates &= (
+            (xs <= xs[best]) & (ys <= ys[best]) &
+            (xs + ws >= xs[best] + ws[best]) & (ys + hs >= ys[best] + hs[best]) &
+            (areas > areas[best])
+        )
+        if candidates.any():
+            best = int(np.argmin(np.where(candidates, areas, np.iinfo(np.int64).max)))
+    
+    return int(xs[best]), int(ys[best]), int(ws[best]), int(hs[best])
+
+def detect_smart_bbox(img: np.ndarray, x: int, y: int, origin_x: int = 0, origin_y: int = 0, scale: float = 1.0) -> Optional[dict]:
+    """
+    Detects the element under the click (x, y) in screen coordinates, given an image
+    whose top-left corner is at (origin_x, origin_y). Only a SMART_BBOX_SEARCH_SIZE
+    square centred on the click is analysed. `scale` is the monitor's DPI scale;
+    all pixel sizes are multiplied by it. Returns an absolute bbox or None.
+    """
+    search_size = int(SMART_BBOX_SEARCH_SIZE * scale)
+    
+    # Crop the click-centred ROI
+    half_size = search_size // 2
+    h, w = img.shape[:2]
+    roi_x0 = min(max(0, x - origin_x - half_size), w)
+    roi_y0 = min(max(0, y - origin_y - half_size), h)
+    roi = img[roi_y0:min(h, roi_y0 + search_size), roi_x0:min(w, roi_x0 + search_size)]
+    if roi.size == 0:
+        return None
+    left = origin_x + roi_x0
+    top = origin_y + roi_y0
+    
+    # Convert to Grayscale
+    if roi.ndim == 2:
+        gray = roi
+    elif roi.shape[2] == 4:
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGRA2GRAY)
+    else:
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    
+    # Coordinates of click relative to the ROI
+    best_rect = find_enclosing_rect(gray, x - left, y - top, min_area=int(100 * scale * scale))
+    if not best_rect:
+        return None
+    
+    rx, ry, rw, rh = best_rect
+    final_left = left + rx
+    final_right = left + rx + rw
+    final_top = top + ry
+    final_bottom = top + ry + rh
+    
+    # Heuristic for Menus/Lists:
+    # If the detected element is very tall, it's likely a container (menu, list).
+    # In this case, the user likely clicked a specific ROW, but we only found the container border.
+    # We should create a "row" bbox: full width of container, but small height centered on click.
+    if rh > TALL_CONTAINER_HEIGHT * scale:
+        print(f"[Smart Shrink-Wrap] Detected tall container (h={rh}). Forcing row selection.")
+        # Clamp to container bounds
+        row_height_half = int(ROW_HEIGHT_HALF * scale)
+        final_top = max(final_top, y - row_height_half)
+        final_bottom = min(final_bottom, y + row_height_half)
+    
+    # Absolute screen coordinates
+    return {
+        "left": final_left,
+        "top": final_top,
+        "right": final_right,
+        "bottom": final_bottom
+    }
@@ -0,0 +1,154 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import database
+from app.services import codec
+
+# Disk cache location (next to tutorials.db)
+THUMBNAILS_DIR = Path(__file__).resolve().parents[2] / "thumbnails"
+
+# Thumbnails are small and only previewed, so lossy WebP is fine
+THUMBNAIL_TIER = "thumbnail"
+THUMBNAIL_FORMAT = "webp"
+THUMBNAIL_QUALITY = 80
+
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class ThumbnailCache:
+    """
+    Lazily generated step-list thumbnails, stored on disk and keyed by the SHA-256
+    of the source image (so identical screenshots share one thumbnail and entries
+    never go stale). The least recently used files are deleted beyond `max_bytes`.
+    Concurrent requests for the same missing thumbnail generate it only once.
+    """
+
+    def __init__(self, directory: Path, load_image: Callable[[str], Optional[bytes]], max_bytes: int = 128 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._load_image = load_image
+        self._lock = threading.Lock()
+        self._pending: Dict[str, threading.Lock] = {}
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0, "generated": 0, "evicted": 0}
+        self._scan()
+
+    def _path(self, image_hash: str) -> Path:
+        return self.directory / f"{image_hash}.{THUMBNAIL_FORMAT}"
+
+    def _scan(self):
+        """Index existing files, oldest access first."""
+        if not self.directory.exists():
+            return
+        files = []
+        for path in self.directory.glob(f"*.{THUMBNAIL_FORMAT}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, image_hash, size in sorted(files):
+            self._entries[image_hash] = size
+            self._size += size
+
+    def _touch(self, image_hash: str):
+        # Keep recency across restarts (mtime is the LRU order used by _scan)
+        try:
+            os.utime(self._path(image_hash))
+        except OSError:
+            pass
+
+    def get(self, image_hash: str) -> Optional[bytes]:
+        """Thumbnail bytes for an image hash, generated on first use. None if the image is unknown."""
+        if not _HASH_PATTERN.match(image_hash):
+            return None
+
+        data = self._read(image_hash)
+        if data is not None:
+            return data
+
+        with self._lock:
+            generating = self._pending.setdefault(image_hash, threading.Lock())
+        with generating:
+            # Another request may have produced it while we waited
+            data = self._read(image_hash, count=False)
+            if data is None:
+                data = self._generate(image_hash)
+        with self._lock:
+            self._pending.pop(image_hash, None)
+        return data
+
+    def _read(self, image_hash: str, count: bool = True) -> Optional[bytes]:
+        with self._lock:
+            known = image_hash in self._entries
+            if known:
+                self._entries.move_to_end(image_hash)
+            if count:
+                self._stats["hits" if known else "misses"] += 1
+        if not known:
+            return None
+        try:
+            data = self._path(image_hash).read_bytes()
+        except OSError:
+            # Deleted behind our back; regenerate
+            with self._lock:
+                self._forget(image_hash)
+            return None
+        self._touch(image_hash)
+        return data
+
+    def _generate(self, image_hash: str) -> Optional[bytes]:
+        source = self._load_image(image_hash)
+        if source is None:
+            return None
+        img = codec.decode(source)
+        if img is None:
+            return None
+        data = codec.encode(codec.resize_to_tier(img, THUMBNAIL_TIER), THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(image_hash)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[Thumbnails] Could not write {path}: {e}")
+            return data
+
+        with self._lock:
+            self._forget(image_hash)
+            self._entries[image_hash] = len(data)
+            self._size += len(data)
+            self._stats["generated"] += 1
+            self._evict()
+        return data
+
+    def _forget(self, image_hash: str):
+        size = self._entries.pop(image_hash, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            image_hash, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._stats["evicted"] += 1
+            try:
+                self._path(image_hash).unlink()
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._size}
+
+def _load_blob(image_hash: str) -> Optional[bytes]:
+    blob = database.get_blob(image_hash)
+    return blob["data"] if blob else None
+
+# Global instance backed by the tutorials blob store
+cache = ThumbnailCache(THUMBNAILS_DIR, _load_blob)
@@ -0,0 +1,75 @@
+"""
+Encode time and size benchmark for the screenshot codec settings.
+
+Encodes the synthetic UI screenshots of the smart bbox benchmark (scaled to a
+typical padded capture) with every format/level combination and reports mean
+encode time, mean size and a PSNR figure for lossy settings, so the defaults in
+app/services/codec.py can be chosen from numbers.
+
+Run from the backend directory:
+    python -m benchmarks.codec_bench --images 30
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List
+import cv2
+import numpy as np
+from app.services import codec
+from benchmarks.smart_bbox_bench import generate_case
+
+# (label, format, quality, png_compression)
+CANDIDATES = [
+    ("png level 9", "png", None, 9),
+    ("png level 3", "png", None, 3),
+    ("png level 1", "png", None, 1),
+    ("webp lossless", "webp", 100, None),
+    ("webp q90", "webp", 90, None),
+    ("webp q80", "webp", 80, None),
+    ("jpeg q90", "jpeg", 90, None),
+    ("jpeg q80", "jpeg", 80, None)
+]
+
+def _psnr(a: np.ndarray, b: np.ndarray) -> float:
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+def run(images: int, seed: int, width: int, height: int) -> List[Dict]:
+    rng = random.Random(seed)
+    frames = [
+        cv2.resize(cv2.cvtColor(generate_case(rng)[0], cv2.COLOR_BGRA2BGR), (width, height), interpolation=cv2.INTER_NEAREST)
+        for _ in range(images)
+    ]
+
+    results = []
+    for label, image_format, quality, png_compression in CANDIDATES:
+        timings, sizes, psnrs = [], [], []
+        for frame in frames:
+            start = time.perf_counter()
+            data = codec.encode(frame, image_format, quality=quality, png_compression=png_compression)
+            timings.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(data))
+            psnrs.append(_psnr(frame, codec.decode(data)))
+        results.append({
+            "label": label,
+            "mean_ms": statistics.mean(timings),
+            "mean_kb": statistics.mean(sizes) / 1024,
+            "psnr": min(psnrs)
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=700)
+    args = parser.parse_args()
+
+    for result in run(args.images, args.seed, args.width, args.height):
+        psnr = "lossless" if result["psnr"] == float("inf") else f"{result['psnr']:.1f}dB"
+        print(f"{result['label']:<14} mean={result['mean_ms']:7.2f}ms size={result['mean_kb']:7.1f}KB min_psnr={psnr}")
+
+if __name__ == "__main__":
+    main()
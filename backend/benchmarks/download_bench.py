@@ -0,0 +1,224 @@
+"""
+Interrupt/resume benchmark for the ranged model downloader.
+
+Serves a random file from a local http.server that honours Range requests,
+cancels the download once a given fraction has been transferred, then starts a
+new FileDownload for the same destination. The resumed run must pick up the
+saved segments (only the missing bytes are requested again) and the finished
+file must match the SHA-256 of the source. Reports bytes served and throughput
+of both runs, so changes to app/services/downloader.py can be checked without
+Hugging Face. Exits non-zero when a check fails (no resume state after the
+interrupt, resume re-downloading the whole file, checksum mismatch, partial
+files left behind).
+
+Run from the backend directory:
+    python -m benchmarks.download_bench --size-mb 64 --interrupt-at 0.5
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from app.services import downloader
+
+WRITE_SIZE = 64 * 1024
+CUT_GRACE = 0.5   # Seconds the client gets to write what it received before the cancel
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass   # Dropped connections are the point of the benchmark
+
+class _RangeServer:
+    """One file behind HEAD/GET with byte-range support; can cut every transfer after a byte count."""
+
+    def __init__(self, data: bytes, rate_mbps: float):
+        self.data = data
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self.rate = rate_mbps * 1024 * 1024
+        self.lock = threading.Lock()
+        self.served = 0
+        self.ranges = []
+        self.cut_after: Optional[int] = None   # Total bytes after which connections are dropped
+        self.cancel: Optional[threading.Event] = None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(server.data)))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", f'"{server.sha256}"')
+                self.end_headers()
+
+            def do_GET(self):
+                start, end = 0, len(server.data) - 1
+                range_header = self.headers.get("Range")
+                if range_header:
+                    first, _, last = range_header.split("=", 1)[1].partition("-")
+                    start, end = int(first), int(last) if last else end
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.data)}")
+                else:
+                    self.send_response(200)
+                with server.lock:
+                    server.ranges.append(range_header)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                server.send(self, start, end)
+
+        self.httpd = _QuietServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/model.gguf"
+
+    def send(self, handler: BaseHTTPRequestHandler, start: int, end: int):
+        began = time.perf_counter()
+        sent = 0
+        for offset in range(start, end + 1, WRITE_SIZE):
+            with self.lock:
+                cut = self.cut_after is not None and self.served >= self.cut_after
+                if not cut:
+                    chunk = self.data[offset:min(offset + WRITE_SIZE, end + 1)]
+                    self.served += len(chunk)
+            if cut:
+                self._drop(handler)
+                return
+            try:
+                handler.wfile.write(chunk)
+            except OSError:
+                return
+            sent += len(chunk)
+            if self.rate:
+                # Per-connection throttle, so parallel segments have something to gain
+                delay = sent / self.rate - (time.perf_counter() - began)
+                if delay > 0:
+                    time.sleep(delay)
+
+    def _drop(self, handler: BaseHTTPRequestHandler):
+        # Like a lost connection: the client sees a short read, then the download is cancelled
+        # so its retry loop stops and the progress is saved for the next attempt
+        handler.close_connection = True
+        try:
+            handler.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if self.cancel is not None:
+            threading.Timer(CUT_GRACE, self.cancel.set).start()
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def take_counters(self):
+        with self.lock:
+            served, ranges = self.served, self.ranges
+            self.served, self.ranges = 0, []
+        return served, ranges
+
+def _timed_run(download: downloader.FileDownload) -> Dict:
+    start = time.perf_counter()
+    outcome = "completed"
+    try:
+        download.run()
+    except downloader.DownloadCancelled:
+        outcome = "cancelled"
+    except downloader.DownloadError as e:
+        print(f"Download failed: {e}")
+        outcome = "error"
+    return {"outcome": outcome, "seconds": time.perf_counter() - start,
+            "downloaded_bytes": download.progress()["downloaded_bytes"]}
+
+def run(size_mb: float, interrupt_at: float, connections: int, min_segment_mb: float, rate_mbps: float,
+        seed: int) -> Dict:
+    size = int(size_mb * 1024 * 1024)
+    server = _RangeServer(random.Random(seed).randbytes(size), rate_mbps)
+    server.start()
+    downloader.MIN_SEGMENT_SIZE = int(min_segment_mb * 1024 * 1024)
+    directory = tempfile.mkdtemp(prefix="download_bench_")
+    dest = os.path.join(directory, "model.gguf")
+    try:
+        # First attempt: stopped from the server side once `interrupt_at` of the file went out
+        cancel = threading.Event()
+        server.cut_after = int(size * interrupt_at)
+        server.cancel = cancel
+        first = _timed_run(downloader.FileDownload(server.url, dest, sha256=server.sha256,
+                                                   max_connections=connections, cancel=cancel))
+        first["served_bytes"], first["ranges"] = server.take_counters()
+        first["state_saved"] = os.path.exists(dest + ".part.json")
+
+        # Second attempt: same destination, no interruption
+        server.cut_after, server.cancel = None, None
+        resumed = _timed_run(downloader.FileDownload(server.url, dest, sha256=server.sha256,
+                                                     max_connections=connections))
+        resumed["served_bytes"], resumed["ranges"] = server.take_counters()
+
+        actual = None
+        if os.path.exists(dest):
+            with open(dest, "rb") as f:
+                actual = hashlib.sha256(f.read()).hexdigest()
+        leftovers = sorted(name for name in os.listdir(directory) if name != "model.gguf")
+        return {"size": size, "first": first, "resumed": resumed, "sha256_ok": actual == server.sha256,
+                "leftovers": leftovers}
+    finally:
+        server.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _describe(label: str, result: Dict):
+    mb = result["served_bytes"] / (1024 * 1024)
+    speed = mb / result["seconds"] if result["seconds"] else 0.0
+    print(f"{label:<8} {result['outcome']:<10} served={mb:8.2f}MB time={result['seconds']:6.2f}s "
+          f"speed={speed:7.1f}MB/s requests={len(result['ranges'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=64)
+    parser.add_argument("--interrupt-at", type=float, default=0.5, help="Fraction served before the cut")
+    parser.add_argument("--connections", type=int, default=downloader.MAX_CONNECTIONS)
+    parser.add_argument("--min-segment-mb", type=float, default=8,
+                        help="Smallest segment per connection (the app uses 32)")
+    parser.add_argument("--rate-mbps", type=float, default=50, help="Per-connection throttle, 0 for none")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    result = run(args.size_mb, args.interrupt_at, args.connections, args.min_segment_mb, args.rate_mbps, args.seed)
+    _describe("first", result["first"])
+    _describe("resumed", result["resumed"])
+    overhead = result["first"]["served_bytes"] + result["resumed"]["served_bytes"] - result["size"]
+    kept = result["first"]["downloaded_bytes"] / (1024 * 1024)
+    print(f"kept after interrupt: {kept:.2f}MB  state saved: {result['first']['state_saved']}")
+    print(f"re-sent bytes: {max(0, overhead)} ({max(0, overhead) / result['size']:.2%} of the file)")
+    print(f"sha256 match: {result['sha256_ok']}  leftover files: {result['leftovers'] or 'none'}")
+
+    first, resumed = result["first"], result["resumed"]
+    failures = []
+    if first["outcome"] != "cancelled" or not first["state_saved"]:
+        failures.append(f"first run should stop with its resume state saved ({first['outcome']})")
+    if resumed["outcome"] != "completed":
+        failures.append(f"resumed run did not complete ({resumed['outcome']})")
+    elif resumed["served_bytes"] >= result["size"]:
+        failures.append("resumed run downloaded the whole file again")
+    if not result["sha256_ok"]:
+        failures.append("sha256 of the downloaded file does not match")
+    if result["leftovers"]:
+        failures.append(f"partial files left behind: {result['leftovers']}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
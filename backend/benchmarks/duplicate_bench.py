@@ -0,0 +1,118 @@
+"""
+Verdict check and timing for the near-duplicate screenshot detector.
+
+Draws a synthetic 800x600 dialog, makes it the detector's base, then matches
+variants against it: the same dialog clicked elsewhere (must be a duplicate),
+light pixel noise (duplicate) and small real changes that must not be: a ticked
+14px checkbox, "hello world" typed into a field, a new line of status text, a
+moved window. Prints the whole-area dHash distance next to each verdict to show
+why the hash alone can't decide, and exits non-zero on any wrong verdict.
+
+Run from the backend directory:
+    python -m benchmarks.duplicate_bench
+"""
+import argparse
+import time
+from typing import Dict, Tuple
+import cv2
+import numpy as np
+from app.services.perceptual_hash import DuplicateDetector, dhash, hamming_distance
+
+WIDTH, HEIGHT = 800, 600
+CHECKBOX = (60, 200, 14)          # x, y, size
+FIELD = (60, 260, 400, 32)        # x, y, width, height
+OK_BUTTON = (600, 520, 90, 32)
+CANCEL_BUTTON = (480, 520, 90, 32)
+
+def _dialog() -> np.ndarray:
+    img = np.full((HEIGHT, WIDTH, 4), 240, dtype=np.uint8)
+    img[..., 3] = 255
+    cv2.rectangle(img, (0, 0), (WIDTH - 1, 40), (120, 80, 40, 255), -1)
+    cv2.putText(img, "Preferences", (16, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255, 255), 1, cv2.LINE_AA)
+    x, y, size = CHECKBOX
+    cv2.rectangle(img, (x, y), (x + size, y + size), (90, 90, 90, 255), 1)
+    cv2.putText(img, "Enable sync", (x + size + 10, y + 12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 30, 30, 255), 1,
+                cv2.LINE_AA)
+    x, y, w, h = FIELD
+    cv2.rectangle(img, (x, y), (x + w, y + h), (255, 255, 255, 255), -1)
+    cv2.rectangle(img, (x, y), (x + w, y + h), (150, 150, 150, 255), 1)
+    for bx, by, bw, bh in (OK_BUTTON, CANCEL_BUTTON):
+        cv2.rectangle(img, (bx, by), (bx + bw, by + bh), (215, 215, 215, 255), -1)
+        cv2.rectangle(img, (bx, by), (bx + bw, by + bh), (120, 120, 120, 255), 1)
+    return img
+
+def _ticked(img: np.ndarray) -> np.ndarray:
+    img = img.copy()
+    x, y, size = CHECKBOX
+    cv2.line(img, (x + 3, y + 7), (x + 6, y + 11), (30, 30, 30, 255), 2)
+    cv2.line(img, (x + 6, y + 11), (x + 11, y + 3), (30, 30, 30, 255), 2)
+    return img
+
+def _typed(img: np.ndarray) -> np.ndarray:
+    img = img.copy()
+    x, y, _, h = FIELD
+    cv2.putText(img, "hello world", (x + 6, y + h - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (20, 20, 20, 255), 1,
+                cv2.LINE_AA)
+    return img
+
+def _status(img: np.ndarray) -> np.ndarray:
+    img = img.copy()
+    cv2.putText(img, "Saved", (60, 480), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (40, 120, 40, 255), 1, cv2.LINE_AA)
+    return img
+
+def _noise(img: np.ndarray, seed: int) -> np.ndarray:
+    noise = np.random.default_rng(seed).integers(-3, 4, img.shape[:2] + (3,))
+    img = img.copy()
+    img[..., :3] = np.clip(img[..., :3].astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return img
+
+def _moved(img: np.ndarray) -> np.ndarray:
+    moved = np.full_like(img, 240)
+    moved[24:, 30:] = img[:-24, :-30]
+    return moved
+
+def _bbox(rect: Tuple[int, int, int, int]) -> Dict[str, int]:
+    x, y, w, h = rect
+    return {"left": x, "top": y, "right": x + w, "bottom": y + h}
+
+def cases(seed: int):
+    base = _dialog()
+    checkbox = _bbox((CHECKBOX[0], CHECKBOX[1], CHECKBOX[2], CHECKBOX[2]))
+    # (name, new image, bbox of the new step, expected duplicate)
+    return base, [
+        ("same dialog, other button", base.copy(), _bbox(CANCEL_BUTTON), True),
+        ("pixel noise", _noise(base, seed), _bbox(OK_BUTTON), True),
+        ("checkbox ticked, click it", _ticked(base), checkbox, False),
+        ("checkbox ticked, click OK", _ticked(base), _bbox(OK_BUTTON), False),
+        ("typed text, click field", _typed(base), _bbox(FIELD), False),
+        ("typed text, click OK", _typed(base), _bbox(OK_BUTTON), False),
+        ("status line, click OK", _status(base), _bbox(OK_BUTTON), False),
+        ("window moved", _moved(base), _bbox(OK_BUTTON), False)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed matches per case")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    base, variants = cases(args.seed)
+    detector = DuplicateDetector()
+    detector.remember("base", base, 0, 0)
+    wrong = 0
+    for name, img, bbox, expected in variants:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            verdict = detector.match(img, 0, 0, bbox) is not None
+        elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+        distance = hamming_distance(dhash(img), dhash(base))
+        ok = verdict == expected
+        wrong += not ok
+        print(f"{name:<28} dhash_distance={distance:3d} duplicate={str(verdict):<5} "
+              f"expected={str(expected):<5} {'ok' if ok else 'WRONG'} ({elapsed_ms:.2f}ms)")
+    if wrong:
+        print(f"{wrong} wrong verdict(s)")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
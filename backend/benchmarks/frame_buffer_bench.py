@@ -0,0 +1,173 @@
+"""
+Grabber and click-latency benchmark for the frame ring buffer.
+
+Runs FrameRingBuffer with a fake frame source (its `source_factory` hook), so no
+display is needed. The source hands out a fixed noise image at a configurable
+origin (negative for a monitor left of the primary) with the frame number
+stamped in the alpha channel and an optional simulated grab cost. The report
+covers:
+  - achieved grab rate and memory held against the cap while recording
+  - crop_region latency on the click path versus a fresh grab plus crop
+  - whether crops have the clamped size (and match the source pixels at scale
+    1.0) and whether get_frame picks the newest frame taken at or before the click
+Exits non-zero when a check fails, so it can run as a check.
+
+Run from the backend directory:
+    python -m benchmarks.frame_buffer_bench --seconds 3 --scale 1.0
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from app.services.frame_buffer import FrameRingBuffer
+
+class FakeFrameSource:
+    """Noise frames with the frame number in the alpha channel; grab() sleeps `grab_ms` like a real capture."""
+
+    def __init__(self, base: np.ndarray, origin: Tuple[int, int], grab_ms: float):
+        self.base = base
+        self.origin = origin
+        self.grab_ms = grab_ms
+        self.grabs = 0
+        self.closed = threading.Event()
+
+    def grab(self) -> Tuple[np.ndarray, Tuple[int, int]]:
+        if self.grab_ms:
+            time.sleep(self.grab_ms / 1000)
+        frame = self.base.copy()
+        frame[..., 3] = self.grabs % 256
+        self.grabs += 1
+        return frame, self.origin
+
+    def close(self):
+        self.closed.set()
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_grabber(base: np.ndarray, origin: Tuple[int, int], args, rng: random.Random) -> Dict:
+    sources: List[FakeFrameSource] = []
+
+    def factory():
+        sources.append(FakeFrameSource(base, origin, args.grab_ms))
+        return sources[-1]
+
+    buffer = FrameRingBuffer(source_factory=factory, fps=args.fps, max_memory_mb=args.max_memory_mb,
+                             scale=args.scale)
+    buffer.start()
+    time.sleep(args.seconds)
+    grabs = sources[0].grabs if sources else 0
+    held, memory_mb = len(buffer._frames), buffer._memory_bytes / (1024 * 1024)
+
+    # The path the buffer replaces: grab the screen on the click, then cut the region out
+    direct = FakeFrameSource(base, origin, args.grab_ms)
+
+    height, width = base.shape[:2]
+    crop_ms, fresh_ms, mismatches = [], [], 0
+    for _ in range(args.clicks):
+        x = rng.randrange(origin[0], origin[0] + width)
+        y = rng.randrange(origin[1], origin[1] + height)
+        region = {"left": x - args.region // 2, "top": y - args.region // 2,
+                  "width": args.region, "height": args.region}
+
+        start = time.perf_counter()
+        crop, clamped = buffer.crop_region(region, time.monotonic())
+        crop_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        frame, (ox, oy) = direct.grab()
+        fresh = frame[max(0, region["top"] - oy):region["top"] - oy + args.region,
+                      max(0, region["left"] - ox):region["left"] - ox + args.region].copy()
+        fresh_ms.append((time.perf_counter() - start) * 1000)
+
+        if crop is None or clamped is None:
+            mismatches += 1
+        elif crop.shape[:2] != (clamped["height"], clamped["width"]):
+            mismatches += 1
+        elif args.scale == 1.0:
+            x0, y0 = clamped["left"] - origin[0], clamped["top"] - origin[1]
+            expected = base[y0:y0 + clamped["height"], x0:x0 + clamped["width"], :3]
+            mismatches += int(crop.shape[:2] != fresh.shape[:2] or not np.array_equal(crop[..., :3], expected))
+
+    buffer.stop()
+    return {
+        "grabs": grabs,
+        "held": held,
+        "memory_mb": memory_mb,
+        "closed": sources[0].closed.wait(1),
+        "crop_ms": crop_ms,
+        "fresh_ms": fresh_ms,
+        "mismatches": mismatches
+    }
+
+def check_lookup(base: np.ndarray, origin: Tuple[int, int], count: int) -> int:
+    """Pushes frames with known timestamps and checks which one each click time resolves to."""
+    # Room for every frame, so only the lookup is under test
+    buffer = FrameRingBuffer(source_factory=lambda: None, max_memory_mb=count * base.nbytes // (1024 * 1024) + 1)
+    source = FakeFrameSource(base, origin, 0)
+    for index in range(count):
+        frame, frame_origin = source.grab()
+        buffer.push(frame, frame_origin, 10.0 + index * 0.1)
+
+    errors = 0
+    for index in range(count):
+        _, frame, _ = buffer.get_frame(10.0 + index * 0.1 + 0.05)
+        errors += int(frame[0, 0, 3] != index % 256)
+    # A click before the first frame falls back to the oldest one
+    _, frame, _ = buffer.get_frame(0.0)
+    errors += int(frame[0, 0, 3] != 0)
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--origin", type=str, default="-1920,0", help="Screen position of the frame's top-left")
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--max-memory-mb", type=int, default=64)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--grab-ms", type=float, default=15, help="Simulated cost of one screen grab")
+    parser.add_argument("--clicks", type=int, default=200)
+    parser.add_argument("--region", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    origin = tuple(int(value) for value in args.origin.split(","))
+    base = np.random.default_rng(args.seed).integers(0, 256, (args.height, args.width, 4), dtype=np.uint8)
+
+    result = run_grabber(base, origin, args, rng)
+    fps = result["grabs"] / args.seconds
+    print(f"grabber: {result['grabs']} frames in {args.seconds:.1f}s ({fps:.1f} fps, target {args.fps:g}), "
+          f"held={result['held']} memory={result['memory_mb']:.1f}MB/{args.max_memory_mb}MB "
+          f"source closed={result['closed']}")
+    for label, timings in (("crop_region", result["crop_ms"]), ("grab + crop", result["fresh_ms"])):
+        print(f"{label:<12} mean={statistics.mean(timings):7.3f}ms p95={_percentile(timings, 0.95):7.3f}ms")
+    print(f"crop mismatches: {result['mismatches']}/{args.clicks}")
+
+    lookup_errors = check_lookup(base, origin, 12)
+    print(f"get_frame errors: {lookup_errors}")
+
+    failures = []
+    if result["grabs"] == 0:
+        failures.append("the grabber produced no frames")
+    if result["mismatches"]:
+        failures.append(f"{result['mismatches']} crops have the wrong size or pixels")
+    if lookup_errors:
+        failures.append(f"get_frame picked the wrong frame {lookup_errors} times")
+    if result["memory_mb"] > args.max_memory_mb:
+        failures.append("frames held exceed the memory cap")
+    if not result["closed"]:
+        failures.append("the frame source was not closed on stop")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Lookup timing and layout check for the cached monitor topology.
+
+Feeds MonitorTopology fake layouts through its `query`/`signature` hooks (no
+display needed): a single screen, mixed-DPI side-by-side monitors, a stack with
+negative coordinates and a layout with gaps. For each one, random points are
+looked up with monitor_at and compared with a bare scan over the monitors (the
+difference in time is the cache freshness check), and clamp_region results are
+checked to stay inside their monitor. A simulated hot-plug then checks that a
+changed display signature rebuilds the cache. Exits non-zero when a check fails.
+
+Run from the backend directory:
+    python -m benchmarks.monitor_bench --points 100000
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Optional
+from app.services.monitors import MonitorTopology
+
+def _monitor(left: int, top: int, width: int, height: int, scale: float = 1.0) -> Dict:
+    return {"left": left, "top": top, "width": width, "height": height, "scale": scale}
+
+LAYOUTS = {
+    "single 1080p": [_monitor(0, 0, 1920, 1080)],
+    "dual mixed dpi": [_monitor(0, 0, 2560, 1440, 1.5), _monitor(2560, 180, 1920, 1080)],
+    "left and above": [_monitor(0, 0, 1920, 1080), _monitor(-1280, 200, 1280, 1024, 1.25),
+                       _monitor(320, -1200, 1920, 1200, 2.0)],
+    "with gaps": [_monitor(0, 0, 1920, 1080), _monitor(2000, 0, 1280, 720), _monitor(0, 1200, 800, 600)]
+}
+
+def _linear_lookup(monitors: List[Dict], x: int, y: int) -> Dict:
+    for monitor in monitors:
+        if monitor["left"] <= x < monitor["left"] + monitor["width"] and \
+                monitor["top"] <= y < monitor["top"] + monitor["height"]:
+            return monitor
+    return monitors[0]
+
+def _random_points(monitors: List[Dict], count: int, rng: random.Random):
+    # Bounding box of the layout plus a margin, so misses (gaps, outside) are covered too
+    left = min(m["left"] for m in monitors) - 100
+    top = min(m["top"] for m in monitors) - 100
+    right = max(m["left"] + m["width"] for m in monitors) + 100
+    bottom = max(m["top"] + m["height"] for m in monitors) + 100
+    return [(rng.randrange(left, right), rng.randrange(top, bottom)) for _ in range(count)]
+
+def _inside(region: Optional[Dict], monitor: Dict) -> bool:
+    return region is not None and region["width"] > 0 and region["height"] > 0 and \
+        monitor["left"] <= region["left"] and region["left"] + region["width"] <= monitor["left"] + monitor["width"] and \
+        monitor["top"] <= region["top"] and region["top"] + region["height"] <= monitor["top"] + monitor["height"]
+
+def run_layout(monitors: List[Dict], points: int, rng: random.Random) -> Dict:
+    topology = MonitorTopology(query=lambda: [dict(m) for m in monitors], signature=lambda: ("fixed",))
+    topology.refresh()
+    samples = _random_points(monitors, points, rng)
+
+    start = time.perf_counter()
+    found = [topology.monitor_at(x, y) for x, y in samples]
+    cached_ns = (time.perf_counter() - start) / points * 1e9
+
+    start = time.perf_counter()
+    expected = [_linear_lookup(monitors, x, y) for x, y in samples]
+    linear_ns = (time.perf_counter() - start) / points * 1e9
+
+    mismatches = sum(1 for a, b in zip(found, expected) if a != b)
+    bad_clamps = 0
+    for x, y in samples[:1000]:
+        region = topology.clamp_region(x - 150, y - 150, 300, 300, anchor=(x, y))
+        monitor = _linear_lookup(monitors, x, y)
+        if region is not None and (not _inside(region, monitor) or region["scale"] != monitor["scale"]):
+            bad_clamps += 1
+    return {"cached_ns": cached_ns, "linear_ns": linear_ns, "mismatches": mismatches, "bad_clamps": bad_clamps}
+
+def run_hotplug(check_interval: float) -> Dict:
+    """Swaps the layout and its signature and checks the cache picks it up after `check_interval`."""
+    state = {"layout": LAYOUTS["single 1080p"], "signature": 1, "queries": 0}
+
+    def query():
+        state["queries"] += 1
+        return [dict(m) for m in state["layout"]]
+
+    topology = MonitorTopology(query=query, signature=lambda: state["signature"], check_interval=check_interval)
+    before = len(topology.monitors)
+    for _ in range(1000):
+        topology.monitor_at(100, 100)
+    queries_while_stable = state["queries"]
+
+    state["layout"], state["signature"] = LAYOUTS["dual mixed dpi"], 2
+    immediately = len(topology.monitors)
+    time.sleep(check_interval * 1.5)
+    after = len(topology.monitors)
+    return {"before": before, "immediately": immediately, "after": after,
+            "queries_while_stable": queries_while_stable, "queries": state["queries"]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--check-interval", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = []
+    for name, monitors in LAYOUTS.items():
+        result = run_layout(monitors, args.points, rng)
+        if result["mismatches"]:
+            failures.append(f"{name}: monitor_at disagrees with the scan {result['mismatches']} times")
+        if result["bad_clamps"]:
+            failures.append(f"{name}: {result['bad_clamps']} clamped regions leave their monitor")
+        print(f"{name:<16} monitor_at={result['cached_ns']:7.0f}ns bare_scan={result['linear_ns']:7.0f}ns "
+              f"mismatches={result['mismatches']} bad_clamps={result['bad_clamps']}")
+
+    hotplug = run_hotplug(args.check_interval)
+    print(f"hot-plug: monitors {hotplug['before']} -> {hotplug['immediately']} (within interval) -> "
+          f"{hotplug['after']} (after), queries={hotplug['queries']} "
+          f"(stable lookups re-queried {hotplug['queries_while_stable'] - 1} times)")
+    if hotplug["after"] != len(LAYOUTS["dual mixed dpi"]):
+        failures.append("hot-plug: the new layout was not picked up")
+    if hotplug["queries_while_stable"] != 1:
+        failures.append("hot-plug: a stable layout was queried again")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
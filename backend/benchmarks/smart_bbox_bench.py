@@ -0,0 +1,113 @@
+"""
+Speed and accuracy benchmark for smart bbox detection (Chromium fallback).
+
+Generates a corpus of synthetic UI screenshots (panels, labelled buttons, text
+noise) with known element boxes, clicks inside a target element and checks the
+detected box against the expected one. Exits non-zero when accuracy drops below
+--min-accuracy, so it can gate changes to app/services/smart_bbox.py.
+
+Run from the backend directory:
+    python -m benchmarks.smart_bbox_bench --images 200
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+import cv2
+import numpy as np
+from app.services import smart_bbox
+
+IMAGE_SIZE = 800
+
+def _iou(a: Dict[str, int], b: Dict[str, int]) -> float:
+    ix = max(0, min(a["right"], b["right"]) - max(a["left"], b["left"]))
+    iy = max(0, min(a["bottom"], b["bottom"]) - max(a["top"], b["top"]))
+    inter = ix * iy
+    area_a = (a["right"] - a["left"]) * (a["bottom"] - a["top"])
+    area_b = (b["right"] - b["left"]) * (b["bottom"] - b["top"])
+    return inter / float(area_a + area_b - inter) if inter else 0.0
+
+def _random_words(rng: random.Random) -> str:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return " ".join("".join(rng.choice(letters) for _ in range(rng.randint(2, 8))) for _ in range(rng.randint(1, 3)))
+
+def generate_case(rng: random.Random) -> Tuple[np.ndarray, int, int, Dict[str, int]]:
+    """Returns (BGRA image, click x, click y, expected bbox) for one synthetic screen."""
+    bg = rng.randint(200, 250)
+    img = np.full((IMAGE_SIZE, IMAGE_SIZE, 3), bg, dtype=np.uint8)
+
+    # A dense page: paragraphs of text noise
+    for _ in range(rng.randint(20, 60)):
+        org = (rng.randint(0, IMAGE_SIZE - 100), rng.randint(15, IMAGE_SIZE))
+        cv2.putText(img, _random_words(rng), org, cv2.FONT_HERSHEY_SIMPLEX, 0.45, (60, 60, 60), 1, cv2.LINE_AA)
+
+    # A panel containing a row of buttons
+    px0, py0 = rng.randint(50, 250), rng.randint(150, 400)
+    px1, py1 = px0 + rng.randint(350, 500), py0 + rng.randint(120, 200)
+    cv2.rectangle(img, (px0, py0), (px1, py1), (bg - 25,) * 3, -1)
+    cv2.rectangle(img, (px0, py0), (px1, py1), (120, 120, 120), 1)
+
+    buttons: List[Dict[str, int]] = []
+    x = px0 + 20
+    while True:
+        bw, bh = rng.randint(60, 120), rng.randint(24, 40)
+        if x + bw > px1 - 20:
+            break
+        by = py0 + rng.randint(20, max(21, py1 - py0 - bh - 20))
+        fill = tuple(rng.randint(30, 200) for _ in range(3))
+        cv2.rectangle(img, (x, by), (x + bw, by + bh), fill, -1)
+        cv2.rectangle(img, (x, by), (x + bw, by + bh), (40, 40, 40), 1)
+        label = _random_words(rng)[:8]
+        cv2.putText(img, label, (x + 6, by + bh // 2 + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
+        buttons.append({"left": x, "top": by, "right": x + bw + 1, "bottom": by + bh + 1})
+        x += bw + rng.randint(10, 30)
+
+    target = rng.choice(buttons)
+    # Click somewhere inside the button, away from the border
+    cx = rng.randint(target["left"] + 4, target["right"] - 5)
+    cy = rng.randint(target["top"] + 4, target["bottom"] - 5)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA), cx, cy, target
+
+def run(images: int, seed: int, iou_threshold: float) -> Dict[str, float]:
+    rng = random.Random(seed)
+    cases = [generate_case(rng) for _ in range(images)]
+
+    timings = []
+    hits = 0
+    for img, cx, cy, expected in cases:
+        start = time.perf_counter()
+        bbox = smart_bbox.detect_smart_bbox(img, cx, cy)
+        timings.append((time.perf_counter() - start) * 1000)
+        if bbox and _iou(bbox, expected) >= iou_threshold:
+            hits += 1
+
+    timings.sort()
+    return {
+        "images": images,
+        "accuracy": hits / images,
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "max_ms": timings[-1]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--iou", type=float, default=0.8, help="IoU needed to count a detection as correct")
+    parser.add_argument("--min-accuracy", type=float, default=0.9)
+    args = parser.parse_args()
+
+    result = run(args.images, args.seed, args.iou)
+    print(
+        f"images={result['images']} accuracy={result['accuracy']:.1%} "
+        f"mean={result['mean_ms']:.2f}ms p95={result['p95_ms']:.2f}ms max={result['max_ms']:.2f}ms"
+    )
+    if result["accuracy"] < args.min_accuracy:
+        print(f"Accuracy below {args.min_accuracy:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,236 +1,895 @@
 import sqlite3
 import json
+import base64
+import binascii
+import hashlib
+import struct
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Iterable, Tuple
 from pathlib import Path
 
 # Database path
 DB_PATH = Path(__file__).parent / "tutorials.db"
 
-def init_db():
-    """Initialize the database with required tables."""
+# Editable step columns and the value used when a step omits them
+STEP_FIELD_DEFAULTS = {
+    'element_name': '',
+    'description': '',
+    'element_type': '',
+    'is_manual': False,
+    'bounding_box': None,
+    'spotlight_overlay': False,
+    'content_type': 'text',
+    'code_language': '',
+    'code_content': ''
+}
+
+# Connection tuning (applied to every pooled connection)
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',        # Readers don't block on a concurrent save
+    'synchronous': 'NORMAL',      # Safe with WAL, avoids an fsync per commit
+    'cache_size': -32000,         # 32 MB page cache
+    'mmap_size': 268435456,       # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000
+}
+
+# Database calls from async routes run on this pool so they never block the event loop.
+# Each worker thread keeps its own connection, so the pool size bounds open connections.
+DB_WORKERS = 4
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+_local = threading.local()
+
+def get_connection() -> sqlite3.Connection:
+    """Get this thread's database connection, opening and tuning it on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+    
+    if conn is not None:
+        conn.close()
+    
     conn = sqlite3.connect(DB_PATH)
+    for pragma, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    
+    _local.conn = conn
+    _local.path = DB_PATH
+    return conn
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Cursor]:
+    """Yield a cursor on this thread's connection; commit on success, roll back on error."""
+    conn = get_connection()
     cursor = conn.cursor()
+    try:
+        yield cursor
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+async def run_in_executor(func, *args, **kwargs):
+    """Run a blocking database function on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def init_db():
+    """Initialize the database with required tables."""
+    with transaction() as cursor:
+        # Explicit BEGIN: sqlite3 only opens transactions implicitly before DML, so schema
+        # changes would otherwise commit one by one and a failed migration would be left half done
+        cursor.execute("BEGIN")
+        # Create tutorials table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tutorials (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                date_created TEXT NOT NULL,
+                date_modified TEXT NOT NULL
+            )
+        """)
+        
+        # Create blobs table (content-addressed screenshot storage, keyed by SHA-256)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                mime_type TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                data BLOB NOT NULL
+            )
+        """)
+        
+        # Create steps table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS steps (
+                id TEXT PRIMARY KEY,
+                tutorial_id TEXT NOT NULL,
+                step_order INTEGER NOT NULL,
+                element_name TEXT,
+                description TEXT,
+                screenshot_base64 TEXT,
+                screenshot_hash TEXT,
+                element_type TEXT,
+                is_manual INTEGER DEFAULT 0,
+                bounding_box TEXT,
+                spotlight_overlay INTEGER DEFAULT 0,
+                content_type TEXT DEFAULT 'text',
+                code_language TEXT,
+                code_content TEXT,
+                FOREIGN KEY (tutorial_id) REFERENCES tutorials(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Migration: Add new columns if they don't exist (for existing databases)
+        try:
+            cursor.execute("ALTER TABLE steps ADD COLUMN content_type TEXT DEFAULT 'text'")
+        except sqlite3.OperationalError:
+            pass # Column likely exists
+
+        try:
+            cursor.execute("ALTER TABLE steps ADD COLUMN code_language TEXT")
+        except sqlite3.OperationalError:
+            pass
+
+        try:
+            cursor.execute("ALTER TABLE steps ADD COLUMN code_content TEXT")
+        except sqlite3.OperationalError:
+            pass
+
+        try:
+            cursor.execute("ALTER TABLE steps ADD COLUMN screenshot_hash TEXT")
+        except sqlite3.OperationalError:
+            pass
+
+        try:
+            cursor.execute("ALTER TABLE steps ADD COLUMN spotlight_overlay INTEGER DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+
+        for column in ('width', 'height'):
+            try:
+                cursor.execute(f"ALTER TABLE blobs ADD COLUMN {column} INTEGER")
+            except sqlite3.OperationalError:
+                pass
+
+        # Migration: Move inline base64 screenshots into the blob store
+        migrated = _migrate_inline_screenshots(cursor)
+        _migrate_blob_sizes(cursor)
+        
+        # Indexes for listing, step lookup and blob garbage collection
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tutorials_date_modified ON tutorials (date_modified, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_steps_tutorial_order ON steps (tutorial_id, step_order)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_steps_screenshot_hash ON steps (screenshot_hash)")
+        
+        _create_search_index(cursor)
+    
+    if migrated:
+        # Give the space of the moved screenshots back; VACUUM can't run inside a transaction
+        print("[Database] Compacting database after migration")
+        get_connection().execute("VACUUM")
+
+def _create_search_index(cursor: sqlite3.Cursor):
+    """
+    Create the FTS5 search tables and the triggers keeping them in sync with
+    tutorials/steps. FTS rows share the rowid of their source row; the index is
+    (re)built from existing data whenever the FTS tables are created.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'steps_fts'")
+    needs_rebuild = cursor.fetchone() is None
     
-    # Create tutorials table
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tutorials (
-            id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            date_created TEXT NOT NULL,
-            date_modified TEXT NOT NULL
+        CREATE VIRTUAL TABLE IF NOT EXISTS tutorials_fts USING fts5(
+            tutorial_id UNINDEXED, title,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS steps_fts USING fts5(
+            step_id UNINDEXED, tutorial_id UNINDEXED, description, element_name, code_content,
+            tokenize = 'unicode61 remove_diacritics 2'
         )
     """)
     
-    # Create steps table
+    # One execute per trigger: executescript would COMMIT the surrounding init_db transaction
+    triggers = [
+        """
+        CREATE TRIGGER IF NOT EXISTS tutorials_fts_insert AFTER INSERT ON tutorials BEGIN
+            INSERT INTO tutorials_fts (rowid, tutorial_id, title) VALUES (new.rowid, new.id, new.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tutorials_fts_update AFTER UPDATE OF title ON tutorials
+        WHEN old.title IS NOT new.title BEGIN
+            DELETE FROM tutorials_fts WHERE rowid = old.rowid;
+            INSERT INTO tutorials_fts (rowid, tutorial_id, title) VALUES (new.rowid, new.id, new.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tutorials_fts_delete AFTER DELETE ON tutorials BEGIN
+            DELETE FROM tutorials_fts WHERE rowid = old.rowid;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS steps_fts_insert AFTER INSERT ON steps BEGIN
+            INSERT INTO steps_fts (rowid, step_id, tutorial_id, description, element_name, code_content)
+            VALUES (new.rowid, new.id, new.tutorial_id, new.description, new.element_name, new.code_content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS steps_fts_update AFTER UPDATE OF description, element_name, code_content ON steps
+        WHEN old.description IS NOT new.description
+          OR old.element_name IS NOT new.element_name
+          OR old.code_content IS NOT new.code_content BEGIN
+            DELETE FROM steps_fts WHERE rowid = old.rowid;
+            INSERT INTO steps_fts (rowid, step_id, tutorial_id, description, element_name, code_content)
+            VALUES (new.rowid, new.id, new.tutorial_id, new.description, new.element_name, new.code_content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS steps_fts_delete AFTER DELETE ON steps BEGIN
+            DELETE FROM steps_fts WHERE rowid = old.rowid;
+        END
+        """
+    ]
+    for trigger in triggers:
+        cursor.execute(trigger)
+    
+    if needs_rebuild:
+        cursor.execute("DELETE FROM tutorials_fts")
+        cursor.execute("""
+            INSERT INTO tutorials_fts (rowid, tutorial_id, title)
+            SELECT rowid, id, title FROM tutorials
+        """)
+        cursor.execute("""
+            INSERT INTO steps_fts (rowid, step_id, tutorial_id, description, element_name, code_content)
+            SELECT rowid, id, tutorial_id, description, element_name, code_content FROM steps
+        """)
+
+def _migrate_inline_screenshots(cursor: sqlite3.Cursor) -> int:
+    """
+    Move legacy base64 screenshots from the steps table into the blobs table and
+    clear the inline copies. Returns the number of steps whose inline data was
+    cleared (the caller vacuums the file afterwards).
+    """
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS steps (
-            id TEXT PRIMARY KEY,
-            tutorial_id TEXT NOT NULL,
-            step_order INTEGER NOT NULL,
-            element_name TEXT,
-            description TEXT,
-            screenshot_base64 TEXT,
-            element_type TEXT,
-            is_manual INTEGER DEFAULT 0,
-            bounding_box TEXT,
-            content_type TEXT DEFAULT 'text',
-            code_language TEXT,
-            code_content TEXT,
-            FOREIGN KEY (tutorial_id) REFERENCES tutorials(id) ON DELETE CASCADE
+        SELECT id FROM steps
+        WHERE screenshot_hash IS NULL AND screenshot_base64 IS NOT NULL AND screenshot_base64 != ''
+    """)
+    step_ids = [row[0] for row in cursor.fetchall()]
+    
+    # Convert one step at a time so only a single screenshot is held in memory
+    for step_id in step_ids:
+        cursor.execute("SELECT screenshot_base64 FROM steps WHERE id = ?", (step_id,))
+        blob_hash = _store_screenshot(cursor, cursor.fetchone()[0])
+        cursor.execute(
+            "UPDATE steps SET screenshot_hash = ?, screenshot_base64 = NULL WHERE id = ?",
+            (blob_hash, step_id)
         )
+    
+    # Rows that already have a hash but still carry the inline copy (the loop above clears
+    # what it converts); the copy is never read again
+    cursor.execute("""
+        UPDATE steps SET screenshot_base64 = NULL
+        WHERE screenshot_base64 IS NOT NULL AND screenshot_base64 != ''
     """)
+    leftovers = cursor.rowcount
+    
+    if step_ids:
+        print(f"[Database] Migrated {len(step_ids)} inline screenshots to blob store")
+    if leftovers:
+        print(f"[Database] Cleared {leftovers} inline copies of screenshots already in the blob store")
+    return len(step_ids) + leftovers
 
-    # Migration: Add new columns if they don't exist (for existing databases)
-    try:
-        cursor.execute("ALTER TABLE steps ADD COLUMN content_type TEXT DEFAULT 'text'")
-    except sqlite3.OperationalError:
-        pass # Column likely exists
+def _migrate_blob_sizes(cursor: sqlite3.Cursor):
+    """Fill in the image dimensions of blobs stored before they were recorded."""
+    cursor.execute("SELECT hash FROM blobs WHERE width IS NULL")
+    hashes = [row[0] for row in cursor.fetchall()]
+    
+    for blob_hash in hashes:
+        cursor.execute("SELECT data FROM blobs WHERE hash = ?", (blob_hash,))
+        width, height = _image_size(cursor.fetchone()[0])
+        cursor.execute("UPDATE blobs SET width = ?, height = ? WHERE hash = ?", (width, height, blob_hash))
 
+def _image_size(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Read (width, height) from a PNG, WebP or JPEG header without decoding the image."""
     try:
-        cursor.execute("ALTER TABLE steps ADD COLUMN code_language TEXT")
-    except sqlite3.OperationalError:
+        if data.startswith(b'\x89PNG\r\n\x1a\n'):
+            return struct.unpack('>II', data[16:24])
+        
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            chunk = data[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', data[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                b0, b1, b2, b3 = data[21:25]
+                return 1 + (b0 | (b1 & 0x3F) << 8), 1 + (b1 >> 6 | b2 << 2 | (b3 & 0x0F) << 10)
+            if chunk == b'VP8X':
+                return 1 + int.from_bytes(data[24:27], 'little'), 1 + int.from_bytes(data[27:30], 'little')
+        
+        if data.startswith(b'\xff\xd8'):
+            # Walk the JPEG segments up to the first start-of-frame marker
+            offset = 2
+            while offset + 9 < len(data):
+                if data[offset] != 0xFF:
+                    break
+                marker = data[offset + 1]
+                length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                    return width, height
+                offset += 2 + length
+    except (struct.error, ValueError):
         pass
+    return None, None
+
+def _detect_mime_type(data: bytes) -> str:
+    """Guess the image mime type from its magic bytes."""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+def store_blob(cursor: sqlite3.Cursor, data: bytes) -> str:
+    """Store raw bytes in the blob table (deduplicated) and return their SHA-256 hash."""
+    blob_hash = hashlib.sha256(data).hexdigest()
+    cursor.execute(
+        "INSERT OR IGNORE INTO blobs (hash, mime_type, size, width, height, data) VALUES (?, ?, ?, ?, ?, ?)",
+        (blob_hash, _detect_mime_type(data), len(data), *_image_size(data), data)
+    )
+    return blob_hash
 
+def _store_screenshot(cursor: sqlite3.Cursor, screenshot_base64: Optional[str]) -> Optional[str]:
+    """Decode a base64 screenshot (optionally a data URI) into the blob store."""
+    if not screenshot_base64:
+        return None
+    
+    if screenshot_base64.startswith('data:'):
+        screenshot_base64 = screenshot_base64.split(',', 1)[-1]
+    
     try:
-        cursor.execute("ALTER TABLE steps ADD COLUMN code_content TEXT")
-    except sqlite3.OperationalError:
-        pass
+        data = base64.b64decode(screenshot_base64, validate=True)
+    except (binascii.Error, ValueError) as e:
+        print(f"[Database] Invalid screenshot data, skipping: {e}")
+        return None
     
-    conn.commit()
-    conn.close()
+    return store_blob(cursor, data) if data else None
 
-def create_tutorial(title: str, steps: List[Dict]) -> str:
-    """Create a new tutorial with steps."""
+def _delete_orphan_blobs(cursor: sqlite3.Cursor, hashes: Iterable[Optional[str]]):
+    """
+    Remove the given blobs (screenshots that were replaced or whose steps were deleted)
+    if no step references them anymore. Each check is an index lookup, so the cost
+    follows the size of the edit rather than the size of the library.
+    """
+    cursor.executemany("""
+        DELETE FROM blobs
+        WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM steps WHERE screenshot_hash = blobs.hash)
+    """, [(blob_hash,) for blob_hash in set(hashes) if blob_hash])
+
+def get_blob(blob_hash: str) -> Optional[Dict]:
+    """Get raw blob bytes, their mime type and image size by hash."""
+    with transaction() as cursor:
+        cursor.execute("SELECT data, mime_type, width, height FROM blobs WHERE hash = ?", (blob_hash,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        return {'data': row[0], 'mime_type': row[1], 'width': row[2], 'height': row[3]}
+
+def _create_tutorial(cursor: sqlite3.Cursor, title: str, steps: List[Dict],
+                     date_created: Optional[str] = None, date_modified: Optional[str] = None,
+                     keep_step_ids: bool = True) -> str:
     import uuid
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     tutorial_id = str(uuid.uuid4())
     now = datetime.now().isoformat()
     
     # Insert tutorial
     cursor.execute(
         "INSERT INTO tutorials (id, title, date_created, date_modified) VALUES (?, ?, ?, ?)",
-        (tutorial_id, title, now, now)
+        (tutorial_id, title, date_created or now, date_modified or now)
     )
     
     # Insert steps
-    for idx, step in enumerate(steps):
-        cursor.execute("""
-            INSERT INTO steps (id, tutorial_id, step_order, element_name, description, 
-                             screenshot_base64, element_type, is_manual, bounding_box,
-                             content_type, code_language, code_content)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            step.get('id', str(uuid.uuid4())),
-            tutorial_id,
-            idx,
-            step.get('element_name', ''),
-            step.get('description', ''),
-            step.get('screenshot_base64', ''),
-            step.get('element_type', ''),
-            1 if step.get('is_manual', False) else 0,
-            json.dumps(step.get('bounding_box')),
-            step.get('content_type', 'text'),
-            step.get('code_language', ''),
-            step.get('code_content', '')
-        ))
-    
-    conn.commit()
-    conn.close()
+    _insert_steps(cursor, [
+        ((keep_step_ids and step.get('id')) or str(uuid.uuid4()), tutorial_id, idx, _step_row(cursor, step))
+        for idx, step in enumerate(steps)
+    ])
     
     return tutorial_id
 
-def get_recent_tutorials(limit: int = 10) -> List[Dict]:
-    """Get recent tutorials (without steps)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def create_tutorial(title: str, steps: List[Dict]) -> str:
+    """Create a new tutorial with steps."""
+    with transaction() as cursor:
+        return _create_tutorial(cursor, title, steps)
+
+# Step fields stored as text (bounding_box is stored as JSON, the flags as integers)
+_STEP_TEXT_FIELDS = [field for field, default in STEP_FIELD_DEFAULTS.items() if isinstance(default, str)] + \
+    ['screenshot_base64', 'screenshot_hash']
+
+def validate_tutorial_entry(tutorial) -> None:
+    """Raise ValueError unless `tutorial` is an importable tutorial object."""
+    if not isinstance(tutorial, dict):
+        raise ValueError("expected a tutorial object")
+    steps = tutorial.get('steps', [])
+    if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+        raise ValueError("'steps' must be a list of step objects")
+    for key in ('title', 'date_created', 'date_modified'):
+        if tutorial.get(key) is not None and not isinstance(tutorial[key], str):
+            raise ValueError(f"'{key}' must be a string")
+    for position, step in enumerate(steps, 1):
+        for key in _STEP_TEXT_FIELDS:
+            if step.get(key) is not None and not isinstance(step[key], str):
+                raise ValueError(f"step {position}: '{key}' must be a string")
+
+def import_tutorials(tutorials: Iterable[Dict]) -> List[str]:
+    """
+    Import many tutorials (e.g. from a JSON-lines archive) in a single transaction.
+    Tutorials and steps get fresh ids so an archive can be imported more than once;
+    titles and dates are preserved. Nothing is imported if any entry fails; a
+    malformed entry raises ValueError naming its position.
+    """
+    tutorial_ids = []
+    with transaction() as cursor:
+        for position, tutorial in enumerate(tutorials, 1):
+            try:
+                validate_tutorial_entry(tutorial)
+                tutorial_ids.append(_create_tutorial(
+                    cursor,
+                    tutorial.get('title') or 'Untitled Tutorial',
+                    tutorial.get('steps', []),
+                    date_created=tutorial.get('date_created'),
+                    date_modified=tutorial.get('date_modified'),
+                    keep_step_ids=False
+                ))
+            except (ValueError, TypeError, AttributeError) as e:
+                # Wrongly typed step fields surface as TypeError/AttributeError
+                raise ValueError(f"entry {position}: {e}") from e
+    return tutorial_ids
+
+def _encode_cursor(date_modified: str, tutorial_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([date_modified, tutorial_id]).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor_token: str) -> Tuple[str, str]:
+    try:
+        date_modified, tutorial_id = json.loads(base64.urlsafe_b64decode(cursor_token.encode('ascii')))
+        return str(date_modified), str(tutorial_id)
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid pagination cursor")
+
+def list_tutorials(limit: int = 10, cursor_token: Optional[str] = None,
+                   include_step_counts: bool = False, include_thumbnail: bool = False) -> Dict:
+    """
+    List tutorials by most recently modified using keyset pagination. Pass the
+    returned next_cursor to fetch the following page; it is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    columns = "t.id, t.title, t.date_created, t.date_modified"
+    if include_step_counts:
+        columns += ", (SELECT COUNT(*) FROM steps s WHERE s.tutorial_id = t.id) AS step_count"
+    if include_thumbnail:
+        columns += """, (SELECT s.screenshot_hash FROM steps s
+                        WHERE s.tutorial_id = t.id AND s.screenshot_hash IS NOT NULL
+                        ORDER BY s.step_order LIMIT 1) AS thumbnail_hash"""
     
-    cursor.execute("""
-        SELECT id, title, date_created, date_modified 
-        FROM tutorials 
-        ORDER BY date_modified DESC 
-        LIMIT ?
-    """, (limit,))
+    where = ""
+    params: List = []
+    if cursor_token:
+        where = "WHERE (t.date_modified, t.id) < (?, ?)"
+        params.extend(_decode_cursor(cursor_token))
+    params.append(limit + 1)
+    
+    with transaction() as cursor:
+        cursor.execute(f"""
+            SELECT {columns}
+            FROM tutorials t
+            {where}
+            ORDER BY t.date_modified DESC, t.id DESC
+            LIMIT ?
+        """, params)
+        rows = cursor.fetchall()
     
     tutorials = []
-    for row in cursor.fetchall():
-        tutorials.append({
+    for row in rows[:limit]:
+        tutorial = {
             'id': row[0],
             'title': row[1],
             'date_created': row[2],
             'date_modified': row[3]
-        })
+        }
+        extra = 4
+        if include_step_counts:
+            tutorial['step_count'] = row[extra]
+            extra += 1
+        if include_thumbnail:
+            tutorial['thumbnail_hash'] = row[extra]
+        tutorials.append(tutorial)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = tutorials[-1]
+        next_cursor = _encode_cursor(last['date_modified'], last['id'])
     
-    conn.close()
-    return tutorials
+    return {'tutorials': tutorials, 'next_cursor': next_cursor}
 
-def get_tutorial(tutorial_id: str) -> Optional[Dict]:
-    """Get a specific tutorial with all its steps."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def get_recent_tutorials(limit: int = 10) -> List[Dict]:
+    """Get recent tutorials (without steps)."""
+    return list_tutorials(limit=limit)['tutorials']
+
+def _build_match_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match (as a prefix)."""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def search_tutorials(query: str, limit: int = 20, offset: int = 0) -> Dict:
+    """
+    Full-text search over tutorial titles and step descriptions, element names and
+    code. Returns tutorials ranked by BM25 (title hits weigh more) and the total count.
+    """
+    match = _build_match_query(query)
+    if not match:
+        return {'results': [], 'total': 0}
+    
+    hits = """
+        SELECT tutorial_id, bm25(tutorials_fts) * 5 AS score, 0 AS step_hit
+        FROM tutorials_fts WHERE tutorials_fts MATCH :match
+        UNION ALL
+        SELECT tutorial_id, bm25(steps_fts) AS score, 1 AS step_hit
+        FROM steps_fts WHERE steps_fts MATCH :match
+    """
     
-    # Get tutorial info
+    with transaction() as cursor:
+        cursor.execute(f"""
+            SELECT t.id, t.title, t.date_created, t.date_modified,
+                   SUM(h.score) AS score, SUM(h.step_hit) AS matching_steps
+            FROM ({hits}) h
+            JOIN tutorials t ON t.id = h.tutorial_id
+            GROUP BY t.id
+            ORDER BY score, t.date_modified DESC
+            LIMIT :limit OFFSET :offset
+        """, {'match': match, 'limit': limit, 'offset': offset})
+        
+        results = []
+        for row in cursor.fetchall():
+            results.append({
+                'id': row[0],
+                'title': row[1],
+                'date_created': row[2],
+                'date_modified': row[3],
+                'score': -row[4],
+                'matching_steps': row[5]
+            })
+        
+        cursor.execute(f"SELECT COUNT(DISTINCT tutorial_id) FROM ({hits})", {'match': match})
+        total = cursor.fetchone()[0]
+        
+        return {'results': results, 'total': total}
+
+def get_tutorial(tutorial_id: str, include_screenshots: bool = True) -> Optional[Dict]:
+    """
+    Get a specific tutorial with all its steps. With include_screenshots=False only
+    step metadata and screenshot hashes are returned (see get_step_screenshot).
+    Steps with spotlight_overlay share a clean screenshot and are highlighted by
+    their bounding_box on the client.
+    """
+    with transaction() as cursor:
+        # Get tutorial info
+        cursor.execute(
+            "SELECT id, title, date_created, date_modified FROM tutorials WHERE id = ?",
+            (tutorial_id,)
+        )
+        
+        tutorial_row = cursor.fetchone()
+        if not tutorial_row:
+            return None
+        
+        # Get steps (blob data is only read when screenshots are requested)
+        screenshot_column = "b.data" if include_screenshots else "NULL"
+        cursor.execute(f"""
+            SELECT s.id, s.element_name, s.description, {screenshot_column}, s.element_type, 
+                   s.is_manual, s.bounding_box, s.content_type, s.code_language, s.code_content,
+                   s.screenshot_hash, s.spotlight_overlay, b.width, b.height
+            FROM steps s
+            LEFT JOIN blobs b ON b.hash = s.screenshot_hash
+            WHERE s.tutorial_id = ? 
+            ORDER BY s.step_order
+        """, (tutorial_id,))
+        
+        steps = []
+        for row in cursor.fetchall():
+            step = {
+                'id': row[0],
+                'element_name': row[1],
+                'description': row[2],
+                'screenshot_hash': row[10],
+                'screenshot_width': row[12],
+                'screenshot_height': row[13],
+                'element_type': row[4],
+                'is_manual': bool(row[5]),
+                'bounding_box': json.loads(row[6]) if row[6] else None,
+                'spotlight_overlay': bool(row[11]),
+                'content_type': row[7] or 'text',
+                'code_language': row[8],
+                'code_content': row[9]
+            }
+            if include_screenshots:
+                step['screenshot_base64'] = base64.b64encode(row[3]).decode('utf-8') if row[3] else ''
+            steps.append(step)
+        
+        return {
+            'id': tutorial_row[0],
+            'title': tutorial_row[1],
+            'date_created': tutorial_row[2],
+            'date_modified': tutorial_row[3],
+            'steps': steps
+        }
+
+def get_step_screenshot(tutorial_id: str, step_id: str) -> Optional[Dict]:
+    """Get the raw screenshot bytes, mime type and hash of a single step."""
+    with transaction() as cursor:
+        cursor.execute("""
+            SELECT b.hash, b.data, b.mime_type
+            FROM steps s
+            JOIN blobs b ON b.hash = s.screenshot_hash
+            WHERE s.tutorial_id = ? AND s.id = ?
+        """, (tutorial_id, step_id))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        return {'hash': row[0], 'data': row[1], 'mime_type': row[2]}
+
+def _step_row(cursor: sqlite3.Cursor, step: Dict, current: Optional[Dict] = None) -> Dict:
+    """
+    Build the column values for a step. When `current` (the stored row) is given,
+    fields missing from `step` keep their stored value instead of the default.
+    """
+    row = {}
+    for field, default in STEP_FIELD_DEFAULTS.items():
+        if field in step:
+            value = step[field]
+        elif current is not None:
+            row[field] = current[field]
+            continue
+        else:
+            value = default
+        
+        if field in ('is_manual', 'spotlight_overlay'):
+            value = 1 if value else 0
+        elif field == 'bounding_box':
+            value = json.dumps(value)
+        row[field] = value
+    
+    if current is not None and 'screenshot_base64' not in step and 'screenshot_hash' not in step:
+        row['screenshot_hash'] = current['screenshot_hash']
+    else:
+        row['screenshot_hash'] = _resolve_screenshot_hash(
+            cursor, step, current['screenshot_hash'] if current else None
+        )
+    return row
+
+def _resolve_screenshot_hash(cursor: sqlite3.Cursor, step: Dict, current_hash: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve the blob hash for a step. A known `screenshot_hash` sent by the client
+    takes precedence, so unchanged screenshots are never decoded again.
+    """
+    blob_hash = step.get('screenshot_hash')
+    if blob_hash:
+        if blob_hash == current_hash:
+            return blob_hash
+        cursor.execute("SELECT 1 FROM blobs WHERE hash = ?", (blob_hash,))
+        if cursor.fetchone():
+            return blob_hash
+    return _store_screenshot(cursor, step.get('screenshot_base64'))
+
+def _get_step_rows(cursor: sqlite3.Cursor, tutorial_id: str) -> Dict[str, Dict]:
+    """Get the stored column values of a tutorial's steps, keyed by step id."""
+    columns = ['id', 'step_order', 'screenshot_hash'] + list(STEP_FIELD_DEFAULTS)
     cursor.execute(
-        "SELECT id, title, date_created, date_modified FROM tutorials WHERE id = ?",
+        f"SELECT {', '.join(columns)} FROM steps WHERE tutorial_id = ?",
         (tutorial_id,)
     )
+    return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+def _insert_steps(cursor: sqlite3.Cursor, steps: List[Tuple[str, str, int, Dict]]):
+    """Insert (step_id, tutorial_id, step_order, row) tuples with a single executemany."""
+    columns = ['id', 'tutorial_id', 'step_order', *STEP_FIELD_DEFAULTS, 'screenshot_hash']
+    cursor.executemany(
+        f"INSERT INTO steps ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [
+            (step_id, tutorial_id, step_order, *(row[column] for column in columns[3:]))
+            for step_id, tutorial_id, step_order, row in steps
+        ]
+    )
+
+def _update_steps(cursor: sqlite3.Cursor, updates: List[Tuple[str, Dict, Dict]]) -> int:
+    """
+    Write only the columns that differ from the stored rows, given (step_id, current, row)
+    tuples. Updates touching the same columns share one executemany. Returns the number
+    of changed steps.
+    """
+    batches: Dict[Tuple[str, ...], List[tuple]] = {}
+    for step_id, current, row in updates:
+        changed = {k: v for k, v in row.items() if current.get(k) != v}
+        if changed:
+            batches.setdefault(tuple(changed), []).append((*changed.values(), step_id))
     
-    tutorial_row = cursor.fetchone()
-    if not tutorial_row:
-        conn.close()
-        return None
-    
-    # Get steps
-    cursor.execute("""
-        SELECT id, element_name, description, screenshot_base64, element_type, 
-               is_manual, bounding_box, content_type, code_language, code_content
-        FROM steps 
-        WHERE tutorial_id = ? 
-        ORDER BY step_order
-    """, (tutorial_id,))
-    
-    steps = []
-    for row in cursor.fetchall():
-        steps.append({
-            'id': row[0],
-            'element_name': row[1],
-            'description': row[2],
-            'screenshot_base64': row[3],
-            'element_type': row[4],
-            'is_manual': bool(row[5]),
-            'bounding_box': json.loads(row[6]) if row[6] else None,
-            'content_type': row[7] or 'text',
-            'code_language': row[8],
-            'code_content': row[9]
-        })
-    
-    conn.close()
-    
-    return {
-        'id': tutorial_row[0],
-        'title': tutorial_row[1],
-        'date_created': tutorial_row[2],
-        'date_modified': tutorial_row[3],
-        'steps': steps
-    }
+    for columns, params in batches.items():
+        assignments = ', '.join(f"{column} = ?" for column in columns)
+        cursor.executemany(f"UPDATE steps SET {assignments} WHERE id = ?", params)
+    return sum(len(params) for params in batches.values())
+
+def _apply_step_order(cursor: sqlite3.Cursor, order: List[str], current_rows: Dict[str, Dict]):
+    """Rewrite step_order only for stored steps whose position changed."""
+    cursor.executemany("UPDATE steps SET step_order = ? WHERE id = ?", [
+        (idx, step_id) for idx, step_id in enumerate(order)
+        if step_id in current_rows and current_rows[step_id]['step_order'] != idx
+    ])
 
 def update_tutorial(tutorial_id: str, title: str, steps: List[Dict]) -> bool:
-    """Update an existing tutorial."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """
+    Update an existing tutorial, diffing the given steps against the stored ones
+    so only inserted, changed, removed or reordered steps are written.
+    """
+    import uuid
     
-    now = datetime.now().isoformat()
+    with transaction() as cursor:
+        now = datetime.now().isoformat()
+        
+        # Update tutorial
+        cursor.execute(
+            "UPDATE tutorials SET title = ?, date_modified = ? WHERE id = ?",
+            (title, now, tutorial_id)
+        )
+        if cursor.rowcount == 0:
+            return False
+        
+        current_rows = _get_step_rows(cursor, tutorial_id)
+        order = []
+        inserts = []
+        updates = []
+        
+        # Diff incoming steps against stored ones
+        for step in steps:
+            step_id = step.get('id') or str(uuid.uuid4())
+            current = current_rows.get(step_id)
+            
+            # Full saves replace every field, so don't fall back to stored values
+            row = _step_row(cursor, step)
+            if current is None:
+                inserts.append((step_id, tutorial_id, len(order), row))
+            else:
+                updates.append((step_id, current, row))
+            order.append(step_id)
+        
+        # Insert new steps and update changed ones
+        _insert_steps(cursor, inserts)
+        _update_steps(cursor, updates)
+        
+        # Delete removed steps
+        kept = set(order)
+        removed = [step_id for step_id in current_rows if step_id not in kept]
+        cursor.executemany("DELETE FROM steps WHERE id = ?", [(step_id,) for step_id in removed])
+        
+        _apply_step_order(cursor, order, current_rows)
+        
+        # Only screenshots that were replaced or dropped can have become orphans
+        released = [current_rows[step_id]['screenshot_hash'] for step_id in removed]
+        released += [current['screenshot_hash'] for _, current, row in updates
+                     if row['screenshot_hash'] != current['screenshot_hash']]
+        _delete_orphan_blobs(cursor, released)
+        
+        return True
+
+def _operation_index(operation: Dict, length: int) -> int:
+    """Target position of an insert/move operation, 0..length (defaults to the end)."""
+    index = operation.get('index', length)
+    # bool is an int subclass; don't accept True as a position
+    if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index <= length:
+        raise ValueError(f"Invalid index: {index!r}")
+    return index
+
+def patch_tutorial(tutorial_id: str, title: Optional[str] = None, operations: Optional[List[Dict]] = None) -> bool:
+    """
+    Apply per-step operations to a tutorial. Supported operations:
+      {"op": "insert", "step": {...}, "index": 2}   (index defaults to the end)
+      {"op": "update", "id": "...", "fields": {...}} (only the given fields change)
+      {"op": "delete", "id": "..."}
+      {"op": "move", "id": "...", "index": 0}
+    Raises ValueError for malformed operations.
+    """
+    import uuid
     
-    # Update tutorial
-    cursor.execute(
-        "UPDATE tutorials SET title = ?, date_modified = ? WHERE id = ?",
-        (title, now, tutorial_id)
-    )
+    with transaction() as cursor:
+        now = datetime.now().isoformat()
+        
+        if title is not None:
+            cursor.execute(
+                "UPDATE tutorials SET title = ?, date_modified = ? WHERE id = ?",
+                (title, now, tutorial_id)
+            )
+        else:
+            cursor.execute(
+                "UPDATE tutorials SET date_modified = ? WHERE id = ?",
+                (now, tutorial_id)
+            )
+        if cursor.rowcount == 0:
+            return False
     
-    # Delete old steps
-    cursor.execute("DELETE FROM steps WHERE tutorial_id = ?", (tutorial_id,))
+        current_rows = _get_step_rows(cursor, tutorial_id)
+        order = sorted(current_rows, key=lambda step_id: current_rows[step_id]['step_order'])
+        released = []   # Screenshot hashes replaced or dropped by the operations
     
-    # Insert new steps
-    for idx, step in enumerate(steps):
-        cursor.execute("""
-            INSERT INTO steps (id, tutorial_id, step_order, element_name, description, 
-                             screenshot_base64, element_type, is_manual, bounding_box,
-                             content_type, code_language, code_content)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            step.get('id'),
-            tutorial_id,
-            idx,
-            step.get('element_name', ''),
-            step.get('description', ''),
-            step.get('screenshot_base64', ''),
-            step.get('element_type', ''),
-            1 if step.get('is_manual', False) else 0,
-            json.dumps(step.get('bounding_box')),
-            step.get('content_type', 'text'),
-            step.get('code_language', ''),
-            step.get('code_content', '')
-        ))
-    
-    conn.commit()
-    conn.close()
-    
-    return True
-
-def delete_tutorial(tutorial_id: str) -> bool:
-    """Delete a tutorial and all its steps."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+        for operation in operations or []:
+            if not isinstance(operation, dict):
+                raise ValueError(f"Invalid operation: {operation!r}")
+            op = operation.get('op')
+            step_id = operation.get('id')
+    
+            if op == 'insert':
+                step = operation.get('step') or {}
+                if not isinstance(step, dict):
+                    raise ValueError("Insert needs a step object")
+                step_id = step.get('id') or str(uuid.uuid4())
+                if step_id in order:
+                    raise ValueError(f"Step {step_id} already exists")
+                index = _operation_index(operation, len(order))
+                row = _step_row(cursor, step)
+                _insert_steps(cursor, [(step_id, tutorial_id, -1, row)])
+                current_rows[step_id] = {'step_order': -1, **row}
+                order.insert(index, step_id)
+            elif step_id not in order:
+                raise ValueError(f"Unknown step id: {step_id}")
+            elif op == 'update':
+                current = current_rows[step_id]
+                fields = operation.get('fields') or {}
+                if not isinstance(fields, dict):
+                    raise ValueError("Update needs a fields object")
+                row = _step_row(cursor, fields, current)
+                _update_steps(cursor, [(step_id, current, row)])
+                if row['screenshot_hash'] != current['screenshot_hash']:
+                    released.append(current['screenshot_hash'])
+                current_rows[step_id] = {**current, **row}
+            elif op == 'delete':
+                cursor.execute("DELETE FROM steps WHERE id = ?", (step_id,))
+                order.remove(step_id)
+                released.append(current_rows[step_id]['screenshot_hash'])
+            elif op == 'move':
+                order.remove(step_id)
+                order.insert(_operation_index(operation, len(order)), step_id)
+            else:
+                raise ValueError(f"Unsupported operation: {op}")
     
-    cursor.execute("DELETE FROM tutorials WHERE id = ?", (tutorial_id,))
+        _apply_step_order(cursor, order, current_rows)
     
-    conn.commit()
-    conn.close()
+        _delete_orphan_blobs(cursor, released)
     
-    return True
+        return True
+
+def delete_tutorial(tutorial_id: str) -> bool:
+    """Delete a tutorial and all its steps."""
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM tutorials WHERE id = ?", (tutorial_id,))
+        cursor.execute("SELECT screenshot_hash FROM steps WHERE tutorial_id = ?", (tutorial_id,))
+        released = [row[0] for row in cursor.fetchall()]
+        # Foreign keys are not enforced, so remove steps explicitly
+        cursor.execute("DELETE FROM steps WHERE tutorial_id = ?", (tutorial_id,))
+        _delete_orphan_blobs(cursor, released)
+        
+        return True
 
 # Initialize database on module import
 init_db()
@@ -2,7 +2,9 @@ import { app, BrowserWindow, ipcMain, dialog, shell } from 'electron';
 import path from 'path';
 import { spawn, ChildProcess } from 'child_process';
 import fs from 'fs/promises';
-import { existsSync } from 'fs';
+import { existsSync, createWriteStream } from 'fs';
+import { Readable } from 'stream';
+import { pipeline } from 'stream/promises';
 
 let mainWindow: BrowserWindow | null = null;
 let pythonProcess: ChildProcess | null = null;
@@ -143,6 +145,33 @@ ipcMain.handle('save-tutorial', async (event, { title, steps }) => {
   }
 });
 
+// Streams a server-side export (zip/html/md) straight to disk, so the renderer never holds the images
+ipcMain.handle('export-tutorial-archive', async (event, { title, url, extension }) => {
+  try {
+    const { canceled, filePath } = await dialog.showSaveDialog(mainWindow!, {
+      title: 'Exportar tutorial',
+      defaultPath: `${title.replace(/[^a-z0-9]/gi, '_').toLowerCase()}.${extension}`,
+      filters: [{ name: extension.toUpperCase(), extensions: [extension] }],
+    });
+
+    if (canceled || !filePath) {
+      return { success: false, message: 'Cancelado pelo usuário.' };
+    }
+
+    const response = await fetch(url);
+    if (!response.ok || !response.body) {
+      throw new Error(`Falha na exportação (HTTP ${response.status})`);
+    }
+    await pipeline(Readable.fromWeb(response.body as any), createWriteStream(filePath));
+
+    shell.showItemInFolder(filePath);
+    return { success: true, path: filePath };
+  } catch (error: any) {
+    console.error('Export error:', error);
+    return { success: false, message: error.message };
+  }
+});
+
 // --- Lifecycle ---
 
 app.whenReady().then(() => {
@@ -2,5 +2,6 @@ import { contextBridge, ipcRenderer } from 'electron';
 
 contextBridge.exposeInMainWorld('electronAPI', {
   saveTutorial: (data: any) => ipcRenderer.invoke('save-tutorial', data),
+  exportTutorialArchive: (data: { title: string; url: string; extension: string }) => ipcRenderer.invoke('export-tutorial-archive', data),
   onExportResult: (callback: (event: any, result: any) => void) => ipcRenderer.on('export-result', callback),
 });
@@ -7,7 +7,10 @@ import { SettingsModal } from './components/SettingsModal';
 import { useRecording } from './hooks/useRecording';
 import { useTutorials } from './hooks/useTutorials';
 import { api } from './services/api';
+import { isGenericStep } from './lib/refinement';
 import { Step } from './types';
+import { stepImageDataUrl } from './lib/spotlight';
+import { releaseCaptureImages } from './lib/captureImages';
 
 function App() {
   const { isRecording, steps, setSteps, toggleRecording } = useRecording();
@@ -46,6 +49,7 @@ function App() {
   const handleLoadTutorial = async (id: string) => {
     const tutorial = await loadTutorial(id);
     if (tutorial) {
+      releaseCaptureImages();
       setTitle(tutorial.title);
       setSteps(tutorial.steps);
     }
@@ -54,6 +58,10 @@ function App() {
   const handleSaveTutorial = async () => {
     const success = await saveTutorial(title, steps);
     if (success) {
+      // Saved screenshots are served by hash from now on; drop the in-memory copies
+      setSteps((prev) => prev.map((s) =>
+        s.screenshot_hash && steps.some((saved) => saved.id === s.id) ? { ...s, screenshot_base64: '' } : s
+      ));
       showNotification('Tutorial salvo com sucesso!');
     } else {
       showNotification('Erro ao salvar tutorial.', 'error');
@@ -65,6 +73,7 @@ function App() {
 
     const isCurrent = await deleteTutorial(id);
     if (isCurrent) {
+      releaseCaptureImages();
       setSteps([]);
       setTitle('Meu Tutorial');
     }
@@ -74,24 +83,61 @@ function App() {
     if (steps.length > 0 && !confirm('Deseja fechar o tutorial atual? Alterações não salvas serão perdidas.')) {
       return;
     }
+    releaseCaptureImages();
     setSteps([]);
     setTitle('Meu Tutorial');
     setCurrentTutorialId(null);
     setSelectedStepId(null);
   };
 
+  // Queue every generic step not already being refined; results arrive on the refinement event stream
+  const handleRefineGenericSteps = async () => {
+    const pending = steps.filter((s) => !s.is_manual && !s.isRefining && isGenericStep(s));
+    if (pending.length === 0) return;
+
+    const ids = new Set(pending.map((s) => s.id));
+    setSteps((prev) => prev.map((s) => (ids.has(s.id) ? { ...s, isRefining: true } : s)));
+    let queued = new Set<string>();
+    try {
+      queued = new Set(await api.refineSteps(pending));
+    } catch (e) {
+      console.error('[Refinement] Batch failed:', e);
+    }
+    // Steps the backend couldn't queue (no image available) stop spinning
+    setSteps((prev) => prev.map((s) => (ids.has(s.id) && !queued.has(s.id) ? { ...s, isRefining: false } : s)));
+  };
+
   const handleExportTutorial = async () => {
     if (steps.length === 0) return;
 
+    // @ts-ignore
+    if (window.electronAPI?.exportTutorialArchive) {
+      // The backend streams the saved tutorial (manual.md + index.html + assets/) as a zip,
+      // so save first and let the main process write the download to disk
+      const id = await saveTutorial(title, steps);
+      if (!id) {
+        showNotification('Erro ao salvar tutorial.', 'error');
+        return;
+      }
+      // @ts-ignore
+      const result = await window.electronAPI.exportTutorialArchive({ title, url: api.exportUrl(id, 'zip'), extension: 'zip' });
+      if (result.success) {
+        showNotification(`Tutorial exportado em: ${result.path}`);
+      } else {
+        showNotification(`Erro ao exportar: ${result.message}`, 'error');
+      }
+      return;
+    }
+
     const exportData = {
       title,
-      steps: steps.map(s => ({
+      steps: await Promise.all(steps.map(async s => ({
         description: s.description,
-        image: s.screenshot_base64 ? `data:image/png;base64,${s.screenshot_base64}` : null,
+        image: s.is_manual ? null : await stepImageDataUrl({ ...s, screenshot_base64: await api.getStepImageBase64(s) }),
         content_type: s.content_type || 'text',
         code_language: s.code_language,
         code_content: s.code_content
-      }))
+      })))
     };
 
     // @ts-ignore
@@ -110,6 +156,14 @@ function App() {
 
   // Step manipulation handlers
   const deleteStep = (id: string) => {
+    const step = steps.find((s) => s.id === id);
+    if (step?.isRefining) {
+      api.cancelRefinements(id).catch((e) => console.error('[Refinement] Cancel failed:', e));
+    }
+    // Near-duplicate steps share a capture; keep it while another step uses it
+    if (step?.screenshot_id && !steps.some((s) => s.id !== id && s.screenshot_id === step.screenshot_id)) {
+      releaseCaptureImages([step.screenshot_id]);
+    }
     setSteps((prev) => prev.filter((s) => s.id !== id));
     if (selectedStepId === id) setSelectedStepId(null);
   };
@@ -190,6 +244,8 @@ function App() {
           onNewTutorial={handleNewTutorial}
           onSaveTutorial={handleSaveTutorial}
           onExportTutorial={handleExportTutorial}
+          canRefine={steps.some((s) => !s.is_manual && !s.isRefining && isGenericStep(s))}
+          onRefineGenericSteps={handleRefineGenericSteps}
         />
 
         <StepList
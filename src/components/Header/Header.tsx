@@ -1,5 +1,5 @@
 import React from 'react';
-import { FileText } from 'lucide-react';
+import { FileText, Sparkles } from 'lucide-react';
 import { AnimateIcon } from '../animate-ui/icons/icon';
 import { Download } from '../animate-ui/icons/download';
 
@@ -10,6 +10,8 @@ interface HeaderProps {
     onNewTutorial: () => void;
     onSaveTutorial: () => void;
     onExportTutorial: () => void;
+    canRefine: boolean;
+    onRefineGenericSteps: () => void;
 }
 
 export const Header: React.FC<HeaderProps> = ({
@@ -18,7 +20,9 @@ export const Header: React.FC<HeaderProps> = ({
     onTitleChange,
     onNewTutorial,
     onSaveTutorial,
-    onExportTutorial
+    onExportTutorial,
+    canRefine,
+    onRefineGenericSteps
 }) => {
     return (
         <header className="h-20 border-b border-white/10 flex items-center justify-between px-8 bg-zinc-950 sticky top-0 z-10">
@@ -42,6 +46,15 @@ export const Header: React.FC<HeaderProps> = ({
                             <FileText size={16} />
                             Novo
                         </button>
+                        <button
+                            onClick={onRefineGenericSteps}
+                            disabled={!canRefine}
+                            title="Refinar com IA todos os passos genéricos"
+                            className="flex items-center gap-2 px-4 py-2 bg-zinc-900 text-white border border-white/10 hover:bg-zinc-800 rounded-lg transition-colors font-medium text-sm disabled:opacity-50 disabled:cursor-not-allowed"
+                        >
+                            <Sparkles size={16} />
+                            Refinar
+                        </button>
                         <AnimateIcon animateOnHover>
                             <button
                                 onClick={onSaveTutorial}
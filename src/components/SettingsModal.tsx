@@ -9,6 +9,13 @@ interface Model {
   downloaded: boolean;
 }
 
+interface ModelProfiles {
+  recommended: string;
+  profile: string;
+  effective: { profile: string; n_threads: number; n_ctx: number; kv_cache_type: string };
+  profiles: Record<string, { tokens_per_second: number | null }>;
+}
+
 interface SettingsModalProps {
   isOpen: boolean;
   onClose: () => void;
@@ -19,14 +26,44 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
   const [loading, setLoading] = useState(false);
   const [downloadingId, setDownloadingId] = useState<string | null>(null);
   const [progress, setProgress] = useState(0);
+  // Transfer rate (bytes/s) and remaining seconds reported by the backend
+  const [transfer, setTransfer] = useState<{ speed: number; eta: number | null } | null>(null);
   const [activeModel, setActiveModel] = useState<string | null>(null);
+  // Model being loaded in the background by the backend
+  const [loadingModelId, setLoadingModelId] = useState<string | null>(null);
+  const [profiles, setProfiles] = useState<Record<string, ModelProfiles>>({});
+  const [engineSettings, setEngineSettings] = useState<{ preload_on_start: boolean; idle_unload_minutes: number } | null>(null);
 
   useEffect(() => {
     if (isOpen) {
       fetchModels();
+      fetchEngine();
     }
   }, [isOpen]);
 
+  // Poll the engine status while a model loads
+  useEffect(() => {
+    let interval: any;
+    if (loadingModelId) {
+      interval = setInterval(async () => {
+        try {
+          const res = await fetch('http://localhost:8000/health');
+          const { model } = await res.json();
+          if (model.status === 'ready') {
+            setActiveModel(model.model_id);
+            setLoadingModelId(null);
+          } else if (model.status === 'error') {
+            setLoadingModelId(null);
+            alert('Failed to load model: ' + model.error);
+          }
+        } catch (e) {
+          console.error(e);
+        }
+      }, 1000);
+    }
+    return () => clearInterval(interval);
+  }, [loadingModelId]);
+
   // Poll progress if downloading
   useEffect(() => {
     let interval: any;
@@ -37,6 +74,7 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
           const data = await res.json();
           if (data.status === 'downloading') {
             setProgress(data.progress);
+            setTransfer(data.speed_bps ? { speed: data.speed_bps, eta: data.eta_seconds } : null);
           } else if (data.status === 'completed') {
             setDownloadingId(null);
             fetchModels(); // Refresh list
@@ -56,8 +94,9 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
     setLoading(true);
     try {
       const res = await fetch('http://localhost:8000/settings/models');
-      const data = await res.json();
+      const data: Model[] = await res.json();
       setModels(data);
+      data.filter((m) => m.downloaded).forEach((m) => fetchProfiles(m.id));
     } catch (e) {
       console.error(e);
     } finally {
@@ -69,6 +108,7 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
     try {
       setDownloadingId(modelId);
       setProgress(0);
+      setTransfer(null);
       await fetch('http://localhost:8000/settings/models/download', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -80,20 +120,74 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
     }
   };
 
+  const fetchProfiles = async (modelId: string) => {
+    try {
+      const res = await fetch(`http://localhost:8000/settings/models/${modelId}/profiles`);
+      const data = await res.json();
+      setProfiles((prev) => ({ ...prev, [modelId]: data }));
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
+  // A loaded model is reloaded by the backend with the new profile
+  const handleProfileChange = async (modelId: string, profile: string) => {
+    try {
+      const res = await fetch(`http://localhost:8000/settings/models/${modelId}/profile`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ profile }),
+      });
+      const data = await res.json();
+      setProfiles((prev) => ({ ...prev, [modelId]: data }));
+      if (activeModel === modelId) {
+        setActiveModel(null);
+        setLoadingModelId(modelId);
+      }
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
+  const fetchEngine = async () => {
+    try {
+      const res = await fetch('http://localhost:8000/settings/engine');
+      const data = await res.json();
+      setEngineSettings({ preload_on_start: data.preload_on_start, idle_unload_minutes: data.idle_unload_minutes });
+      const { status, model_id, pending_model_id } = data.engine;
+      if (status === 'ready') setActiveModel(model_id);
+      if (status === 'loading' || status === 'warming_up') setLoadingModelId(pending_model_id);
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
+  const updateEngineSettings = async (changes: Partial<{ preload_on_start: boolean; idle_unload_minutes: number }>) => {
+    try {
+      const res = await fetch('http://localhost:8000/settings/engine', {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(changes),
+      });
+      const data = await res.json();
+      setEngineSettings({ preload_on_start: data.preload_on_start, idle_unload_minutes: data.idle_unload_minutes });
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
+  // Loading runs in the background; the status poll above reports when it's ready
   const handleLoad = async (modelId: string) => {
     try {
-      setLoading(true);
-      await fetch('http://localhost:8000/settings/models/load', {
+      const res = await fetch('http://localhost:8000/settings/models/load', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ model_id: modelId }),
       });
-      setActiveModel(modelId);
-      alert('Model loaded successfully!');
+      if (!res.ok) throw new Error((await res.json()).detail);
+      setLoadingModelId(modelId);
     } catch (e) {
       alert('Failed to load model');
-    } finally {
-      setLoading(false);
     }
   };
 
@@ -132,14 +226,18 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
                       </span>
                       <button
                         onClick={() => handleLoad(model.id)}
-                        disabled={activeModel === model.id}
+                        disabled={activeModel === model.id || !!loadingModelId}
                         className={`text-xs px-3 py-1.5 rounded transition-colors ${
                           activeModel === model.id
                             ? 'bg-blue-500/20 text-blue-400 cursor-default'
                             : 'bg-white/10 hover:bg-white/20 text-white'
                         }`}
                       >
-                        {activeModel === model.id ? 'Ativo' : 'Carregar'}
+                        {loadingModelId === model.id ? (
+                          <span className="flex items-center gap-1">
+                            <Loader2 size={12} className="animate-spin" /> Carregando...
+                          </span>
+                        ) : activeModel === model.id ? 'Ativo' : 'Carregar'}
                       </button>
                     </div>
                   ) : (
@@ -158,10 +256,35 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
                   )}
                 </div>
 
+                {model.downloaded && profiles[model.id] && (
+                  <div className="mt-3 flex items-center gap-2 text-xs text-white/60">
+                    <span>Perfil:</span>
+                    <select
+                      value={profiles[model.id].profile}
+                      onChange={(e) => handleProfileChange(model.id, e.target.value)}
+                      className="bg-white/10 rounded px-2 py-1 text-white"
+                    >
+                      <option value="auto">Automático ({profiles[model.id].recommended})</option>
+                      {Object.entries(profiles[model.id].profiles).map(([name, stats]) => (
+                        <option key={name} value={name}>
+                          {name}{stats.tokens_per_second ? ` — ${stats.tokens_per_second} tok/s` : ''}
+                        </option>
+                      ))}
+                    </select>
+                    <span className="text-white/40">
+                      {profiles[model.id].effective.n_threads} threads, contexto {profiles[model.id].effective.n_ctx}, KV {profiles[model.id].effective.kv_cache_type}
+                    </span>
+                  </div>
+                )}
+
                 {downloadingId === model.id && (
                   <div className="mt-3">
                     <div className="flex justify-between text-xs text-white/60 mb-1">
-                      <span>Baixando...</span>
+                      <span>
+                        Baixando...
+                        {transfer && ` ${(transfer.speed / 1024 ** 2).toFixed(1)} MB/s`}
+                        {transfer?.eta != null && ` · ${Math.ceil(transfer.eta / 60)} min restantes`}
+                      </span>
                       <span>{progress > 0 ? `${progress.toFixed(1)}%` : 'Iniciando...'}</span>
                     </div>
                     <div className="h-1.5 bg-white/10 rounded-full overflow-hidden">
@@ -176,6 +299,30 @@ export function SettingsModal({ isOpen, onClose }: SettingsModalProps) {
             ))}
           </div>
           
+          {engineSettings && (
+            <div className="mt-6 space-y-3 text-sm text-white/80">
+              <label className="flex items-center gap-2">
+                <input
+                  type="checkbox"
+                  checked={engineSettings.preload_on_start}
+                  onChange={(e) => updateEngineSettings({ preload_on_start: e.target.checked })}
+                />
+                Carregar o último modelo ao iniciar
+              </label>
+              <label className="flex items-center gap-2">
+                Liberar a memória após
+                <input
+                  type="number"
+                  min={0}
+                  value={engineSettings.idle_unload_minutes}
+                  onChange={(e) => updateEngineSettings({ idle_unload_minutes: Math.max(0, Number(e.target.value)) })}
+                  className="w-16 bg-white/10 rounded px-2 py-1 text-white"
+                />
+                minutos sem uso (0 = nunca)
+              </label>
+            </div>
+          )}
+
           <div className="mt-6 p-4 bg-blue-500/10 border border-blue-500/20 rounded-lg flex gap-3">
             <AlertCircle className="text-blue-400 shrink-0" size={20} />
             <div className="text-sm text-blue-200">
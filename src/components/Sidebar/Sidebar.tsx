@@ -1,10 +1,13 @@
-import React from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { AnimateIcon } from '../animate-ui/icons/icon';
 import { Play } from "../animate-ui/icons/play"
 import { SavedTutorial } from '../../types';
 import { Pause } from "../animate-ui/icons/pause"
 import { Trash2 } from '../animate-ui/icons/trash-2';
-import { Settings } from 'lucide-react';
+import { Search, Settings, X } from 'lucide-react';
+import { api } from '../../services/api';
+
+const SEARCH_DELAY_MS = 250;
 
 interface SidebarProps {
     isRecording: boolean;
@@ -25,6 +28,32 @@ export const Sidebar: React.FC<SidebarProps> = ({
     onDeleteTutorial,
     onOpenSettings
 }) => {
+    const [query, setQuery] = useState('');
+    const [searchResults, setSearchResults] = useState<{ results: SavedTutorial[]; total: number } | null>(null);
+    // Only the latest search may update the list (responses can arrive out of order)
+    const searchIdRef = useRef(0);
+
+    useEffect(() => {
+        const searchId = ++searchIdRef.current;
+        if (!query.trim()) {
+            setSearchResults(null);
+            return;
+        }
+        // Also re-run when the saved list changes, so deleted or renamed tutorials don't linger
+        const timer = setTimeout(async () => {
+            try {
+                const results = await api.searchTutorials(query.trim());
+                if (searchId === searchIdRef.current) setSearchResults(results);
+            } catch (error) {
+                console.error('Search failed:', error);
+            }
+        }, SEARCH_DELAY_MS);
+        return () => clearTimeout(timer);
+    }, [query, savedTutorials]);
+
+    const searching = query.trim() !== '';
+    const tutorials = searching ? searchResults?.results ?? [] : savedTutorials;
+
     return (
         <aside className="w-72 bg-black border-r border-white/10 flex flex-col z-20">
             <div className="p-8 border-b border-white/10 flex justify-between items-center">
@@ -64,14 +93,37 @@ export const Sidebar: React.FC<SidebarProps> = ({
                     </AnimateIcon>
                 </div>
 
-                {/* Recent Tutorials */}
+                {/* Recent Tutorials / Search */}
                 <div className="space-y-3">
-                    <div className="text-xs font-bold text-zinc-500 uppercase tracking-wider px-2">Últimos Manuais</div>
+                    <div className="relative">
+                        <Search size={14} className="absolute left-3 top-1/2 -translate-y-1/2 text-zinc-500" />
+                        <input
+                            type="text"
+                            value={query}
+                            onChange={(e) => setQuery(e.target.value)}
+                            placeholder="Buscar manuais..."
+                            className="w-full pl-8 pr-8 py-2 bg-zinc-900/50 border border-white/10 focus:border-white/30 rounded-lg text-sm text-white placeholder-zinc-600 outline-none transition-colors"
+                        />
+                        {searching && (
+                            <button
+                                onClick={() => setQuery('')}
+                                className="absolute right-2 top-1/2 -translate-y-1/2 p-1 text-zinc-500 hover:text-white transition-colors"
+                                title="Limpar busca"
+                            >
+                                <X size={14} />
+                            </button>
+                        )}
+                    </div>
+                    <div className="text-xs font-bold text-zinc-500 uppercase tracking-wider px-2">
+                        {searching ? `Resultados${searchResults ? ` (${searchResults.total})` : ''}` : 'Últimos Manuais'}
+                    </div>
                     <div className="space-y-2">
-                        {savedTutorials.length === 0 ? (
-                            <p className="text-xs text-zinc-600 px-2">Nenhum manual salvo</p>
+                        {tutorials.length === 0 ? (
+                            <p className="text-xs text-zinc-600 px-2">
+                                {searching ? (searchResults ? 'Nenhum resultado' : 'Buscando...') : 'Nenhum manual salvo'}
+                            </p>
                         ) : (
-                            savedTutorials.map((tutorial) => (
+                            tutorials.map((tutorial) => (
                                 <div
                                     key={tutorial.id}
                                     className="group flex items-center justify-between p-3 bg-zinc-900/50 hover:bg-zinc-800 rounded-lg border border-white/5 hover:border-white/20 transition-all cursor-pointer"
@@ -1,10 +1,13 @@
-import React from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { ChevronRight, ZoomIn, Edit3, Plus } from 'lucide-react';
 import { Step } from '../../types';
 import { Trash2 } from '../animate-ui/icons/trash-2';
 import { AnimateIcon } from '../animate-ui/icons/icon';
 import { MessageSquareCode } from '../animate-ui/icons/message-square-code';
 import { MessageSquareText } from '../animate-ui/icons/message-square-text';
+import { SPOTLIGHT_COLOR, SPOTLIGHT_THICKNESS, stepImageDataUrl, toDataUrl } from '../../lib/spotlight';
+import { api } from '../../services/api';
+import { captureImageUrl, createCaptureImageUrl, hasCaptureImage } from '../../lib/captureImages';
 
 interface StepItemProps {
     step: Step;
@@ -35,9 +38,55 @@ export const StepItem: React.FC<StepItemProps> = ({
     onInsertStep,
     onZoomImage
 }) => {
+    // Natural size of the loaded preview, used when the full-size dimensions are unknown
+    const [imageSize, setImageSize] = useState<{ width: number; height: number } | null>(null);
+    // Previews are tried in order (capture thumbnail, stored thumbnail, in-memory image) until one loads
+    const [sourceIndex, setSourceIndex] = useState(0);
+    // Object URL of the renderer's copy of an unsaved capture, once the backend no longer serves it
+    const [localUrl, setLocalUrl] = useState<string | null>(() => captureImageUrl(step.screenshot_id));
+    const bbox = step.bounding_box;
+
+    const previewSources = [
+        ...api.thumbnailUrls(step),
+        ...(step.screenshot_base64 ? [toDataUrl(step.screenshot_base64)] : []),
+        ...(localUrl ? [localUrl] : [])
+    ];
+    const previewSrc = previewSources[sourceIndex];
+
+    useEffect(() => {
+        setSourceIndex(0);
+        setImageSize(null);
+        setLocalUrl(captureImageUrl(step.screenshot_id));
+    }, [step.screenshot_url, step.screenshot_hash, step.screenshot_id]);
+
+    useEffect(() => {
+        if (previewSrc || localUrl || !step.screenshot_id || !hasCaptureImage(step.screenshot_id)) return;
+        createCaptureImageUrl(step.screenshot_id).then(setLocalUrl);
+    }, [previewSrc, localUrl, step.screenshot_id]);
+
+    // Steps on screen get their pending refinement moved ahead of the background queue
+    const containerRef = useRef<HTMLDivElement>(null);
+    useEffect(() => {
+        const element = containerRef.current;
+        if (!step.isRefining || !element) return;
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) {
+                api.prioritizeRefinement(step.id).catch(() => { /* job may already be done */ });
+                observer.disconnect();
+            }
+        });
+        observer.observe(element);
+        return () => observer.disconnect();
+    }, [step.id, step.isRefining]);
+
+    // The overlay is drawn in full-resolution coordinates, whatever the preview size
+    const overlayWidth = step.screenshot_width || imageSize?.width;
+    const overlayHeight = step.screenshot_height || imageSize?.height;
+
     return (
         <>
             <div
+                ref={containerRef}
                 onClick={onSelect}
                 className={`group relative bg-black border rounded-xl p-1 transition-all duration-200 hover:border-zinc-700 ${isSelected ? 'border-white ring-1 ring-white/10' : 'border-white/10'
                     }`}
@@ -87,18 +136,46 @@ export const StepItem: React.FC<StepItemProps> = ({
                                     className="relative w-80 aspect-video rounded-lg overflow-hidden bg-zinc-900 border border-white/10 group/image cursor-pointer"
                                     onClick={(e) => {
                                         e.stopPropagation();
-                                        if (step.screenshot_base64) {
-                                            onZoomImage(`data:image/png;base64,${step.screenshot_base64}`);
-                                        }
+                                        // Full resolution is only fetched when zooming
+                                        api.getStepImageBase64(step)
+                                            .then((screenshot_base64) => stepImageDataUrl({ ...step, screenshot_base64 }))
+                                            .then((url) => url && onZoomImage(url))
+                                            .catch((error) => console.error('[Zoom] Failed to load screenshot:', error));
                                     }}
                                 >
-                                    {step.screenshot_base64 ? (
+                                    {previewSrc ? (
                                         <>
                                             <img
-                                                src={`data:image/png;base64,${step.screenshot_base64}`}
+                                                src={previewSrc}
                                                 alt={`Step ${index + 1}`}
+                                                loading="lazy"
+                                                decoding="async"
                                                 className="w-full h-full object-cover group-hover/image:scale-105 transition-transform duration-500"
+                                                onLoad={(e) => setImageSize({
+                                                    width: e.currentTarget.naturalWidth,
+                                                    height: e.currentTarget.naturalHeight
+                                                })}
+                                                onError={() => setSourceIndex((i) => i + 1)}
                                             />
+                                            {/* Shared base screenshots get the spotlight drawn on top; "slice" matches object-cover */}
+                                            {step.spotlight_overlay && bbox && overlayWidth && overlayHeight && (
+                                                <svg
+                                                    viewBox={`0 0 ${overlayWidth} ${overlayHeight}`}
+                                                    preserveAspectRatio="xMidYMid slice"
+                                                    className="absolute inset-0 w-full h-full pointer-events-none group-hover/image:scale-105 transition-transform duration-500"
+                                                >
+                                                    <rect
+                                                        x={bbox.left}
+                                                        y={bbox.top}
+                                                        width={bbox.right - bbox.left}
+                                                        height={bbox.bottom - bbox.top}
+                                                        fill="none"
+                                                        stroke={SPOTLIGHT_COLOR}
+                                                        strokeWidth={SPOTLIGHT_THICKNESS}
+                                                        vectorEffect="non-scaling-stroke"
+                                                    />
+                                                </svg>
+                                            )}
                                             <div className="absolute inset-0 bg-black/50 opacity-0 group-hover/image:opacity-100 transition-opacity flex items-center justify-center">
                                                 <ZoomIn size={32} className="text-white" />
                                             </div>
@@ -175,7 +252,8 @@ export const StepItem: React.FC<StepItemProps> = ({
                                     ) : (
                                         <>
                                             <textarea
-                                                value={step.description}
+                                                // The model's answer fills in token by token while refining
+                                                value={step.isRefining && step.refiningText ? step.refiningText : step.description}
                                                 onChange={(e) => onUpdateDescription(e.target.value)}
                                                 onClick={(e) => e.stopPropagation()}
                                                 onFocus={(e) => e.stopPropagation()}
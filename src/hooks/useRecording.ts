@@ -1,6 +1,8 @@
 import { useState, useRef, useEffect } from 'react';
 import { Step } from '../types';
 import { api } from '../services/api';
+import { isGenericStep } from '../lib/refinement';
+import { rememberCaptureImage } from '../lib/captureImages';
 
 export function useRecording() {
     const [isRecording, setIsRecording] = useState(false);
@@ -26,30 +28,44 @@ export function useRecording() {
 
                 eventSourceRef.current = new EventSource(`${api.url}/events`);
                 eventSourceRef.current.onmessage = async (event) => {
-                    const newStep: Step = JSON.parse(event.data);
+                    let newStep: Step = JSON.parse(event.data);
 
-                    const isGeneric =
-                        newStep.description.includes("Clicar no destaque") ||
-                        newStep.description.includes("Interface Visual") ||
-                        newStep.element_type === "VisualElement";
+                    const isGeneric = isGenericStep(newStep);
 
-                    if (isGeneric && newStep.screenshot_base64) {
-                        newStep.isRefining = true;
-                        setSteps((prev) => [...prev, newStep]);
+                    // Append right away so steps keep their capture order while images load
+                    newStep.isRefining = isGeneric;
+                    setSteps((prev) => [...prev, newStep]);
 
+                    // Events only carry a handle. The full image is fetched once per screenshot id and
+                    // kept as a Blob outside step state (the list shows thumbnails), because the backend
+                    // capture cache expires before an unsaved recording may be saved
+                    if (!newStep.screenshot_base64 && newStep.screenshot_url && newStep.screenshot_id) {
+                        const { screenshot_id, screenshot_url } = newStep;
                         try {
-                            const refinedStep = await api.processStep(newStep);
+                            await rememberCaptureImage(screenshot_id, () => api.fetchImageBlob(screenshot_url));
+                            // Cached captures are content-addressed, so the id is also the stored blob hash
+                            newStep = { ...newStep, screenshot_hash: screenshot_id };
                             setSteps((prev) =>
-                                prev.map((s) => s.id === newStep.id ? refinedStep : s)
+                                prev.map((s) => s.id === newStep.id ? { ...s, screenshot_hash: screenshot_id } : s)
                             );
+                        } catch (error) {
+                            console.error('[Capture] Failed to fetch screenshot:', error);
+                        }
+                    }
+
+                    if (isGeneric && (newStep.screenshot_id || newStep.screenshot_base64)) {
+                        try {
+                            await api.submitRefinement(newStep);
                         } catch (error) {
                             console.error('[Refinement] Error:', error);
                             setSteps((prev) =>
                                 prev.map((s) => s.id === newStep.id ? { ...s, isRefining: false } : s)
                             );
                         }
-                    } else {
-                        setSteps((prev) => [...prev, newStep]);
+                    } else if (isGeneric) {
+                        setSteps((prev) =>
+                            prev.map((s) => s.id === newStep.id ? { ...s, isRefining: false } : s)
+                        );
                     }
                 };
             } catch (e) {
@@ -58,8 +74,33 @@ export function useRecording() {
         }
     };
 
+    // Refinements run in a background queue and may finish after recording stops,
+    // so their results are followed for the whole session
     useEffect(() => {
+        const refinementEvents = new EventSource(`${api.url}/refinements/events`);
+        refinementEvents.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            if (job.status === 'running') {
+                // Partial output while the model is still generating
+                if (!job.partial_description) return;
+                setSteps((prev) =>
+                    prev.map((s) => job.step_ids.includes(s.id) ? { ...s, refiningText: job.partial_description } : s)
+                );
+                return;
+            }
+            if (!['done', 'failed', 'cancelled'].includes(job.status)) return;
+            setSteps((prev) =>
+                prev.map((s) => {
+                    if (!job.step_ids.includes(s.id)) return s;
+                    return job.status === 'done'
+                        ? { ...s, description: job.description, isRefining: false, refiningText: undefined }
+                        : { ...s, isRefining: false, refiningText: undefined };
+                })
+            );
+        };
+
         return () => {
+            refinementEvents.close();
             if (eventSourceRef.current) {
                 eventSourceRef.current.close();
             }
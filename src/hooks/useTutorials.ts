@@ -1,10 +1,26 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { SavedTutorial, Step } from '../types';
 import { api } from '../services/api';
+import { diffSteps } from '../lib/stepDiff';
+import { hasCaptureImage, releaseCaptureImages } from '../lib/captureImages';
+
+// Unsaved captures keep their image outside step state (see lib/captureImages); attach it
+// to the steps whose screenshot the backend doesn't have yet, converting each image once
+async function withCaptureImages(steps: Step[], storedHashes: Set<string | undefined>): Promise<Step[]> {
+    const images = new Map<string, Promise<string>>();
+    return Promise.all(steps.map(async (s) => {
+        if (s.is_manual || s.screenshot_base64 || !s.screenshot_id || !hasCaptureImage(s.screenshot_id)) return s;
+        if (storedHashes.has(s.screenshot_hash)) return s;
+        if (!images.has(s.screenshot_id)) images.set(s.screenshot_id, api.getStepImageBase64(s));
+        return { ...s, screenshot_base64: await images.get(s.screenshot_id)! };
+    }));
+}
 
 export function useTutorials() {
     const [savedTutorials, setSavedTutorials] = useState<SavedTutorial[]>([]);
     const [currentTutorialId, setCurrentTutorialId] = useState<string | null>(null);
+    // Steps as last saved or loaded; later saves of the same tutorial only send the difference
+    const savedStepsRef = useRef<{ id: string; steps: Step[] } | null>(null);
 
     const loadRecentTutorials = async () => {
         try {
@@ -20,22 +36,47 @@ export function useTutorials() {
     }, []);
 
     const saveTutorial = async (title: string, steps: Step[]) => {
+        const saved = savedStepsRef.current;
+        if (currentTutorialId && saved?.id === currentTutorialId) {
+            try {
+                const storedHashes = new Set(saved.steps.map((s) => s.screenshot_hash));
+                const operations = diffSteps(saved.steps, await withCaptureImages(steps, storedHashes));
+                await api.patchTutorial(currentTutorialId, operations, title);
+                savedStepsRef.current = { id: currentTutorialId, steps };
+                // Stored now; previews and zoom load them from the backend by hash
+                releaseCaptureImages(steps.map((s) => s.screenshot_id));
+                loadRecentTutorials();
+                return currentTutorialId;
+            } catch (error) {
+                // E.g. changed elsewhere since it was loaded; the full save below rewrites it
+                console.warn('Incremental save failed, saving the whole tutorial:', error);
+            }
+        }
+
         try {
+            // Steps sharing a screenshot only send it once; the others reference its hash
+            const sentHashes = new Set<string>();
             const data = {
                 title,
-                steps: steps.map(s => ({
-                    ...s,
-                    screenshot_base64: s.is_manual ? '' : s.screenshot_base64
-                }))
+                steps: (await withCaptureImages(steps, new Set())).map(s => {
+                    if (s.is_manual) return { ...s, screenshot_base64: '' };
+                    if (s.screenshot_hash && sentHashes.has(s.screenshot_hash)) {
+                        return { ...s, screenshot_base64: '' };
+                    }
+                    if (s.screenshot_hash) sentHashes.add(s.screenshot_hash);
+                    return s;
+                })
             };
 
             const id = await api.saveTutorial(data, currentTutorialId || undefined);
             setCurrentTutorialId(id);
+            savedStepsRef.current = { id, steps };
+            releaseCaptureImages(steps.map((s) => s.screenshot_id));
             loadRecentTutorials();
-            return true;
+            return id;
         } catch (error) {
             console.error('Failed to save tutorial:', error);
-            return false;
+            return null;
         }
     };
 
@@ -56,8 +97,9 @@ export function useTutorials() {
 
     const loadTutorial = async (id: string) => {
         try {
-            const tutorial = await api.getTutorial(id);
+            const tutorial = await api.getTutorial(id, false);
             setCurrentTutorialId(id);
+            savedStepsRef.current = { id, steps: tutorial.steps };
             return tutorial;
         } catch (error) {
             console.error('Failed to load tutorial:', error);
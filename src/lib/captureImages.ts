@@ -0,0 +1,58 @@
+// Full-size images of unsaved captures, keyed by screenshot id (near-duplicate steps share one).
+// Kept as Blobs rather than base64 strings in step state: the browser stores blob data outside
+// the JS heap, and base64 is only produced when an image is sent (save, refinement, export).
+// The backend capture cache expires, so this is the renderer's copy until the tutorial is saved.
+const images = new Map<string, Promise<Blob>>();
+const objectUrls = new Map<string, string>();
+
+export function rememberCaptureImage(id: string, load: () => Promise<Blob>): Promise<Blob> {
+    let pending = images.get(id);
+    if (!pending) {
+        pending = load();
+        images.set(id, pending);
+        pending.catch(() => images.delete(id));
+    }
+    return pending;
+}
+
+export function hasCaptureImage(id?: string | null): boolean {
+    return !!id && images.has(id);
+}
+
+export async function captureImageBlob(id?: string | null): Promise<Blob | null> {
+    const pending = id ? images.get(id) : undefined;
+    return pending ? await pending.catch(() => null) : null;
+}
+
+// Object URL for previews once the backend no longer serves the capture
+export function captureImageUrl(id?: string | null): string | null {
+    if (!id) return null;
+    return objectUrls.get(id) ?? null;
+}
+
+export async function createCaptureImageUrl(id: string): Promise<string | null> {
+    const blob = await captureImageBlob(id);
+    if (!blob) return null;
+    if (!objectUrls.has(id)) objectUrls.set(id, URL.createObjectURL(blob));
+    return objectUrls.get(id)!;
+}
+
+// Drop images that are stored by the backend now (or whose steps are gone)
+export function releaseCaptureImages(ids?: Iterable<string | null | undefined>) {
+    for (const id of ids ?? [...images.keys()]) {
+        if (!id) continue;
+        images.delete(id);
+        const url = objectUrls.get(id);
+        if (url) URL.revokeObjectURL(url);
+        objectUrls.delete(id);
+    }
+}
+
+export function blobToBase64(blob: Blob): Promise<string> {
+    return new Promise((resolve, reject) => {
+        const reader = new FileReader();
+        reader.onloadend = () => resolve((reader.result as string).split(',')[1] || '');
+        reader.onerror = () => reject(reader.error);
+        reader.readAsDataURL(blob);
+    });
+}
@@ -0,0 +1,10 @@
+// Descriptions produced by the Chromium fallback that need the vision model.
+// Mirrors GENERIC_PATTERNS in backend/app/services/refinement.py.
+import { Step } from '../types';
+
+const GENERIC_PATTERNS = ['Clicar no destaque', 'Interface Visual', 'Elemento Visual'];
+
+export function isGenericStep(step: Step): boolean {
+    return GENERIC_PATTERNS.some((pattern) => step.description.includes(pattern)) ||
+        step.element_type === 'VisualElement';
+}
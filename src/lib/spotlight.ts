@@ -0,0 +1,44 @@
+// Spotlight drawing for steps whose screenshot is a clean (possibly shared) base image.
+// Mirrors recorder.draw_spotlight on the backend.
+export const SPOTLIGHT_COLOR = '#ff0000';
+export const SPOTLIGHT_THICKNESS = 3;
+
+// Screenshots can be PNG, WebP or JPEG depending on the backend codec settings
+export function imageMimeType(base64: string): string {
+    if (base64.startsWith('/9j/')) return 'image/jpeg';
+    if (base64.startsWith('UklGR')) return 'image/webp';
+    return 'image/png';
+}
+
+export function toDataUrl(base64: string): string {
+    return `data:${imageMimeType(base64)};base64,${base64}`;
+}
+
+// Renders to a PNG data URL, drawing the spotlight when a bbox is given
+export async function composeSpotlight(base64: string, bbox: any): Promise<string> {
+    const img = new Image();
+    img.src = toDataUrl(base64);
+    await img.decode();
+
+    const canvas = document.createElement('canvas');
+    canvas.width = img.naturalWidth;
+    canvas.height = img.naturalHeight;
+    const ctx = canvas.getContext('2d');
+    if (!ctx) return img.src;
+
+    ctx.drawImage(img, 0, 0);
+    if (bbox) {
+        ctx.strokeStyle = SPOTLIGHT_COLOR;
+        ctx.lineWidth = SPOTLIGHT_THICKNESS;
+        ctx.strokeRect(bbox.left, bbox.top, bbox.right - bbox.left, bbox.bottom - bbox.top);
+    }
+    return canvas.toDataURL('image/png');
+}
+
+// Final PNG image of a step (zoom and export expect PNG with the spotlight visible)
+export async function stepImageDataUrl(step: { screenshot_base64: string; bounding_box: any; spotlight_overlay?: boolean }): Promise<string | null> {
+    if (!step.screenshot_base64) return null;
+    if (step.spotlight_overlay) return composeSpotlight(step.screenshot_base64, step.bounding_box);
+    if (imageMimeType(step.screenshot_base64) !== 'image/png') return composeSpotlight(step.screenshot_base64, null);
+    return toDataUrl(step.screenshot_base64);
+}
@@ -0,0 +1,68 @@
+import { Step, StepOperation } from '../types';
+
+// Step fields stored by the backend (database.STEP_FIELD_DEFAULTS plus the screenshot reference)
+const STORED_FIELDS = [
+    'element_name',
+    'description',
+    'element_type',
+    'is_manual',
+    'bounding_box',
+    'spotlight_overlay',
+    'content_type',
+    'code_language',
+    'code_content',
+    'screenshot_hash'
+] as const;
+
+function sameValue(a: unknown, b: unknown): boolean {
+    return JSON.stringify(a ?? null) === JSON.stringify(b ?? null);
+}
+
+// Stored fields of `step` that differ from `saved`; a screenshot new to the backend carries its image along
+function changedFields(saved: Step, step: Step, knownHashes: Set<string | undefined>): Partial<Step> {
+    const fields: Partial<Step> = {};
+    for (const field of STORED_FIELDS) {
+        if (!sameValue(saved[field], step[field])) (fields as any)[field] = step[field];
+    }
+    if ('screenshot_hash' in fields) {
+        fields.screenshot_base64 = knownHashes.has(step.screenshot_hash) ? '' : step.screenshot_base64;
+        knownHashes.add(step.screenshot_hash);
+    }
+    return fields;
+}
+
+// Operations that turn the saved step list into `steps` (see PATCH /tutorials/{id}).
+// Images are only sent for screenshots the backend doesn't have yet.
+export function diffSteps(saved: Step[], steps: Step[]): StepOperation[] {
+    const savedById = new Map(saved.map((s) => [s.id, s]));
+    const ids = new Set(steps.map((s) => s.id));
+    const knownHashes = new Set<string | undefined>(saved.map((s) => s.screenshot_hash).filter(Boolean));
+    const operations: StepOperation[] = [];
+
+    const order = saved.map((s) => s.id).filter((id) => ids.has(id));
+    for (const s of saved) {
+        if (!ids.has(s.id)) operations.push({ op: 'delete', id: s.id });
+    }
+
+    steps.forEach((step, index) => {
+        const previous = savedById.get(step.id);
+        if (!previous) {
+            const sendImage = !step.is_manual && !(step.screenshot_hash && knownHashes.has(step.screenshot_hash));
+            if (step.screenshot_hash) knownHashes.add(step.screenshot_hash);
+            const { isRefining, refiningText, ...stored } = step;
+            operations.push({ op: 'insert', step: { ...stored, screenshot_base64: sendImage ? step.screenshot_base64 : '' }, index });
+            order.splice(index, 0, step.id);
+            return;
+        }
+
+        const position = order.indexOf(step.id);
+        if (position !== index) {
+            order.splice(position, 1);
+            order.splice(index, 0, step.id);
+            operations.push({ op: 'move', id: step.id, index });
+        }
+        const fields = changedFields(previous, step, knownHashes);
+        if (Object.keys(fields).length > 0) operations.push({ op: 'update', id: step.id, fields });
+    });
+    return operations;
+}
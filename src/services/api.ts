@@ -1,4 +1,5 @@
-import { Step, SavedTutorial, TutorialData } from '../types';
+import { Step, SavedTutorial, TutorialData, StepOperation } from '../types';
+import { blobToBase64, captureImageBlob } from '../lib/captureImages';
 
 const API_URL = 'http://localhost:8000';
 
@@ -22,22 +23,131 @@ export const api = {
         await fetch(`${API_URL}/stop-recording`, { method: 'POST' });
     },
 
-    async processStep(step: Step): Promise<Step> {
-        const response = await fetch(`${API_URL}/process-step`, {
+    async fetchImageBlob(path: string): Promise<Blob> {
+        const response = await fetch(`${API_URL}${path}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch image');
+        }
+        return await response.blob();
+    },
+
+    async fetchImageBase64(path: string): Promise<string> {
+        return blobToBase64(await this.fetchImageBlob(path));
+    },
+
+    // Preview for the step list: the capture's thumbnail tier while recording, the stored thumbnail once saved
+    thumbnailUrls(step: Step): string[] {
+        const urls: string[] = [];
+        if (step.screenshot_url) urls.push(`${API_URL}${step.screenshot_url}?tier=thumbnail`);
+        if (step.screenshot_hash) urls.push(`${this.blobUrl(step.screenshot_hash)}/thumbnail`);
+        return urls;
+    },
+
+    blobUrl(hash: string): string {
+        return `${API_URL}/blobs/${hash}`;
+    },
+
+    // Full-resolution image of a step; loaded tutorials don't keep it in memory
+    async getStepImageBase64(step: Step): Promise<string> {
+        if (step.screenshot_base64) return step.screenshot_base64;
+        // Unsaved capture: the renderer's copy outlives the backend capture cache
+        const captured = await captureImageBlob(step.screenshot_id);
+        if (captured) return await blobToBase64(captured);
+        if (step.screenshot_hash) {
+            try {
+                return await this.fetchImageBase64(`/blobs/${step.screenshot_hash}`);
+            } catch {
+                // Not saved yet; fall back to the capture cache
+            }
+        }
+        if (step.screenshot_url) return await this.fetchImageBase64(step.screenshot_url);
+        return '';
+    },
+
+    // Queue a background refinement; the result arrives on /refinements/events.
+    // Captures are referenced by id so the image isn't uploaded back.
+    async submitRefinement(step: Step, priority = 0): Promise<void> {
+        const submit = (image_base64?: string) => fetch(`${API_URL}/refinements`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
-                image_base64: step.screenshot_base64,
+                step_id: step.id,
+                image_base64,
+                screenshot_id: step.screenshot_id,
+                screenshot_hash: step.screenshot_hash,
                 bounding_box: step.bounding_box,
-                context: step.description
+                context: step.description,
+                priority
             })
         });
+        let response = await submit(step.screenshot_id ? undefined : await this.getStepImageBase64(step));
+        // 400 = no image: the capture expired from the backend cache, send the renderer's copy
+        if (response.status === 400 && step.screenshot_id) {
+            const image_base64 = await this.getStepImageBase64(step).catch(() => '');
+            if (image_base64) response = await submit(image_base64);
+        }
+        if (!response.ok) {
+            throw new Error('Failed to queue refinement');
+        }
+    },
 
-        if (response.ok) {
-            const result = await response.json();
-            return { ...step, description: result.final_description, isRefining: false };
+    // Queue many steps in one request; returns the ids of the steps that were queued
+    async refineSteps(steps: Step[], priority = 0): Promise<string[]> {
+        const submit = async (batch: { step: Step; image_base64?: string }[]) => {
+            const response = await fetch(`${API_URL}/refinements/batch`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    steps: batch.map(({ step, image_base64 }) => ({
+                        step_id: step.id,
+                        screenshot_id: step.screenshot_id,
+                        screenshot_hash: step.screenshot_hash,
+                        image_base64,
+                        bounding_box: step.bounding_box,
+                        context: step.description
+                    })),
+                    only_generic: false,
+                    priority
+                })
+            });
+            if (!response.ok) {
+                throw new Error('Failed to queue refinements');
+            }
+            return await response.json() as { jobs: { step_ids: string[] }[]; skipped: string[] };
+        };
+
+        // Inline only when the backend has no copy to look up
+        const first = await submit(steps.map((step) => ({
+            step,
+            image_base64: step.screenshot_id || step.screenshot_hash ? undefined : step.screenshot_base64
+        })));
+        const queued = first.jobs.flatMap((job) => job.step_ids);
+
+        // Captures expire from the backend cache; send the image the renderer still has
+        const skipped = new Set(first.skipped);
+        const retry = await Promise.all(
+            steps
+                .filter((step) => skipped.has(step.id) && (step.screenshot_id || step.screenshot_hash))
+                .map(async (step) => ({ step, image_base64: await this.getStepImageBase64(step).catch(() => '') }))
+        );
+        const withImage = retry.filter((item) => item.image_base64);
+        if (withImage.length > 0) {
+            const second = await submit(withImage);
+            queued.push(...second.jobs.flatMap((job) => job.step_ids));
         }
-        throw new Error('Failed to process step');
+        return queued;
+    },
+
+    async prioritizeRefinement(stepId: string): Promise<void> {
+        await fetch(`${API_URL}/refinements/prioritize`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ step_id: stepId })
+        });
+    },
+
+    async cancelRefinements(stepId: string): Promise<void> {
+        await fetch(`${API_URL}/steps/${stepId}/refinements`, { method: 'DELETE' });
     },
 
     async getTutorials(): Promise<SavedTutorial[]> {
@@ -49,21 +159,36 @@ export const api = {
         return [];
     },
 
-    async getTutorial(id: string): Promise<TutorialData> {
-        const response = await fetch(`${API_URL}/tutorials/${id}`);
+    async searchTutorials(query: string, limit = 20, offset = 0): Promise<{ results: SavedTutorial[]; total: number }> {
+        const params = new URLSearchParams({ q: query, limit: String(limit), offset: String(offset) });
+        const response = await fetch(`${API_URL}/tutorials/search?${params}`);
         if (response.ok) {
             return await response.json();
         }
+        return { results: [], total: 0 };
+    },
+
+    async getTutorial(id: string, includeScreenshots = true): Promise<TutorialData> {
+        const response = await fetch(`${API_URL}/tutorials/${id}?include_screenshots=${includeScreenshots}`);
+        if (response.ok) {
+            const data = await response.json();
+            // Without screenshots, images are fetched per step (thumbnail, then full size on zoom)
+            data.steps = data.steps.map((s: Step) => ({ ...s, screenshot_base64: s.screenshot_base64 || '' }));
+            return data;
+        }
         throw new Error('Failed to load tutorial');
     },
 
     async saveTutorial(data: TutorialData, id?: string): Promise<string> {
         if (id) {
-            await fetch(`${API_URL}/tutorials/${id}`, {
+            const response = await fetch(`${API_URL}/tutorials/${id}`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(data)
             });
+            if (!response.ok) {
+                throw new Error('Failed to save tutorial');
+            }
             return id;
         } else {
             const response = await fetch(`${API_URL}/tutorials`, {
@@ -71,11 +196,29 @@ export const api = {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(data)
             });
+            if (!response.ok) {
+                throw new Error('Failed to save tutorial');
+            }
             const result = await response.json();
             return result.id;
         }
     },
 
+    async patchTutorial(id: string, operations: StepOperation[], title?: string): Promise<void> {
+        const response = await fetch(`${API_URL}/tutorials/${id}`, {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ title, operations })
+        });
+        if (!response.ok) {
+            throw new Error('Failed to patch tutorial');
+        }
+    },
+
+    exportUrl(id: string, format: 'zip' | 'html' | 'md' = 'zip'): string {
+        return `${API_URL}/tutorials/${id}/export?format=${format}`;
+    },
+
     async deleteTutorial(id: string): Promise<void> {
         await fetch(`${API_URL}/tutorials/${id}`, {
             method: 'DELETE'
@@ -3,10 +3,18 @@ export interface Step {
     element_name: string;
     description: string;
     screenshot_base64: string;
+    screenshot_hash?: string;
+    screenshot_url?: string | null;
+    screenshot_id?: string | null;
+    screenshot_phash?: string | null;
+    spotlight_overlay?: boolean;
+    screenshot_width?: number | null;
+    screenshot_height?: number | null;
     bounding_box: any;
     element_type: string;
     is_manual?: boolean;
     isRefining?: boolean;
+    refiningText?: string;
     content_type?: 'text' | 'code';
     code_language?: string;
     code_content?: string;
@@ -17,9 +25,17 @@ export interface SavedTutorial {
     title: string;
     date_created: string;
     date_modified: string;
+    step_count?: number;
+    thumbnail_hash?: string | null;
 }
 
 export interface TutorialData {
     title: string;
     steps: Step[];
 }
+
+export type StepOperation =
+    | { op: 'insert'; step: Partial<Step>; index?: number }
+    | { op: 'update'; id: string; fields: Partial<Step> }
+    | { op: 'delete'; id: string }
+    | { op: 'move'; id: string; index: number };